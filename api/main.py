@@ -1,33 +1,82 @@
 from __future__ import annotations
 
 import asyncio
-import csv
 import json
 import os
-import subprocess
 import sys
 import threading
 import time
 import urllib.parse
 import urllib.request
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Any, Dict, IO, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
-from fastapi import FastAPI, File, Form, Query, UploadFile
+from fastapi import FastAPI, File, Form, Query, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from prometheus_client import make_asgi_app
+
+from app.follow import mark_input_done
+from app.history import RunHistoryStore, RunHistoryTail, history_db_path
+from app.jobs import ACTIVE, Job, JobScheduler, available_cores, new_job_id, plan_concurrency
+from app.live import LiveChannelReader, live_channel_path, live_delta, read_live_snapshot, write_live_snapshot
+from app.microbatch import MicroBatcher
+from app.output_index import PredictionIndex, read_prediction_page
+from app.warm_pool import WarmRunnerPool
 
 RUN_HISTORY_PATH = Path(os.getenv("RUN_HISTORY_PATH", "output/run_history.jsonl"))
 RUN_LIVE_PATH = Path(os.getenv("RUN_LIVE_PATH", "output/live_metrics.json"))
 DASHBOARD_DIST = Path(os.getenv("DASHBOARD_DIST", "web/dist"))
 UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "output/uploads"))
-RUN_LOG_DIR = Path(os.getenv("RUN_LOG_DIR", "output/run_logs"))
+# Per-job live metrics, logs and (by default) outputs live under JOBS_DIR/<job id>/
+JOBS_DIR = Path(os.getenv("JOBS_DIR", "output/jobs"))
+# Runs at once and intra-op threads per run; unset, both follow the core count
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "0")) or None
+JOB_THREADS = int(os.getenv("JOB_THREADS", "0")) or None
+# Run jobs on long-lived runners that keep models loaded between runs
+WARM_POOL = os.getenv("WARM_POOL", "1").strip().lower() in {"1", "true", "yes", "on"}
+# Memory for resident models across the whole pool, split evenly between runners
+WARM_MODEL_MEMORY_MB = int(os.getenv("WARM_MODEL_MEMORY_MB", "4096"))
+WARM_MODELS_MAX = int(os.getenv("WARM_MODELS_MAX", "2"))
+# Online scoring (POST /api/predict): model settings follow the runner's
+# env vars; requests are micro-batched up to PREDICT_MAX_BATCH texts or
+# PREDICT_MAX_WAIT_MS of waiting
+PREDICT_MODEL_NAME = os.getenv("MODEL_NAME", "distilbert-base-uncased-finetuned-sst-2-english")
+PREDICT_MAX_LEN = int(os.getenv("MAX_LEN", "256"))
+PREDICT_BACKEND = os.getenv("BACKEND", "torch").strip().lower()
+PREPARED_MODEL_DIR = Path(os.getenv("PREPARED_MODEL_DIR", "output/prepared"))
+PREDICT_MAX_BATCH = int(os.getenv("PREDICT_MAX_BATCH", "32"))
+PREDICT_MAX_WAIT_MS = float(os.getenv("PREDICT_MAX_WAIT_MS", "5"))
+# Texts per request; larger requests would hold up everyone else's batches
+PREDICT_MAX_TEXTS = int(os.getenv("PREDICT_MAX_TEXTS", "0")) or PREDICT_MAX_BATCH * 8
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Newest runs kept in memory for /api/runs; must cover its largest page
+RUNS_CACHE_SIZE = max(int(os.getenv("RUNS_CACHE_SIZE", "5000")), 2000)
 BASE_DIR = Path(__file__).resolve().parents[1]
 
-_current_process: subprocess.Popen[str] | None = None
-_current_log_path: Path | None = None
-_current_log_file: IO[str] | None = None
+_job_concurrency, _job_threads = plan_concurrency(available_cores(), JOB_CONCURRENCY, JOB_THREADS)
+_warm_pool = (
+    # Runners are started by the app's lifespan, not on import
+    WarmRunnerPool(
+        _job_concurrency, WARM_MODEL_MEMORY_MB * 1024 * 1024, WARM_MODELS_MAX, cwd=BASE_DIR, prestart=False
+    )
+    if WARM_POOL
+    else None
+)
+_scheduler = JobScheduler(
+    JOBS_DIR,
+    _job_concurrency,
+    _job_threads,
+    cwd=BASE_DIR,
+    launcher=_warm_pool.launch if _warm_pool is not None else None,
+)
+_history_store: RunHistoryStore | None = None
+_history_tail = RunHistoryTail(RUN_HISTORY_PATH, RUNS_CACHE_SIZE)
+_prediction_indexes: Dict[Path, PredictionIndex] = {}
+_online: MicroBatcher | None = None
+_online_lock = threading.Lock()
 _models_cache: List[Dict[str, Any]] = []
 _models_cache_ts: float | None = None
 _models_cache_ttl_s = 60 * 60 * 6
@@ -39,7 +88,20 @@ _default_models = [
     {"id": "finiteautomata/bertweet-base-sentiment-analysis", "likes": 0, "downloads": 0},
 ]
 
-app = FastAPI(title="IQRush Dashboard API")
+
+
+@asynccontextmanager
+async def _lifespan(_app: FastAPI):
+    # Importing this module (tests, tooling, uvicorn --reload's watcher) must
+    # not spawn runner processes; serving it does
+    if _warm_pool is not None:
+        await asyncio.to_thread(_warm_pool.start)
+    yield
+    if _warm_pool is not None:
+        await asyncio.to_thread(_warm_pool.close)
+
+
+app = FastAPI(title="IQRush Dashboard API", lifespan=_lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -50,37 +112,94 @@ app.add_middleware(
 )
 
 
-def _read_jsonl(path: Path) -> List[Dict[str, Any]]:
-    if not path.exists():
-        return []
-    runs: List[Dict[str, Any]] = []
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                runs.append(json.loads(line))
-            except json.JSONDecodeError:
-                continue
-    return runs
-
-
-def _read_live(path: Path) -> Dict[str, Any] | None:
-    if not path.exists():
-        return None
-    try:
-        return json.loads(path.read_text(encoding="utf-8"))
-    except json.JSONDecodeError:
-        return None
-
-
-def _write_live_snapshot(record: Dict[str, Any]) -> None:
-    RUN_LIVE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    RUN_LIVE_PATH.write_text(json.dumps(record, ensure_ascii=False), encoding="utf-8")
-
-
-_write_live_snapshot(
+_idle_reader = LiveChannelReader(live_channel_path(RUN_LIVE_PATH))
+
+
+def _current_live() -> tuple[int, Dict[str, Any] | None]:
+    # The dashboard's single-run view follows the most recently submitted job
+    job = _scheduler.latest()
+    if job is None:
+        return read_live_snapshot(RUN_LIVE_PATH, _idle_reader)
+    return job.live()
+
+
+def _current_live_path() -> Path:
+    job = _scheduler.latest()
+    return RUN_LIVE_PATH if job is None else job.live_path
+
+
+# One poller per live channel for all its /live/stream clients: it watches the
+# channel's sequence number and fans each change out to every subscriber as a
+# delta. `resolve` names the channel on every poll, so the dashboard-wide
+# stream moves on to a new job by itself (with a full record, not a delta).
+class _LiveBroadcaster:
+    def __init__(self, resolve: Callable[[], Path], poll_s: float = 0.05, queue_size: int = 64) -> None:
+        self.resolve = resolve
+        self.poll_s = poll_s
+        self.queue_size = queue_size
+        self.subscribers: set[asyncio.Queue[Dict[str, Any]]] = set()
+        self.path: Path | None = None
+        self.seq = -1
+        self.snapshot: Dict[str, Any] | None = None
+        self._reader: LiveChannelReader | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    def _refresh(self) -> Dict[str, Any] | None:
+        # The message for the latest record, or None if nothing changed
+        path = self.resolve()
+        if path != self.path or self._reader is None:
+            if self._reader is not None:
+                self._reader.close()
+            self._reader = LiveChannelReader(live_channel_path(path))
+            self.path, self.seq, self.snapshot = path, -1, None
+        if self._reader.seq() == self.seq:
+            return None
+        seq, snapshot = read_live_snapshot(path, self._reader)
+        delta = live_delta(self.snapshot, snapshot)
+        self.seq, self.snapshot = seq, snapshot
+        if delta is None:
+            return {"seq": seq, "live": snapshot}
+        return {"seq": seq, "delta": delta} if delta else None
+
+    @property
+    def active(self) -> bool:
+        return self._task is not None
+
+    def subscribe(self) -> tuple[asyncio.Queue[Dict[str, Any]], Dict[str, Any]]:
+        self._refresh()
+        queue: asyncio.Queue[Dict[str, Any]] = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return queue, {"seq": self.seq, "live": self.snapshot}
+
+    def unsubscribe(self, queue: asyncio.Queue[Dict[str, Any]]) -> None:
+        self.subscribers.discard(queue)
+
+    async def _run(self) -> None:
+        try:
+            while self.subscribers:
+                message = self._refresh()
+                if message is not None:
+                    for queue in list(self.subscribers):
+                        try:
+                            queue.put_nowait(message)
+                        except asyncio.QueueFull:
+                            # A slow client skips ahead to a full snapshot
+                            while not queue.empty():
+                                queue.get_nowait()
+                            queue.put_nowait({"seq": self.seq, "live": self.snapshot})
+                await asyncio.sleep(self.poll_s)
+        finally:
+            self._task = None
+
+
+_live_broadcaster = _LiveBroadcaster(_current_live_path)
+_job_broadcasters: Dict[str, _LiveBroadcaster] = {}
+
+
+write_live_snapshot(
+    RUN_LIVE_PATH,
     {
         "status": "idle",
         "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
@@ -107,17 +226,23 @@ _write_live_snapshot(
 )
 
 
-def _read_predictions(path: Path, limit: int) -> List[Dict[str, Any]]:
+def _read_predictions(
+    path: Path,
+    offset: int,
+    limit: int,
+    **filters: Any,
+) -> tuple[int, List[Dict[str, Any]]]:
     if not path.exists():
-        return []
-    rows: List[Dict[str, Any]] = []
-    with path.open("r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            rows.append(row)
-            if limit > 0 and len(rows) >= limit:
-                break
-    return rows
+        return 0, []
+    # CSV (through its row-offset index), Parquet or Arrow IPC, depending on
+    # the run's OUTPUT_FORMAT; limit=0 means every row from offset on
+    return read_prediction_page(
+        path,
+        offset,
+        limit if limit > 0 else sys.maxsize,
+        indexes=_prediction_indexes,
+        **filters,
+    )
 
 
 def _read_summary(path: Path) -> Dict[str, Any] | None:
@@ -160,13 +285,6 @@ def _summary_path_for_output(output_csv: str) -> Path:
     return output_path.with_name(f"{output_path.stem}_group_summary.json")
 
 
-def _is_running() -> bool:
-    global _current_process
-    if _current_process is None:
-        return False
-    return _current_process.poll() is None
-
-
 def _tail_file(path: Path, max_lines: int = 200) -> str:
     if not path.exists():
         return ""
@@ -174,40 +292,6 @@ def _tail_file(path: Path, max_lines: int = 200) -> str:
     return "\n".join(lines[-max_lines:])
 
 
-def _stream_process_output(proc: subprocess.Popen[str], log_file: IO[str]) -> None:
-    if proc.stdout is None:
-        return
-    for line in proc.stdout:
-        log_file.write(line)
-        log_file.flush()
-        sys.stdout.write(line)
-        sys.stdout.flush()
-
-
-def _watch_process(proc: subprocess.Popen[str]) -> None:
-    exit_code = proc.wait()
-    live = _read_live(RUN_LIVE_PATH) or {}
-    status = live.get("status")
-    if status not in {"complete", "cancelled"}:
-        final_status = "complete" if exit_code == 0 else "failed"
-        _write_live_snapshot(
-            {
-                **live,
-                "status": final_status,
-                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
-                "exit_code": exit_code,
-            }
-        )
-    try:
-        global _current_process, _current_log_file
-        _current_process = None
-        if _current_log_file:
-            _current_log_file.close()
-            _current_log_file = None
-    except Exception:
-        return
-
-
 @app.get("/api/health")
 def health() -> Dict[str, str]:
     return {"status": "ok"}
@@ -228,38 +312,176 @@ def list_models(limit: int = Query(default=50, ge=1, le=200)) -> JSONResponse:
     return JSONResponse({"models": _models_cache[:limit]})
 
 
+def _runs_store() -> RunHistoryStore:
+    global _history_store
+    if _history_store is None:
+        _history_store = RunHistoryStore(history_db_path(RUN_HISTORY_PATH))
+    # Cheap catch-up: only JSONL lines past the stored watermark are read
+    _history_store.backfill(RUN_HISTORY_PATH)
+    return _history_store
+
+
 @app.get("/api/runs")
 def list_runs(
     q: Optional[str] = Query(default=None, description="Search substring in JSON"),
     limit: int = Query(default=200, ge=1, le=2000),
+    offset: int = Query(default=0, ge=0, description="Skip this many of the newest matches"),
+    model_name: Optional[str] = Query(default=None),
+    dataset_type: Optional[str] = Query(default=None),
+    input_csv: Optional[str] = Query(default=None),
+    since: Optional[str] = Query(default=None, description="Earliest timestamp (inclusive)"),
+    until: Optional[str] = Query(default=None, description="Latest timestamp (exclusive)"),
 ) -> JSONResponse:
-    runs = _read_jsonl(RUN_HISTORY_PATH)
-    if q:
-        q_lower = q.lower()
-        runs = [r for r in runs if q_lower in json.dumps(r).lower()]
-    runs = runs[-limit:]
-    return JSONResponse({"count": len(runs), "runs": runs})
+    filters = {
+        name: value
+        for name, value in (
+            ("model_name", model_name),
+            ("dataset_type", dataset_type),
+            ("input_csv", input_csv),
+        )
+        if value
+    }
+    # Recent pages and searches over a small history come from the in-memory
+    # tail; field filters and anything older go to the SQLite index
+    _history_tail.refresh()
+    if not filters and not since and not until:
+        cached = _history_tail.query(q, limit, offset)
+        if cached is not None:
+            total, runs = cached
+            return JSONResponse({"count": len(runs), "total": total, "offset": offset, "runs": runs})
+    total, runs = _runs_store().query(
+        q=q, filters=filters, since=since, until=until, limit=limit, offset=offset
+    )
+    return JSONResponse({"count": len(runs), "total": total, "offset": offset, "runs": runs})
+
+
+def _stream_live(broadcaster: _LiveBroadcaster) -> StreamingResponse:
+    # First message is the full record ({"seq", "live"}); later ones carry
+    # only the changed keys ({"seq", "delta"}) unless a full resend is needed
+    queue, first = broadcaster.subscribe()
+
+    async def event_stream():
+        try:
+            yield f"data: {json.dumps(first)}\n\n"
+            while True:
+                message = await queue.get()
+                yield f"data: {json.dumps(message)}\n\n"
+        finally:
+            broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 
 @app.get("/api/live")
 def live_snapshot() -> JSONResponse:
-    snapshot = _read_live(RUN_LIVE_PATH)
+    _, snapshot = _current_live()
     return JSONResponse({"live": snapshot})
 
 
 @app.get("/api/live/stream")
 async def live_stream() -> StreamingResponse:
-    async def event_stream():
-        last_payload = ""
-        while True:
-            snapshot = _read_live(RUN_LIVE_PATH)
-            payload = json.dumps({"live": snapshot})
-            if payload != last_payload:
-                last_payload = payload
-                yield f"data: {payload}\n\n"
-            await asyncio.sleep(1)
+    return _stream_live(_live_broadcaster)
 
-    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+def _resolve_output(output_csv: Optional[str], output_format: Optional[str], job_id: str) -> str:
+    if output_csv:
+        output_path = Path(output_csv)
+        if output_path.is_absolute():
+            resolved_output = str(output_path)
+        else:
+            if output_path.parts and output_path.parts[0] == "output":
+                resolved_output = str(output_path)
+            else:
+                resolved_output = str(Path("output") / output_path)
+    else:
+        resolved_output = str(_scheduler.job_dir(job_id) / "predictions.csv")
+    if output_format and output_format != "csv":
+        if output_format not in {"parquet", "arrow"}:
+            raise ValueError("output_format must be csv, parquet or arrow")
+        # Same suffix the runner writes for columnar formats
+        if Path(resolved_output).suffix.lower() == ".csv":
+            resolved_output = str(Path(resolved_output).with_suffix(f".{output_format}"))
+    return resolved_output
+
+
+# Run options as accepted by /api/run and /api/run/stream, and the runner
+# setting each one maps to
+_RUN_OPTION_ENV = {
+    "csv_mode": "CSV_MODE",
+    "text_col": "TEXT_COL",
+    "text_col_index": "TEXT_COL_INDEX",
+    "group_col_index": "GROUP_COL_INDEX",
+    "model_name": "MODEL_NAME",
+    "batch_size": "BATCH_SIZE",
+    "max_len": "MAX_LEN",
+    "max_rows": "MAX_ROWS",
+    "metrics_port": "METRICS_PORT",
+    "output_format": "OUTPUT_FORMAT",
+    "id_col": "ID_COL",
+}
+
+
+def _job_response(job: Job) -> Dict[str, Any]:
+    return {**job.to_dict(), "summary_path": str(_summary_path_for_output(str(job.output_csv)))}
+
+
+def _submit_run(
+    job_id: str,
+    upload_path: Path,
+    resolved_output: str,
+    options: Dict[str, Any],
+    follow: bool = False,
+) -> Job:
+    env = {"RUN_HISTORY_PATH": str(RUN_HISTORY_PATH)}
+    for name, env_name in _RUN_OPTION_ENV.items():
+        value = options.get(name)
+        if value is not None and value != "":
+            env[env_name] = str(value)
+    if follow:
+        # The upload is still being written; the runner reads it as it grows
+        env["INPUT_FOLLOW"] = "1"
+
+    text_col = options.get("text_col")
+    model_name = options.get("model_name")
+    batch_size = options.get("batch_size")
+    max_len = options.get("max_len")
+    snapshot = {
+        "input_csv": str(upload_path),
+        "output_csv": resolved_output,
+        "text_col": text_col or os.getenv("TEXT_COL", "Text"),
+        "model_name": model_name or os.getenv("MODEL_NAME", ""),
+        "batch_size": batch_size or int(os.getenv("BATCH_SIZE", "32")),
+        "max_len": max_len or int(os.getenv("MAX_LEN", "256")),
+        "max_rows": options.get("max_rows"),
+        "metrics_port": options.get("metrics_port"),
+        "rows_seen": 0,
+        "processed": 0,
+        "failed": 0,
+        "avg_score": 0,
+        "positive": 0,
+        "negative": 0,
+        "neutral": 0,
+        "runtime_s": 0,
+    }
+    # Raises ValueError if an active job already writes this output or
+    # serves metrics on this port
+    return _scheduler.submit(
+        job_id,
+        upload_path,
+        Path(resolved_output),
+        env,
+        metrics_port=options.get("metrics_port"),
+        snapshot=snapshot,
+    )
+
+
+def _upload_path(filename: Optional[str], job_id: str) -> Path:
+    # One directory per job; the file name keeps the timestamp prefix that
+    # dataset_name_from_path strips
+    upload_dir = UPLOAD_DIR / job_id
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    safe_name = Path(filename or "input.csv").name
+    return upload_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_name}"
 
 
 @app.post("/api/run")
@@ -275,117 +497,125 @@ async def run_job(
     max_len: Optional[int] = Form(default=None),
     max_rows: Optional[int] = Form(default=None),
     metrics_port: Optional[int] = Form(default=None),
+    output_format: Optional[str] = Form(default=None),
+    id_col: Optional[str] = Form(default=None),
 ) -> JSONResponse:
-    if _is_running():
-        return JSONResponse({"error": "Run already in progress"}, status_code=409)
-
-    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-    timestamp = time.strftime("%Y%m%d-%H%M%S")
-    safe_name = Path(file.filename or "input.csv").name
-    upload_path = UPLOAD_DIR / f"{timestamp}-{safe_name}"
-
-    content = await file.read()
-    upload_path.write_bytes(content)
-
-    if output_csv:
-        output_path = Path(output_csv)
-        if output_path.is_absolute():
-            resolved_output = str(output_path)
-        else:
-            if output_path.parts and output_path.parts[0] == "output":
-                resolved_output = str(output_path)
-            else:
-                resolved_output = str(Path("output") / output_path)
-    else:
-        resolved_output = f"output/predictions_{timestamp}.csv"
-
-    env = os.environ.copy()
-    env["INPUT_CSV"] = str(upload_path)
-    env["RUN_HISTORY_PATH"] = str(RUN_HISTORY_PATH)
-    env["RUN_LIVE_PATH"] = str(RUN_LIVE_PATH)
-    env["OUTPUT_CSV"] = resolved_output
-    if csv_mode:
-        env["CSV_MODE"] = csv_mode
-    if text_col:
-        env["TEXT_COL"] = text_col
-    if text_col_index is not None:
-        env["TEXT_COL_INDEX"] = str(text_col_index)
-    if group_col_index is not None:
-        env["GROUP_COL_INDEX"] = str(group_col_index)
-    if model_name:
-        env["MODEL_NAME"] = model_name
-    if batch_size is not None:
-        env["BATCH_SIZE"] = str(batch_size)
-    if max_len is not None:
-        env["MAX_LEN"] = str(max_len)
-    if max_rows is not None:
-        env["MAX_ROWS"] = str(max_rows)
-    if metrics_port is not None:
-        env["METRICS_PORT"] = str(metrics_port)
-
-    summary_path = _summary_path_for_output(resolved_output)
-    _write_live_snapshot(
-        {
-            "status": "starting",
-            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
-            "input_csv": str(upload_path),
-            "output_csv": resolved_output,
-            "text_col": text_col or os.getenv("TEXT_COL", "Text"),
-            "model_name": model_name or os.getenv("MODEL_NAME", ""),
-            "batch_size": batch_size or int(os.getenv("BATCH_SIZE", "32")),
-            "max_len": max_len or int(os.getenv("MAX_LEN", "256")),
-            "max_rows": max_rows,
-            "metrics_port": metrics_port,
-            "rows_seen": 0,
-            "processed": 0,
-            "failed": 0,
-            "avg_score": 0,
-            "positive": 0,
-            "negative": 0,
-            "neutral": 0,
-            "runtime_s": 0,
-        }
-    )
-
-    RUN_LOG_DIR.mkdir(parents=True, exist_ok=True)
-    log_path = RUN_LOG_DIR / f"{timestamp}.log"
-    log_file = log_path.open("a", encoding="utf-8")
-
-    global _current_process, _current_log_path, _current_log_file
-    _current_process = subprocess.Popen(
-        [sys.executable, "-m", "app.main"],
-        cwd=str(BASE_DIR),
-        env=env,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-    )
-    _current_log_path = log_path
-    _current_log_file = log_file
-
-    threading.Thread(target=_stream_process_output, args=(_current_process, log_file), daemon=True).start()
-    threading.Thread(target=_watch_process, args=(_current_process,), daemon=True).start()
-
-    return JSONResponse(
-        {
-            "status": "started",
-            "input_csv": str(upload_path),
-            "output_csv": resolved_output,
-            "pid": _current_process.pid,
-            "summary_path": str(summary_path),
-            "log_path": str(log_path),
-        }
-    )
+    job_id = new_job_id()
+    try:
+        resolved_output = _resolve_output(output_csv, output_format, job_id)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    upload_path = _upload_path(file.filename, job_id)
+
+    # Copy in chunks: the upload is never held in memory as a whole
+    with upload_path.open("wb") as f:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            f.write(chunk)
+
+    options = {
+        "csv_mode": csv_mode,
+        "text_col": text_col,
+        "text_col_index": text_col_index,
+        "group_col_index": group_col_index,
+        "model_name": model_name,
+        "batch_size": batch_size,
+        "max_len": max_len,
+        "max_rows": max_rows,
+        "metrics_port": metrics_port,
+        "output_format": output_format,
+        "id_col": id_col,
+    }
+    try:
+        job = _submit_run(job_id, upload_path, resolved_output, options)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=409)
+    return JSONResponse(_job_response(job))
+
+
+# Streaming upload: the CSV is the raw request body and the run options are
+# query parameters, e.g.
+#   curl -T big.csv 'localhost:8000/api/run/stream?filename=big.csv&text_col=Text'
+# The job is queued right away, so a free slot starts the runner (and loads the
+# model) while the first bytes arrive; it reads the upload as it is written to
+# disk, and the .done marker tells it where the input ends. The response comes
+# once the upload is in.
+@app.post("/api/run/stream")
+async def run_job_stream(
+    request: Request,
+    filename: Optional[str] = Query(default=None),
+    output_csv: Optional[str] = Query(default=None),
+    csv_mode: Optional[str] = Query(default=None),
+    text_col: Optional[str] = Query(default=None),
+    text_col_index: Optional[int] = Query(default=None),
+    group_col_index: Optional[int] = Query(default=None),
+    model_name: Optional[str] = Query(default=None),
+    batch_size: Optional[int] = Query(default=None),
+    max_len: Optional[int] = Query(default=None),
+    max_rows: Optional[int] = Query(default=None),
+    metrics_port: Optional[int] = Query(default=None),
+    output_format: Optional[str] = Query(default=None),
+    id_col: Optional[str] = Query(default=None),
+) -> JSONResponse:
+    job_id = new_job_id()
+    try:
+        resolved_output = _resolve_output(output_csv, output_format, job_id)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    upload_path = _upload_path(filename, job_id)
+    upload_path.write_bytes(b"")
+
+    options = {
+        "csv_mode": csv_mode,
+        "text_col": text_col,
+        "text_col_index": text_col_index,
+        "group_col_index": group_col_index,
+        "model_name": model_name,
+        "batch_size": batch_size,
+        "max_len": max_len,
+        "max_rows": max_rows,
+        "metrics_port": metrics_port,
+        "output_format": output_format,
+        "id_col": id_col,
+    }
+    try:
+        job = _submit_run(job_id, upload_path, resolved_output, options, follow=True)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=409)
+    received = 0
+    try:
+        with upload_path.open("ab") as f:
+            async for chunk in request.stream():
+                f.write(chunk)
+                # Flush each chunk so the runner sees it right away
+                f.flush()
+                received += len(chunk)
+    except Exception:
+        # Client went away mid-upload: the input is incomplete, so stop the run
+        _scheduler.cancel(job.id)
+        return JSONResponse({"error": "Upload interrupted", "bytes": received}, status_code=400)
+    mark_input_done(upload_path)
+    return JSONResponse({**_job_response(job), "bytes": received})
 
 
 @app.get("/api/predictions")
 def get_predictions(
     path: Optional[str] = Query(default=None),
     limit: int = Query(default=200, ge=0, le=10000),
+    offset: int = Query(default=0, ge=0),
+    label: Optional[str] = Query(default=None),
+    min_score: Optional[float] = Query(default=None),
+    max_score: Optional[float] = Query(default=None),
 ) -> JSONResponse:
     target = Path(path) if path else Path(os.getenv("OUTPUT_CSV", "output/predictions.csv"))
-    rows = _read_predictions(target, limit)
-    return JSONResponse({"count": len(rows), "rows": rows, "path": str(target)})
+    try:
+        total, rows = _read_predictions(
+            target, offset, limit, label=label, min_score=min_score, max_score=max_score
+        )
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse(
+        {"count": len(rows), "total": total, "offset": offset, "rows": rows, "path": str(target)}
+    )
 
 
 @app.get("/api/summary")
@@ -397,42 +627,130 @@ def get_summary(
     return JSONResponse({"summary": summary, "path": str(target)})
 
 
+@app.get("/api/jobs")
+def list_jobs() -> JSONResponse:
+    jobs = [_job_response(job) for job in _scheduler.jobs()]
+    warm = _warm_pool.info() if _warm_pool is not None else None
+    return JSONResponse({"jobs": jobs, **_scheduler.counts(), "warm_pool": warm})
+
+
+def _job_or_404(job_id: str) -> Job | JSONResponse:
+    job = _scheduler.get(job_id)
+    if job is None:
+        return JSONResponse({"error": f"Unknown job: {job_id}"}, status_code=404)
+    return job
+
+
+@app.get("/api/jobs/{job_id}")
+def job_status(job_id: str) -> JSONResponse:
+    job = _job_or_404(job_id)
+    if isinstance(job, JSONResponse):
+        return job
+    _, live = job.live()
+    return JSONResponse({**_job_response(job), "live": live, "log_tail": _tail_file(job.log_path)})
+
+
+@app.get("/api/jobs/{job_id}/live/stream")
+async def job_live_stream(job_id: str) -> StreamingResponse | JSONResponse:
+    job = _job_or_404(job_id)
+    if isinstance(job, JSONResponse):
+        return job
+    broadcaster = _job_broadcasters.get(job_id)
+    if broadcaster is None or not broadcaster.active:
+        # Idle broadcasters of finished jobs are dropped as new streams start
+        for stale in [k for k, b in _job_broadcasters.items() if not b.active]:
+            del _job_broadcasters[stale]
+        live_path = job.live_path
+        broadcaster = _job_broadcasters[job_id] = _LiveBroadcaster(lambda: live_path)
+    return _stream_live(broadcaster)
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+def cancel_job(job_id: str) -> JSONResponse:
+    job = _job_or_404(job_id)
+    if isinstance(job, JSONResponse):
+        return job
+    # Blocks up to a few seconds while a running job shuts down
+    _scheduler.cancel(job_id)
+    return JSONResponse(_job_response(job))
+
+
+# Single-run views kept for the dashboard: they act on the most recently
+# submitted job
 @app.get("/api/run/status")
 def run_status() -> JSONResponse:
-    running = _is_running()
-    log_tail = _tail_file(_current_log_path) if _current_log_path else ""
+    job = _scheduler.latest()
+    log_path = job.log_path if job is not None else None
     return JSONResponse(
         {
-            "running": running,
-            "pid": _current_process.pid if _current_process else None,
-            "log_tail": log_tail,
-            "log_path": str(_current_log_path) if _current_log_path else None,
+            "running": job is not None and job.status in ACTIVE,
+            "job_id": job.id if job is not None else None,
+            "status": job.status if job is not None else "idle",
+            "pid": job.process.pid if job is not None and job.process is not None else None,
+            "log_tail": _tail_file(log_path) if log_path else "",
+            "log_path": str(log_path) if log_path else None,
+            "scheduler": _scheduler.counts(),
         }
     )
 
 
 @app.post("/api/run/cancel")
 def cancel_run() -> JSONResponse:
-    if not _is_running():
+    job = _scheduler.latest()
+    if job is None or job.status not in ACTIVE:
         return JSONResponse({"status": "idle"})
-    assert _current_process is not None
-    _current_process.terminate()
+    _scheduler.cancel(job.id)
+    return JSONResponse({"status": "cancelled", "job_id": job.id})
+
+
+def _online_batcher() -> MicroBatcher:
+    # The model loads on the first /api/predict, not with the dashboard
+    global _online
+    with _online_lock:
+        if _online is None:
+            from app.inference import load_sentiment_pipeline, predict_batch
+
+            nlp = load_sentiment_pipeline(
+                PREDICT_MODEL_NAME,
+                PREDICT_MAX_LEN,
+                backend=PREDICT_BACKEND,
+                prepared_dir=PREPARED_MODEL_DIR,
+            )
+            _online = MicroBatcher(nlp, predict_batch, PREDICT_MAX_BATCH, PREDICT_MAX_WAIT_MS / 1000)
+        return _online
+
+
+# Body: {"text": "..."} or {"texts": ["...", ...]}
+@app.post("/api/predict")
+async def predict(request: Request) -> JSONResponse:
     try:
-        _current_process.wait(timeout=5)
-    except subprocess.TimeoutExpired:
-        _current_process.kill()
-    _write_live_snapshot(
-        {
-            "status": "cancelled",
-            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
-            "rows_seen": 0,
-            "processed": 0,
-            "failed": 0,
-            "runtime_s": 0,
-        }
-    )
-    return JSONResponse({"status": "cancelled"})
+        body = await request.json()
+    except ValueError:
+        return JSONResponse({"error": "Body must be JSON"}, status_code=400)
+    single = isinstance(body, dict) and "text" in body
+    texts = [body["text"]] if single else (body.get("texts") if isinstance(body, dict) else None)
+    if not isinstance(texts, list) or not texts or not all(isinstance(t, str) for t in texts):
+        return JSONResponse({"error": "Expected \"text\" or a non-empty \"texts\" list of strings"}, status_code=400)
+    if len(texts) > PREDICT_MAX_TEXTS:
+        return JSONResponse(
+            {"error": f"At most {PREDICT_MAX_TEXTS} texts per request; submit a batch job for more"},
+            status_code=413,
+        )
+    try:
+        batcher = await asyncio.to_thread(_online_batcher)
+    except Exception as e:
+        return JSONResponse({"error": f"Model failed to load: {e}"}, status_code=503)
+    try:
+        predictions = (await asyncio.wrap_future(batcher.submit(texts))).to_dicts()
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+    if single:
+        return JSONResponse({**predictions[0], "model_name": PREDICT_MODEL_NAME})
+    return JSONResponse({"predictions": predictions, "model_name": PREDICT_MODEL_NAME})
+
 
+# Prometheus scrape endpoint for the API process (online scoring histograms)
+app.mount("/metrics", make_asgi_app())
 
 if DASHBOARD_DIST.exists():
     app.mount("/", StaticFiles(directory=DASHBOARD_DIST, html=True), name="dashboard")
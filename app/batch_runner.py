@@ -1,113 +1,270 @@
 from __future__ import annotations
 
-import csv
 import time
-from typing import Any, Dict, List
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+
+from app.run_tracking import RunStats
+from app.summary import GroupStats
+from app.cache import PredictionCache
+from app.dedup import TextDeduplicator
+from app.live import LiveMetricsPublisher
+from app.output import OutputWriter
+from app.predictions import NEGATIVE, POSITIVE, Predictions, as_predictions, label_kinds
+
+# Serve what we can from the cache and only send the misses to the model.
+# Returns predictions in the same order as texts, plus the number of hits.
+def _predict_with_cache(
+    nlp,
+    predict_fn,
+    texts: List[str],
+    cache: PredictionCache,
+) -> tuple[Predictions, int]:
+    cached = cache.get_many(texts)
+    labels = np.empty(len(texts), dtype=object)
+    scores = np.zeros(len(texts), dtype=np.float64)
+    miss_idx: List[int] = []
+    for i, hit in enumerate(cached):
+        if hit is None:
+            miss_idx.append(i)
+        else:
+            labels[i], scores[i] = hit["label"], hit["score"]
+    if miss_idx:
+        miss_texts = [texts[i] for i in miss_idx]
+        fresh = as_predictions(predict_fn(nlp, miss_texts))
+        if len(fresh) != len(miss_idx):
+            raise ValueError(f"Expected {len(miss_idx)} predictions, got {len(fresh)}")
+        cache.put_many(miss_texts, fresh.to_dicts())
+        labels[miss_idx] = fresh.labels
+        scores[miss_idx] = fresh.scores
+    return Predictions(labels, scores), len(texts) - len(miss_idx)
+
+
+@dataclass
+class BatchResult:
+    rows: List[Dict[str, str]]
+    predictions: Predictions | None = None
+    error: str | None = None
+    duration_s: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    deduped: int = 0
+
+
+# Inference half of a batch: no output or RunStats changes happen here, so it
+# can run on a different thread than record_batch (see app/stages.py).
+def run_batch_inference(
+    batch_rows: List[Dict[str, str]],
+    *,
+    nlp,
+    predict_fn,
+    text_col: str,
+    cache: PredictionCache | None = None,
+    dedup: TextDeduplicator | None = None,
+) -> BatchResult:
+    # Prepare texts (rows are already sanitized/validated)
+    texts: List[str] = []
+    for r in batch_rows:
+        texts.append((r.get(text_col) or "").strip())
+
+    result = BatchResult(rows=batch_rows)
+    batch_start = time.time()
+    try:
+        # Get predictions (repeated texts are only sent downstream once)
+        def downstream(unique_texts: List[str]) -> Predictions:
+            if cache is None:
+                return as_predictions(predict_fn(nlp, unique_texts))
+            predictions, hits = _predict_with_cache(nlp, predict_fn, unique_texts, cache)
+            result.cache_hits += hits
+            result.cache_misses += len(unique_texts) - hits
+            return predictions
+
+        if dedup is not None:
+            result.predictions, result.deduped = dedup.predict(texts, downstream)
+        else:
+            result.predictions = downstream(texts)
+        if len(result.predictions) != len(texts):
+            raise ValueError(f"Expected {len(texts)} predictions, got {len(result.predictions)}")
+    except Exception as e:
+        result.predictions = None
+        result.error = str(e)
+    finally:
+        result.duration_s = time.time() - batch_start
+    return result
+
+
+# Output half of a batch: writes rows and updates stats, metrics and group
+# stats, then tells the live publisher there is something new to show.
+# A failed batch marks all of its rows with the error.
+def record_batch(
+    result: BatchResult,
+    *,
+    writer: OutputWriter,
+    metrics,
+    stats: RunStats,
+    text_col: str,
+    headers: set[str],
+    group_col: str | None,
+    group_stats: GroupStats,
+    live: LiveMetricsPublisher | None = None,
+) -> None:
+    valid_rows = result.rows
+    try:
+        if result.error is not None or result.predictions is None:
+            error = result.error or "prediction failed"
+            # Report failure for all rows in the batch
+            for r in valid_rows:
+                writer.write_error(r, error)
+            stats.failed += len(valid_rows)
+            metrics.inc_failed(len(valid_rows))
+            if len(stats.error_samples) < 5:
+                stats.error_samples.append(error)
+            metrics.inc_batches()
+            return
+
+        if result.cache_hits or result.cache_misses:
+            stats.cache_hits += result.cache_hits
+            stats.cache_misses += result.cache_misses
+            metrics.inc_cache_hits(result.cache_hits)
+            metrics.inc_cache_misses(result.cache_misses)
+        stats.deduped += result.deduped
+        metrics.inc_processed(len(valid_rows))
+        metrics.inc_batches()
+        _record_predictions(
+            valid_rows,
+            result.predictions,
+            writer=writer,
+            stats=stats,
+            text_col=text_col,
+            headers=headers,
+            group_col=group_col,
+            group_stats=group_stats,
+        )
+    finally:
+        writer.end_batch()
+        # Always record batch duration
+        metrics.observe_batch_duration(result.duration_s)
+        if live is not None:
+            live.touch()
 
-from app.run_tracking import (
-    RunStats, 
-    write_live_metrics,
-    build_live_metrics_payload
-)
-from app.summary import update_group_stats
-from app.config import Settings
 
 # What does this method do?
 # Use the NLP pipeline created, along with the predict function
 # Predict function is decoupled to allow easier testing and flexibility
 # The predict function takes the pipeline and list of texts, returns predictions
-
 def process_batch(
     batch_rows: List[Dict[str, str]],
     *,
     nlp,
     predict_fn,
-    writer: csv.DictWriter,
+    writer: OutputWriter,
     metrics,
-    settings: Settings,
     stats: RunStats,
     text_col: str,
     headers: set[str],
     group_col: str | None,
-    group_stats: Dict[str, Dict[str, float]],
-    dataset_type: str,
-    start: float,
+    group_stats: GroupStats,
+    live: LiveMetricsPublisher | None = None,
+    cache: PredictionCache | None = None,
+    dedup: TextDeduplicator | None = None,
 ) -> None:
-    # Prepare texts (rows are already sanitized/validated)
-    texts: List[str] = []
-    valid_rows: List[Dict[str, str]] = batch_rows
+    result = run_batch_inference(
+        batch_rows,
+        nlp=nlp,
+        predict_fn=predict_fn,
+        text_col=text_col,
+        cache=cache,
+        dedup=dedup,
+    )
+    record_batch(
+        result,
+        writer=writer,
+        metrics=metrics,
+        stats=stats,
+        text_col=text_col,
+        headers=headers,
+        group_col=group_col,
+        group_stats=group_stats,
+        live=live,
+    )
 
-    for r in valid_rows:
-        texts.append((r.get(text_col) or "").strip())
 
-    batch_start = time.time()
-    try:
-        # Get predictions
-        predictions = predict_fn(nlp, texts)
-        metrics.inc_processed(len(valid_rows))
-        metrics.inc_batches()
-    except Exception as e:
-        # Report failure for all rows in the batch
-        for r in valid_rows:
-            out: Dict[str, Any] = {
-                text_col: r.get(text_col, ""),
-                "label": "",
-                "score": "",
-                "error": str(e),
-            }
-            writer.writerow(out)
-        stats.failed += len(valid_rows)
-        metrics.inc_failed(len(valid_rows))
-        if len(stats.error_samples) < 5:
-            stats.error_samples.append(str(e))
-        metrics.inc_batches()
-        return
-    finally:
-        # Always record batch duration
-        metrics.observe_batch_duration(time.time() - batch_start)
-        write_live_metrics(
-            settings.run_live_path,
-            build_live_metrics_payload(
-                settings,
-                status="running",
-                text_col=text_col,
-                stats=stats,
-                runtime_s=round(time.time() - start, 3),
-                dataset_type=dataset_type,
-                group_col=group_col,
-            ),
+# Several batches at once: inference for each runs on the executor and the
+# results are recorded in order. Every batch succeeds or fails on its own, so
+# the rows marked failed are the same as running them one after another.
+# Predictions match too, but the deduped and cache hit counts are approximate:
+# a text shared by two batches in flight may be sent to the model by both.
+def process_batches(
+    batches: List[List[Dict[str, str]]],
+    *,
+    executor: Executor,
+    nlp,
+    predict_fn,
+    writer: OutputWriter,
+    metrics,
+    stats: RunStats,
+    text_col: str,
+    headers: set[str],
+    group_col: str | None,
+    group_stats: GroupStats,
+    live: LiveMetricsPublisher | None = None,
+    cache: PredictionCache | None = None,
+    dedup: TextDeduplicator | None = None,
+) -> None:
+    futures = [
+        executor.submit(
+            run_batch_inference,
+            rows,
+            nlp=nlp,
+            predict_fn=predict_fn,
+            text_col=text_col,
+            cache=cache,
+            dedup=dedup,
+        )
+        for rows in batches
+    ]
+    for future in futures:
+        record_batch(
+            future.result(),
+            writer=writer,
+            metrics=metrics,
+            stats=stats,
+            text_col=text_col,
+            headers=headers,
+            group_col=group_col,
+            group_stats=group_stats,
+            live=live,
         )
 
-    # Process predictions
-    for r, prediction in zip(valid_rows, predictions):
-        label = prediction.get("label", "")
-        score = prediction.get("score", "")
-        label_norm = (label or "").lower()
-        try:
-            score_val = float(score)
-        except (TypeError, ValueError):
-            score_val = 0.0
-            
-        # Update stats
-        stats.score_sum += score_val
-        if "pos" in label_norm:
-            stats.positive += 1
-        elif "neg" in label_norm:
-            stats.negative += 1
-        else:
-            stats.neutral += 1
-            
-        # Write output row and update group stats too
-        out = {
-            text_col: r.get(text_col, ""),
-            "label": label,
-            "score": score,
-            "error": "",
-        }
-        writer.writerow(out)
-
-        if group_col and group_col in headers:
-            group_value = (r.get(group_col) or "").strip() or "(unknown)"
-            update_group_stats(group_stats, group_value, label, score_val)
+
+def _record_predictions(
+    valid_rows: List[Dict[str, str]],
+    predictions: Predictions,
+    *,
+    writer: OutputWriter,
+    stats: RunStats,
+    text_col: str,
+    headers: set[str],
+    group_col: str | None,
+    group_stats: GroupStats,
+) -> None:
+    # Stats for the whole batch come from a few array reductions
+    kinds = label_kinds(predictions.labels)
+    counts = np.bincount(kinds, minlength=3)
+    stats.positive += int(counts[POSITIVE])
+    stats.negative += int(counts[NEGATIVE])
+    stats.neutral += len(valid_rows) - int(counts[POSITIVE]) - int(counts[NEGATIVE])
+    stats.score_sum += float(predictions.scores.sum())
+
+    writer.write_predictions(valid_rows, predictions)
+
+    if group_col and group_col in headers:
+        group_ids = group_stats.group_ids(
+            [(r.get(group_col) or "").strip() or "(unknown)" for r in valid_rows]
+        )
+        group_stats.add(group_ids, kinds, predictions.scores)
 
     stats.processed += len(valid_rows)
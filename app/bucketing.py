@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from typing import Any, Callable, List, Sequence
+
+from app.predictions import Prediction, Predictions, as_predictions, unscatter
+
+PredictFn = Callable[[Any, List[str]], Predictions | Sequence[Prediction]]
+LengthFn = Callable[[Any, List[str]], List[int]]
+
+
+def length_buckets(lengths: List[int], batch_size: int) -> List[List[int]]:
+    # Indices sorted by length (stable, so ties keep file order), then chunked
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+# Wrap a predict function so a large window of texts is run as length-sorted
+# batches of batch_size. Similar lengths end up together, so short texts are not
+# padded out to the longest text in the window. Results come back in input order.
+def bucketed_predict(predict_fn: PredictFn, batch_size: int, length_fn: LengthFn) -> PredictFn:
+    def predict(nlp, texts: List[str]) -> Predictions:
+        buckets = length_buckets(length_fn(nlp, texts), batch_size)
+        parts = [as_predictions(predict_fn(nlp, [texts[i] for i in bucket])) for bucket in buckets]
+        return unscatter(buckets, parts)
+
+    return predict
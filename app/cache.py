@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.run_tracking import ensure_parent_dir
+
+logger = logging.getLogger("batch_infer")
+
+Prediction = Dict[str, Any]
+
+# Persistent prediction cache backed by SQLite (stdlib, single file on disk).
+# Keys are content hashes, so the same text scored by the same model/max_len
+# is never sent through the model twice, even across runs and re-uploads.
+# Eviction is LRU by a monotonically increasing "last_used" tick.
+
+
+def normalize_text(text: str) -> str:
+    # Whitespace runs and unicode forms do not change what the tokenizer sees
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model_name: str, max_len: int, text: str) -> str:
+    raw = f"{model_name}\x00{max_len}\x00{normalize_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class PredictionCache:
+    def __init__(self, path: Path, model_name: str, max_len: int, max_entries: int) -> None:
+        if max_entries <= 0:
+            raise ValueError("max_entries must be > 0")
+        ensure_parent_dir(path)
+        self.path = path
+        self.model_name = model_name
+        self.max_len = max_len
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            " key TEXT PRIMARY KEY,"
+            " label TEXT NOT NULL,"
+            " score REAL NOT NULL,"
+            " last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_predictions_last_used ON predictions(last_used)"
+        )
+        self._conn.commit()
+        row = self._conn.execute("SELECT COUNT(*), COALESCE(MAX(last_used), 0) FROM predictions").fetchone()
+        self._size = int(row[0])
+        self._tick = int(row[1])
+
+    def _keys(self, texts: List[str]) -> List[str]:
+        return [cache_key(self.model_name, self.max_len, t) for t in texts]
+
+    def get_many(self, texts: List[str]) -> List[Prediction | None]:
+        # Returns one entry per text; None marks a miss
+        if not texts:
+            return []
+        keys = self._keys(texts)
+        found: Dict[str, Prediction] = {}
+        try:
+            with self._lock:
+                unique = list(dict.fromkeys(keys))
+                # SQLite caps bound parameters per statement; stay well below it
+                for i in range(0, len(unique), 500):
+                    chunk = unique[i:i + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    for key, label, score in self._conn.execute(
+                        f"SELECT key, label, score FROM predictions WHERE key IN ({placeholders})",
+                        chunk,
+                    ):
+                        found[key] = {"label": label, "score": score}
+                if found:
+                    self._tick += 1
+                    self._conn.executemany(
+                        "UPDATE predictions SET last_used = ? WHERE key = ?",
+                        [(self._tick, key) for key in found],
+                    )
+                    self._conn.commit()
+        except sqlite3.Error:
+            logger.exception("Prediction cache read failed", extra={"cache_path": str(self.path)})
+            return [None] * len(texts)
+        return [found.get(key) for key in keys]
+
+    def contains_many(self, texts: List[str]) -> List[bool]:
+        # Presence only; unlike get_many this does not count as a use
+        if not texts:
+            return []
+        keys = self._keys(texts)
+        found: set[str] = set()
+        try:
+            with self._lock:
+                unique = list(dict.fromkeys(keys))
+                for i in range(0, len(unique), 500):
+                    chunk = unique[i:i + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    found.update(
+                        key for (key,) in self._conn.execute(
+                            f"SELECT key FROM predictions WHERE key IN ({placeholders})", chunk
+                        )
+                    )
+        except sqlite3.Error:
+            logger.exception("Prediction cache read failed", extra={"cache_path": str(self.path)})
+            return [False] * len(texts)
+        return [key in found for key in keys]
+
+    def put_many(self, texts: List[str], predictions: List[Prediction]) -> None:
+        if not texts:
+            return
+        rows = []
+        for key, prediction in zip(self._keys(texts), predictions):
+            try:
+                score = float(prediction.get("score", 0.0))
+            except (TypeError, ValueError):
+                continue
+            rows.append((key, str(prediction.get("label", "")), score))
+        if not rows:
+            return
+        try:
+            with self._lock:
+                self._tick += 1
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO predictions (key, label, score, last_used) VALUES (?, ?, ?, ?)",
+                    [(key, label, score, self._tick) for key, label, score in rows],
+                )
+                self._size += self._conn.total_changes - before
+                if self._size > self.max_entries:
+                    self._evict(self._size - self.max_entries)
+                self._conn.commit()
+        except sqlite3.Error:
+            logger.exception("Prediction cache write failed", extra={"cache_path": str(self.path)})
+
+    def _evict(self, n: int) -> None:
+        self._conn.execute(
+            "DELETE FROM predictions WHERE key IN ("
+            " SELECT key FROM predictions ORDER BY last_used ASC LIMIT ?)",
+            (n,),
+        )
+        self._size -= n
+
+    def __len__(self) -> int:
+        return self._size
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def open_prediction_cache(
+    path: Path | None,
+    model_name: str,
+    max_len: int,
+    max_entries: int,
+) -> PredictionCache | None:
+    if path is None:
+        return None
+    try:
+        return PredictionCache(path, model_name, max_len, max_entries)
+    except sqlite3.Error:
+        # A broken cache must never block a run; fall back to no caching
+        logger.exception("Failed to open prediction cache", extra={"cache_path": str(path)})
+        return None
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict
+
+from app.run_tracking import RunStats, run_stats_from_dict, run_stats_to_dict, write_json_atomic
+from app.summary import GroupStats, group_stats_from_dict, group_stats_to_dict
+
+logger = logging.getLogger("batch_infer")
+
+# Checkpoints for resumable runs (CHECKPOINT_EVERY / RESUME).
+# A checkpoint is only committed between batches, after the output has been
+# flushed to disk, so input_offset, output_pos and the stats always agree:
+# resuming truncates the output to output_pos, seeks the input to
+# input_offset and carries on with the saved stats.
+
+
+@dataclass
+class Checkpoint:
+    input_csv: str
+    input_size: int
+    input_mtime_ns: int
+    input_offset: int
+    output_pos: int
+    stats: RunStats
+    group_stats: GroupStats
+
+
+def checkpoint_path(output_csv: Path) -> Path:
+    return output_csv.with_name(f"{output_csv.stem}_checkpoint.json")
+
+
+def input_identity(input_csv: Path) -> Dict[str, Any]:
+    st = input_csv.stat()
+    return {"input_csv": str(input_csv), "input_size": st.st_size, "input_mtime_ns": st.st_mtime_ns}
+
+
+def write_checkpoint(path: Path, checkpoint: Checkpoint) -> None:
+    write_json_atomic(
+        path,
+        {
+            "input_csv": checkpoint.input_csv,
+            "input_size": checkpoint.input_size,
+            "input_mtime_ns": checkpoint.input_mtime_ns,
+            "input_offset": checkpoint.input_offset,
+            "output_pos": checkpoint.output_pos,
+            "stats": run_stats_to_dict(checkpoint.stats),
+            "group_stats": group_stats_to_dict(checkpoint.group_stats),
+        },
+    )
+
+
+def read_checkpoint(path: Path) -> Checkpoint | None:
+    if not path.exists():
+        return None
+    record = json.loads(path.read_text(encoding="utf-8"))
+    return Checkpoint(
+        input_csv=record["input_csv"],
+        input_size=int(record["input_size"]),
+        input_mtime_ns=int(record["input_mtime_ns"]),
+        input_offset=int(record["input_offset"]),
+        output_pos=int(record["output_pos"]),
+        stats=run_stats_from_dict(record["stats"]),
+        group_stats=group_stats_from_dict(record["group_stats"]),
+    )
+
+
+def matches_input(checkpoint: Checkpoint, input_csv: Path) -> bool:
+    identity = input_identity(input_csv)
+    return (
+        checkpoint.input_size == identity["input_size"]
+        and checkpoint.input_mtime_ns == identity["input_mtime_ns"]
+    )
@@ -28,11 +28,37 @@ def _get_optional_int(name: str) -> int | None:
         raise ValueError(f"{name} must be an int, got: {raw!r}") from e
 
 
+def _get_optional_float(name: str) -> float | None:
+    raw = os.getenv(name, "").strip()
+    if raw == "":
+        return None
+    try:
+        return float(raw)
+    except ValueError as e:
+        raise ValueError(f"{name} must be a number, got: {raw!r}") from e
+
+
 def _get_str(name: str, default: str) -> str:
     raw = os.getenv(name, "").strip()
     return raw if raw else default
 
 
+def _get_bool(name: str, default: bool) -> bool:
+    raw = os.getenv(name, "").strip().lower()
+    if raw == "":
+        return default
+    if raw in {"1", "true", "yes", "on"}:
+        return True
+    if raw in {"0", "false", "no", "off"}:
+        return False
+    raise ValueError(f"{name} must be a boolean (1/0, true/false), got: {raw!r}")
+
+
+def _get_optional_path(name: str) -> Path | None:
+    raw = os.getenv(name, "").strip()
+    return Path(raw) if raw else None
+
+
 # Freeze so that settings are immutable; helps avoid accidental changes.
 @dataclass(frozen=True)
 class Settings:
@@ -47,8 +73,36 @@ class Settings:
     max_rows: int | None
     model_name: str
     batch_size: int
+    sort_window: int | None
+    max_batch_tokens: int | None
+    pipeline: bool
+    pipeline_workers: int
+    pipeline_queue_size: int
+    workers: int
+    worker_threads: int | None
+    shard_index: int | None
+    shard_count: int | None
+    checkpoint_every: int | None
+    resume: bool
     max_len: int
     metrics_port: int | None
+    cache_path: Path | None
+    cache_max_entries: int
+    dedup_max_entries: int
+    backend: str
+    onnx_cache_dir: Path
+    onnx_opset: int
+    quantize: str | None
+    quant_cache_dir: Path
+    prepared_model_dir: Path
+    csv_engine: str
+    output_format: str
+    id_col: str | None
+    live_interval_ms: int
+    live_file_interval_ms: int
+    input_follow: bool
+    input_idle_timeout_s: int
+    dispatched_at: float | None
 
 
 def load_settings() -> Settings:
@@ -82,6 +136,53 @@ def load_settings() -> Settings:
     if batch_size <= 0:
         raise ValueError("BATCH_SIZE must be > 0")
 
+    sort_window = _get_optional_int("SORT_WINDOW")
+    if sort_window is not None and sort_window < batch_size:
+        raise ValueError("SORT_WINDOW must be >= BATCH_SIZE")
+
+    # Token budget per batch; BATCH_SIZE stays the upper bound on rows
+    max_batch_tokens = _get_optional_int("MAX_BATCH_TOKENS")
+    if max_batch_tokens is not None and max_batch_tokens <= 0:
+        raise ValueError("MAX_BATCH_TOKENS must be > 0")
+    if max_batch_tokens is not None and sort_window is not None:
+        raise ValueError("MAX_BATCH_TOKENS cannot be combined with SORT_WINDOW")
+
+    pipeline = _get_bool("PIPELINE", False)
+    if pipeline and max_batch_tokens is not None:
+        raise ValueError("PIPELINE cannot be combined with MAX_BATCH_TOKENS")
+    pipeline_workers = _get_int("PIPELINE_WORKERS", 2)
+    if pipeline_workers <= 0:
+        raise ValueError("PIPELINE_WORKERS must be > 0")
+    pipeline_queue_size = _get_int("PIPELINE_QUEUE_SIZE", 8)
+    if pipeline_queue_size <= 0:
+        raise ValueError("PIPELINE_QUEUE_SIZE must be > 0")
+
+    workers = _get_int("WORKERS", 1)
+    if workers <= 0:
+        raise ValueError("WORKERS must be > 0")
+    if workers > 1 and (pipeline or max_batch_tokens is not None):
+        raise ValueError("WORKERS > 1 cannot be combined with PIPELINE or MAX_BATCH_TOKENS")
+    worker_threads = _get_optional_int("WORKER_THREADS")
+    if worker_threads is not None and worker_threads <= 0:
+        raise ValueError("WORKER_THREADS must be > 0")
+
+    shard_index = _get_optional_int("SHARD_INDEX")
+    shard_count = _get_optional_int("SHARD_COUNT")
+    if (shard_index is None) != (shard_count is None):
+        raise ValueError("SHARD_INDEX and SHARD_COUNT must be set together")
+    if shard_count is not None and shard_count <= 0:
+        raise ValueError("SHARD_COUNT must be > 0")
+    if shard_index is not None and shard_count is not None and not (0 <= shard_index < shard_count):
+        raise ValueError("SHARD_INDEX must be in 0..SHARD_COUNT-1")
+
+    # Commit a checkpoint every N batches; RESUME=1 continues from the last one
+    checkpoint_every = _get_optional_int("CHECKPOINT_EVERY")
+    if checkpoint_every is not None and checkpoint_every <= 0:
+        raise ValueError("CHECKPOINT_EVERY must be > 0")
+    if checkpoint_every is not None and pipeline:
+        raise ValueError("CHECKPOINT_EVERY cannot be combined with PIPELINE")
+    resume = _get_bool("RESUME", False)
+
     max_len = _get_int("MAX_LEN", 256)
     if max_len <= 0:
         raise ValueError("MAX_LEN must be > 0")
@@ -94,6 +195,80 @@ def load_settings() -> Settings:
     if metrics_port is not None and not (1 <= metrics_port <= 65535):
         raise ValueError("METRICS_PORT must be in 1..65535")
 
+    cache_path = _get_optional_path("CACHE_PATH")
+    cache_max_entries = _get_int("CACHE_MAX_ENTRIES", 1_000_000)
+    if cache_max_entries <= 0:
+        raise ValueError("CACHE_MAX_ENTRIES must be > 0")
+
+    dedup_max_entries = _get_int("DEDUP_MAX_ENTRIES", 100_000)
+    if dedup_max_entries < 0:
+        raise ValueError("DEDUP_MAX_ENTRIES must be >= 0")
+
+    # BACKEND=onnx serves the model through ONNX Runtime; the exported graph is
+    # cached under ONNX_CACHE_DIR per model and opset
+    backend = _get_str("BACKEND", "torch").lower()
+    if backend not in {"torch", "onnx"}:
+        raise ValueError("BACKEND must be 'torch' or 'onnx'")
+    onnx_cache_dir = Path(_get_str("ONNX_CACHE_DIR", "output/onnx"))
+    onnx_opset = _get_int("ONNX_OPSET", 17)
+    if onnx_opset < 9:
+        raise ValueError("ONNX_OPSET must be >= 9")
+
+    # QUANTIZE=int8 applies dynamic int8 quantization to the linear layers
+    quantize = _get_str("QUANTIZE", "").lower() or None
+    if quantize not in {None, "int8"}:
+        raise ValueError("QUANTIZE must be 'int8' or empty")
+    quant_cache_dir = Path(_get_str("QUANT_CACHE_DIR", "output/quantized"))
+    # Artifacts written by `python -m app.model_artifact`; used when one exists
+    # for MODEL_NAME (torch backend, no quantization)
+    prepared_model_dir = Path(_get_str("PREPARED_MODEL_DIR", "output/prepared"))
+
+    # CSV_ENGINE=pyarrow parses input blocks with pyarrow (optional dependency)
+    csv_engine = _get_str("CSV_ENGINE", "python").lower()
+    if csv_engine not in {"python", "pyarrow"}:
+        raise ValueError("CSV_ENGINE must be 'python' or 'pyarrow'")
+
+    # OUTPUT_FORMAT=parquet|arrow writes typed columnar output (needs pyarrow);
+    # a .csv OUTPUT_CSV gets the matching suffix
+    output_format = _get_str("OUTPUT_FORMAT", "csv").lower()
+    suffixes = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+    if output_format not in suffixes:
+        raise ValueError("OUTPUT_FORMAT must be one of: csv, parquet, arrow")
+    if output_format != "csv":
+        if output_csv.suffix.lower() == ".csv":
+            output_csv = output_csv.with_suffix(suffixes[output_format])
+        if checkpoint_every is not None or resume:
+            raise ValueError("CHECKPOINT_EVERY/RESUME require OUTPUT_FORMAT=csv")
+        if shard_count is not None:
+            raise ValueError("SHARD_COUNT requires OUTPUT_FORMAT=csv")
+    # ID_COL copies an input column (e.g. a record id) into the output
+    id_col = _get_str("ID_COL", "") or None
+
+    # Minimum time between live state updates (published in the background):
+    # to the shared-memory channel, and to the live_metrics.json snapshot
+    live_interval_ms = _get_int("LIVE_INTERVAL_MS", 250)
+    if live_interval_ms < 0:
+        raise ValueError("LIVE_INTERVAL_MS must be >= 0")
+    live_file_interval_ms = _get_int("LIVE_FILE_INTERVAL_MS", 5000)
+    if live_file_interval_ms < 0:
+        raise ValueError("LIVE_FILE_INTERVAL_MS must be >= 0")
+
+    # INPUT_FOLLOW=1 reads INPUT_CSV while it is still being written, until
+    # "<INPUT_CSV>.done" appears; INPUT_CSV=- (stdin) and FIFOs are always
+    # read to EOF this way. Either way the input is read once, front to back.
+    input_follow = _get_bool("INPUT_FOLLOW", False)
+    input_idle_timeout_s = _get_int("INPUT_IDLE_TIMEOUT_S", 300)
+    if input_idle_timeout_s <= 0:
+        raise ValueError("INPUT_IDLE_TIMEOUT_S must be > 0")
+    if (input_follow or str(input_csv) == "-") and (
+        shard_count is not None or checkpoint_every is not None or resume
+    ):
+        raise ValueError("INPUT_FOLLOW and INPUT_CSV=- cannot be combined with SHARD_COUNT, CHECKPOINT_EVERY or RESUME")
+
+    # Epoch time the scheduler handed this run to a runner; time to first
+    # prediction is measured from here (else from the runner's own start)
+    dispatched_at = _get_optional_float("RUN_DISPATCHED_AT")
+
     return Settings(
         input_csv=input_csv,
         output_csv=output_csv,
@@ -106,6 +281,34 @@ def load_settings() -> Settings:
         max_rows=max_rows,
         model_name=model_name,
         batch_size=batch_size,
+        sort_window=sort_window,
+        max_batch_tokens=max_batch_tokens,
+        pipeline=pipeline,
+        pipeline_workers=pipeline_workers,
+        pipeline_queue_size=pipeline_queue_size,
+        workers=workers,
+        worker_threads=worker_threads,
+        shard_index=shard_index,
+        shard_count=shard_count,
+        checkpoint_every=checkpoint_every,
+        resume=resume,
         max_len=max_len,
         metrics_port=metrics_port,
+        cache_path=cache_path,
+        cache_max_entries=cache_max_entries,
+        dedup_max_entries=dedup_max_entries,
+        backend=backend,
+        onnx_cache_dir=onnx_cache_dir,
+        onnx_opset=onnx_opset,
+        quantize=quantize,
+        quant_cache_dir=quant_cache_dir,
+        prepared_model_dir=prepared_model_dir,
+        csv_engine=csv_engine,
+        output_format=output_format,
+        id_col=id_col,
+        live_interval_ms=live_interval_ms,
+        live_file_interval_ms=live_file_interval_ms,
+        input_follow=input_follow,
+        input_idle_timeout_s=input_idle_timeout_s,
+        dispatched_at=dispatched_at,
     )
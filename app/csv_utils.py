@@ -1,75 +1,82 @@
 from __future__ import annotations
 
+import codecs
 import csv
-import itertools
+import importlib.util
 import logging
+import mmap
+import os
+import re
+import sys
 from pathlib import Path
-from typing import Dict, Iterable, IO, List, Tuple
+from typing import Callable, Dict, IO, Iterable, Iterator, List, Tuple
 from app.config import Settings
+from app.follow import FollowInput, is_pipe
 
 logger = logging.getLogger("batch_infer")
 
 
 RowResult = Tuple[Dict[str, str] | None, str | None]
 
+# Input is read through a read-only mmap of the file. Record boundaries are
+# found on raw bytes, each record is split into cells on a latin-1 view (a
+# 1:1 byte mapping, so delimiters and quotes land exactly where they are in
+# the file), and only the cells that are actually used are decoded with the
+# file's real encoding. The encoding is picked once from samples spread over
+# the file. This only works for ASCII-compatible encodings, which covers the
+# utf-8 and latin-1 files we accept.
 
-def _sanitize_row(row: Dict[str, str], text_col: str) -> RowResult:
-    sanitized: Dict[str, str] = {}
-    for key, value in row.items():
-        if key is None:
-            continue
-        if value is None:
-            sanitized[key] = ""
-        else:
-            sanitized[key] = str(value).strip()
-
-    if not sanitized:
-        return None, "skipped_row"
-
-    if all(value == "" for value in sanitized.values()):
-        return None, "skipped_row"
-
-    text_value = sanitized.get(text_col, "").strip()
-    if text_value == "":
-        return None, "missing_text"
+Decoder = Callable[[str], str]
 
-    return sanitized, None
 
+# Only the text column (and the group and ID columns, if any) is ever used
+# downstream, so rows are projected straight from the parsed cell list instead
+# of building a dict of every stripped column. Blank-row detection still looks
+# at every cell, but only for rows whose text is empty.
+class RowProjector:
+    def __init__(
+        self,
+        fieldnames: List[str],
+        text_col: str,
+        group_col_index: int | None,
+        headerless: bool,
+        id_col: str | None = None,
+        decode: Decoder | None = None,
+    ) -> None:
+        self.width = len(fieldnames)
+        self.headerless = headerless
+        self.text_col = text_col
+        # Duplicate header names resolve to the last column, as in DictReader
+        self.text_idx = len(fieldnames) - 1 - fieldnames[::-1].index(text_col)
+        self.group_col = None if group_col_index is None else fieldnames[group_col_index]
+        self.group_idx = group_col_index
+        self.id_col = id_col
+        self.id_idx = None if id_col is None else fieldnames.index(id_col)
+        self.decode = decode
 
-def _build_reader(
-    f_in: IO[str],
-    s: Settings,
-) -> Tuple[Iterable[RowResult], List[str], str] | None:
-    raw_reader = csv.reader(f_in)
-    first_row = next(raw_reader, None)
-    if first_row is None:
-        logger.error("CSV is empty")
-        return None
+    def __call__(self, row: List[str]) -> RowResult:
+        decode = self.decode
+        text = row[self.text_idx] if self.text_idx < len(row) else ""
+        text = (decode(text) if decode is not None else text).strip()
+        if not text:
+            # Cells past the header width are ignored, as DictReader files them under None
+            cells = row[:self.width]
+            if not any(cell.strip() for cell in (map(decode, cells) if decode is not None else cells)):
+                return None, "skipped_row"
+            if self.id_col is None:
+                return None, "missing_text"
+            # The ID still goes out with the error row
+            cell = row[self.id_idx] if self.id_idx < len(row) else ""  # type: ignore[operator]
+            return {self.id_col: (decode(cell) if decode is not None else cell).strip()}, "missing_text"
+        out = {self.text_col: text}
+        for name, idx in ((self.group_col, self.group_idx), (self.id_col, self.id_idx)):
+            if name is not None:
+                cell = row[idx] if idx < len(row) else ""  # type: ignore[operator]
+                out[name] = (decode(cell) if decode is not None else cell).strip()
+        return out, None
 
-    headerless_mode = False
-    if s.csv_mode == "header":
-        f_in.seek(0)
-        reader = csv.DictReader(f_in)
-        fieldnames = [cell.strip() for cell in (reader.fieldnames or [])]
-    elif s.csv_mode == "headerless":
-        headerless_mode = True
-        fieldnames = [f"col_{i}" for i in range(len(first_row))]
-        data_iter = itertools.chain([first_row], raw_reader)
-        width = len(fieldnames)
-
-        def _pad_row(row: List[str]) -> List[str]:
-            if len(row) < width:
-                return row + [""] * (width - len(row))
-            return row[:width]
-
-        reader = (
-            {name: value for name, value in zip(fieldnames, _pad_row(row))}
-            for row in data_iter
-        )
-    else:
-        logger.error("CSV_MODE must be header or headerless", extra={"csv_mode": s.csv_mode})
-        return None
 
+def _resolve_text_col(fieldnames: List[str], s: Settings, headerless_mode: bool) -> str | None:
     headers = set(fieldnames)
     if s.group_col_index is not None:
         if not (0 <= s.group_col_index < len(fieldnames)):
@@ -78,6 +85,9 @@ def _build_reader(
                 extra={"group_col_index": s.group_col_index, "field_count": len(fieldnames)},
             )
             return None
+    if s.id_col is not None and s.id_col not in headers:
+        logger.error("ID_COL not found in CSV headers", extra={"id_col": s.id_col, "headers": fieldnames})
+        return None
     if headerless_mode:
         if s.text_col_index is None:
             logger.error("Headerless CSV requires TEXT_COL_INDEX (0-based).")
@@ -88,48 +98,563 @@ def _build_reader(
                 extra={"text_col_index": s.text_col_index, "field_count": len(fieldnames)},
             )
             return None
-        text_col = fieldnames[s.text_col_index]
+        return fieldnames[s.text_col_index]
+    text_col = s.text_col
+    if text_col not in headers:
+        logger.error("TEXT_COL not found in CSV headers", extra={"text_col": text_col, "headers": list(headers)})
+        return None
+    return text_col
+
+
+def _looks_utf8(chunk: bytes, at_start: bool) -> bool:
+    if not at_start:
+        # Skip continuation bytes of a character cut by the sample boundary
+        skip = 0
+        while skip < min(3, len(chunk)) and chunk[skip] & 0xC0 == 0x80:
+            skip += 1
+        chunk = chunk[skip:]
+    try:
+        # final=False tolerates a character cut at the end of the sample
+        codecs.getincrementaldecoder("utf-8")().decode(chunk, final=False)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def detect_encoding(buf, samples: int = 16, sample_size: int = 64 * 1024) -> Tuple[str, int]:
+    # Returns (encoding, bytes to skip for a BOM). Samples are spread over the
+    # whole file, so a stray latin-1 byte deep in a big upload is still seen
+    # up front rather than failing the run halfway through.
+    size = len(buf)
+    if buf[:3] == codecs.BOM_UTF8:
+        return "utf-8", 3
+    if size <= samples * sample_size:
+        offsets = [0]
+        sample_size = size
     else:
-        text_col = s.text_col
-        if text_col not in headers:
-            logger.error("TEXT_COL not found in CSV headers", extra={"text_col": text_col, "headers": list(headers)})
+        step = (size - sample_size) // (samples - 1)
+        offsets = [i * step for i in range(samples)]
+    for offset in offsets:
+        if not _looks_utf8(buf[offset:offset + sample_size], at_start=offset == 0):
+            return "latin-1", 0
+    return "utf-8", 0
+
+
+def _field_decoder(encoding: str) -> Decoder | None:
+    if encoding == "latin-1":
+        # The latin-1 view already is the decoded text
+        return None
+
+    def decode(cell: str) -> str:
+        if cell.isascii():
+            return cell
+        raw = cell.encode("latin-1")
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            # A byte the samples missed; keep the latin-1 reading of this cell
+            return cell
+
+    return decode
+
+
+# Record boundaries on raw bytes
+# A record is a line, extended while a quoted field is still open at its end.
+# Quotes are tracked the way the csv module reads them: a quote opens a field
+# only at the start of a cell, and "" inside a quoted field is an escaped quote.
+# A range owns every record that *starts* inside it, so neighbouring ranges
+# never overlap or drop rows. A range start is moved to the first record start
+# at or after it by looking at the bytes just past it (see _align_start).
+
+
+def ends_in_quotes(line: bytes, in_quotes: bool) -> bool:
+    i = line.find(b'"')
+    while i != -1:
+        if in_quotes:
+            if line[i + 1:i + 2] == b'"':
+                i = line.find(b'"', i + 2)
+                continue
+            in_quotes = False
+        elif i == 0 or line[i - 1:i] == b",":
+            in_quotes = True
+        i = line.find(b'"', i + 1)
+    return in_quotes
+
+
+# Lines end in \n or \r\n, except in files saved with old Mac line endings,
+# which use a lone \r. The first line ending in the file decides.
+def detect_newline(head: bytes) -> bytes:
+    cr, lf = head.find(b"\r"), head.find(b"\n")
+    if cr != -1 and (lf == -1 or cr < lf) and head[cr + 1:cr + 2] not in (b"\n", b""):
+        return b"\r"
+    return b"\n"
+
+
+# Records as the csv module reads them: a quote opens a field only at its
+# start, "" inside quotes is a literal quote, and text after a closing quote
+# runs on to the next delimiter. Possessive repeats keep the match linear.
+_FIELD = rb'(?:"(?:[^"]|"")*+"[^,\r\n]*+|[^,\r\n"][^,\r\n]*+|)'
+_RECORDS = {
+    newline: re.compile(rb"(?:" + _FIELD + rb"(?:," + _FIELD + rb")*+" + end + rb")*+")
+    for newline, end in ((b"\n", rb"\r?\n"), (b"\r", rb"\r"))
+}
+
+# Local resync. In well-formed CSV every quote flips the in-quotes state, so
+# the state at a byte follows from the quote count since any byte whose state
+# is known. An odd run of quotes between a delimiter or line end and a plain
+# character can only open a field; one between a plain character and a
+# delimiter or line end can only close one. Two such hints past the boundary
+# pin its state, and an odd run between two plain characters (a stray quote
+# the csv module reads as text) makes the count unreliable.
+_OPENS_OR_CLOSES = re.compile(rb'[,\r\n]((?:"")*")[^,\r\n"]|[^,\r\n"]((?:"")*")[,\r\n]')
+_STRAY_QUOTE = re.compile(rb'[^,\r\n"](?:"")*"[^,\r\n"]')
+_RESYNC_WINDOW = 1 << 20
+
+
+def _quote_state(buf, pos: int) -> bool | None:
+    # Whether byte pos is inside a quoted field, from the next _RESYNC_WINDOW
+    # bytes; None if they cannot tell
+    limit = min(len(buf), pos + _RESYNC_WINDOW)
+    if buf.find(b'"', pos, limit) == -1:
+        # No quoted field is that long without a quote in it
+        return False
+    if _STRAY_QUOTE.search(buf, pos, limit):
+        return None
+    states: List[bool] = []
+    for m in _OPENS_OR_CLOSES.finditer(buf, pos, limit):
+        closes = m.group(1) is None
+        run = m.start(2) if closes else m.start(1)
+        # Outside before an opening run, inside before a closing one
+        states.append(closes ^ bool(buf[pos:run].count(b'"') & 1))
+        if len(states) == 2:
+            break
+    return states[0] if states and all(state == states[0] for state in states) else None
+
+
+def _align_exact(buf, start: int, data_start: int, newline: bytes) -> int:
+    # Matches whole records from the top of the file: exact, but reads
+    # everything before start. The regex runs in C up to the last record
+    # ending at or before start; the rest is walked record by record
+    pos = _RECORDS[newline].match(buf, data_start, start).end()
+    for pos, _ in _iter_raw_records(buf, pos, None, pos, newline):
+        if pos >= start:
+            return pos
+    return len(buf)
+
+
+def _align_start(buf, start: int, data_start: int, newline: bytes = b"\n") -> int:
+    if start <= data_start:
+        return start
+    # Step back one byte: if start is already a record start, this only skips
+    # the line ending before it
+    pos = start - 1
+    in_quotes = _quote_state(buf, pos)
+    if in_quotes is None:
+        logger.warning("Quoting near a shard boundary is ambiguous; scanning from the top of the file",
+                       extra={"offset": start})
+        return _align_exact(buf, start, data_start, newline)
+    while True:
+        nl = buf.find(newline, pos)
+        if nl == -1:
+            return len(buf)
+        in_quotes ^= bool(buf[pos:nl].count(b'"') & 1)
+        if not in_quotes:
+            return nl + 1
+        pos = nl + 1
+
+
+def _iter_raw_records(
+    buf, start: int, end: int | None, data_start: int = 0, newline: bytes = b"\n"
+) -> Iterator[Tuple[int, bytes]]:
+    size = len(buf)
+    pos = _align_start(buf, start, data_start, newline)
+    limit = size if end is None else min(end, size)
+    while pos < limit:
+        nl = buf.find(newline, pos)
+        stop = size if nl == -1 else nl + 1
+        record = buf[pos:stop]
+        if b'"' in record and ends_in_quotes(record, False):
+            in_quotes = True
+            while in_quotes and stop < size:
+                nl = buf.find(newline, stop)
+                more = buf[stop:size if nl == -1 else nl + 1]
+                in_quotes = ends_in_quotes(more, True)
+                record += more
+                stop += len(more)
+        yield pos, record
+        pos = stop
+
+
+def _parse_record(raw: bytes) -> List[str]:
+    return next(csv.reader([raw.decode("latin-1")]), [])
+
+
+def shard_byte_range(size: int, data_start: int, index: int, count: int) -> Tuple[int, int]:
+    span = max(size - data_start, 0)
+    return data_start + span * index // count, data_start + span * (index + 1) // count
+
+
+class ByteRangeReader:
+    # Yields RowResults for records starting in [start, end). `offset` is the
+    # byte position just after the last record handed out, so a caller can
+    # checkpoint or resume exactly there.
+    # The range is fed to csv.reader as latin-1 lines cut from large blocks of
+    # the mapping. csv.reader pulls exactly the lines of one record before
+    # yielding it, so the bytes consumed so far are that record's end offset.
+    def __init__(
+        self,
+        buf,
+        start: int,
+        end: int | None,
+        project: RowProjector,
+        data_start: int = 0,
+        newline: bytes = b"\n",
+        block_size: int = 1 << 20,
+    ) -> None:
+        self._buf = buf
+        self._start = _align_start(buf, start, data_start, newline)
+        self._newline = newline.decode("latin-1")
+        self._end = len(buf) if end is None else min(end, len(buf))
+        self._project = project
+        self._block_size = block_size
+        self._consumed = self._start
+        self.offset = self._start
+
+    def _lines(self) -> Iterator[str]:
+        buf, size, block, newline = self._buf, len(self._buf), self._block_size, self._newline
+        pos = self._start
+        carry = ""
+        while pos < size:
+            chunk = carry + buf[pos:pos + block].decode("latin-1")
+            pos += block
+            lines = chunk.split(newline)
+            carry = lines.pop()
+            for line in lines:
+                self._consumed += len(line) + 1
+                yield line + newline
+        if carry:
+            self._consumed += len(carry)
+            yield carry
+
+    def __iter__(self) -> Iterator[RowResult]:
+        headerless = self._project.headerless
+        project = self._project
+        end = self._end
+        for row in csv.reader(self._lines()):
+            # offset is where this record started; stop once that leaves the range
+            if self.offset >= end:
+                break
+            self.offset = self._consumed
+            if not row and not headerless:
+                # DictReader skips blank lines without yielding a row
+                continue
+            yield project(row)
+
+
+class StreamReader(ByteRangeReader):
+    # ByteRangeReader over input that is still arriving (app.follow). Blocks
+    # come from read() calls, which wait for more data, and csv.reader only
+    # gets complete lines, so a record cut mid-upload is held back until the
+    # rest of it arrives. `offset` counts bytes from where the stream started.
+    def __init__(
+        self,
+        f_bin: IO[bytes],
+        project: RowProjector,
+        newline: bytes = b"\n",
+        block_size: int = 1 << 20,
+    ) -> None:
+        self._file = f_bin
+        self._newline = newline.decode("latin-1")
+        self._start = 0
+        self._end = sys.maxsize
+        self._project = project
+        self._block_size = block_size
+        self._consumed = 0
+        self.offset = 0
+
+    def _lines(self) -> Iterator[str]:
+        carry, newline = "", self._newline
+        while block := self._file.read(self._block_size):
+            lines = (carry + block.decode("latin-1")).split(newline)
+            carry = lines.pop()
+            for line in lines:
+                self._consumed += len(line) + 1
+                yield line + newline
+        if carry:
+            self._consumed += len(carry)
+            yield carry
+
+
+class MappedInput:
+    # The open file, its mapping and its line ending; close() releases both
+    def __init__(self, f_bin: IO[bytes], buf: mmap.mmap) -> None:
+        self.file = f_bin
+        self.buf = buf
+        self.newline = detect_newline(buf[:64 * 1024])
+
+    def close(self) -> None:
+        self.buf.close()
+        self.file.close()
+
+
+def _arrow_reader(
+    f_bin: IO[bytes],
+    encoding: str,
+    project: RowProjector,
+    fallback: Callable[[], Iterable[RowResult]],
+) -> Iterator[RowResult]:
+    # CSV_ENGINE=pyarrow: blocks are parsed in C++ and only the projected
+    # columns are turned into Python strings. pyarrow cannot parse rows with
+    # the wrong number of fields, nor say where in a block they were, so the
+    # first one switches the rest of the input to the python engine:
+    # fallback() reads from the first data row and the rows already yielded
+    # are skipped.
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+
+    names = [f"c{i}" for i in range(project.width)]
+    invalid = [0]
+
+    def on_invalid(_row) -> str:
+        invalid[0] += 1
+        return "skip"
+
+    stream = pacsv.open_csv(
+        f_bin,
+        read_options=pacsv.ReadOptions(
+            column_names=names,
+            skip_rows=0 if project.headerless else 1,
+            block_size=4 * 1024 * 1024,
+            encoding=encoding,
+        ),
+        parse_options=pacsv.ParseOptions(
+            newlines_in_values=True,
+            ignore_empty_lines=not project.headerless,
+            invalid_row_handler=on_invalid,
+        ),
+        convert_options=pacsv.ConvertOptions(
+            column_types={name: pa.string() for name in names},
+            strings_can_be_null=False,
+            quoted_strings_can_be_null=False,
+        ),
+    )
+    yielded = 0
+    for batch in stream:
+        if invalid[0]:
+            # Every row yielded so far came from earlier, well-formed blocks
+            logger.info("Input has rows with a different number of fields; "
+                        "reading the rest with the csv module")
+            rows = iter(fallback())
+            for _ in range(yielded):
+                next(rows)
+            yield from rows
+            return
+        yielded += batch.num_rows
+        texts = pc.utf8_trim_whitespace(batch.column(project.text_idx)).to_pylist()
+        extra = [
+            (name, pc.utf8_trim_whitespace(batch.column(idx)).to_pylist())
+            for name, idx in ((project.group_col, project.group_idx), (project.id_col, project.id_idx))
+            if name is not None
+        ]
+        # The ID column comes last; error rows keep it too
+        ids = extra[-1][1] if project.id_col is not None else None
+        blank = None
+        if "" in texts:
+            mask = pc.equal(pc.utf8_trim_whitespace(batch.column(0)), "")
+            for column in batch.columns[1:]:
+                mask = pc.and_(mask, pc.equal(pc.utf8_trim_whitespace(column), ""))
+            blank = mask.to_pylist()
+        for i, text in enumerate(texts):
+            if text:
+                out = {project.text_col: text}
+                for name, values in extra:
+                    out[name] = values[i]
+                yield out, None
+            elif blank is not None and blank[i]:
+                yield None, "skipped_row"
+            elif ids is not None:
+                yield {project.id_col: ids[i]}, "missing_text"
+            else:
+                yield None, "missing_text"
+
+
+def _setup_columns(
+    raw_first: bytes,
+    encoding: str,
+    bom: int,
+    s: Settings,
+) -> Tuple[List[str], str, RowProjector, int] | None:
+    # Field names, text column and projector from the first record, plus the
+    # offset where data rows start
+    first_row = next(csv.reader([raw_first.decode(encoding, errors="replace")]), [])
+    if s.csv_mode == "header":
+        headerless_mode = False
+        fieldnames = [cell.strip() for cell in first_row]
+        data_start = bom + len(raw_first)
+    elif s.csv_mode == "headerless":
+        headerless_mode = True
+        fieldnames = [f"col_{i}" for i in range(len(first_row))]
+        data_start = bom
+    else:
+        logger.error("CSV_MODE must be header or headerless", extra={"csv_mode": s.csv_mode})
+        return None
+
+    text_col = _resolve_text_col(fieldnames, s, headerless_mode)
+    if text_col is None:
+        return None
+    project = RowProjector(
+        fieldnames,
+        text_col,
+        s.group_col_index,
+        headerless_mode,
+        s.id_col,
+        decode=_field_decoder(encoding),
+    )
+    return fieldnames, text_col, project, data_start
+
+
+def _open_mapped(
+    input_path: Path,
+    s: Settings,
+) -> Tuple[MappedInput, List[str], str, RowProjector, str, int] | None:
+    f_in = input_path.open("rb")
+    if os.fstat(f_in.fileno()).st_size == 0:
+        logger.error("CSV is empty")
+        f_in.close()
+        return None
+    mapped = MappedInput(f_in, mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ))
+    try:
+        buf = mapped.buf
+        encoding, bom = detect_encoding(buf)
+        if encoding != "utf-8":
+            logger.info("Input is not valid UTF-8; reading it as latin-1",
+                        extra={"input_csv": str(input_path)})
+        first = next(_iter_raw_records(buf, bom, None, bom, mapped.newline), None)
+        if first is None:
+            logger.error("CSV is empty")
+            mapped.close()
+            return None
+        _, raw_first = first
+        columns = _setup_columns(raw_first, encoding, bom, s)
+        if columns is None:
+            mapped.close()
             return None
+        fieldnames, text_col, project, data_start = columns
+        return mapped, fieldnames, text_col, project, encoding, data_start
+    except Exception:
+        mapped.close()
+        raise
 
-    def sanitized_reader() -> Iterable[RowResult]:
-        for row in reader:
-            yield _sanitize_row(row, text_col)
 
-    return sanitized_reader(), fieldnames, text_col
+def _read_first_record(source: FollowInput, block_size: int = 64 * 1024) -> bytes:
+    # Everything read until the first record is complete (or input ended)
+    buf = b""
+    while True:
+        block = source.read(block_size)
+        if not block:
+            return buf
+        buf += block
+        bom = 3 if buf[:3] == codecs.BOM_UTF8 else 0
+        newline = detect_newline(buf)
+        first = next(_iter_raw_records(buf, bom, None, bom, newline), None)
+        if first is not None and first[1].endswith(newline) and not ends_in_quotes(first[1], False):
+            return buf
+
+
+def open_csv_stream(
+    input_path: Path,
+    s: Settings,
+) -> Tuple[Iterable[RowResult], List[str], str, FollowInput] | None:
+    # Input that is still being written: the encoding is picked from the first
+    # block only, and non-UTF-8 cells further in fall back to latin-1 one by one
+    source = FollowInput(input_path, s.input_idle_timeout_s)
+    try:
+        head = _read_first_record(source)
+        if not head.strip():
+            logger.error("CSV is empty")
+            source.close()
+            return None
+        bom = 3 if head[:3] == codecs.BOM_UTF8 else 0
+        encoding = "utf-8" if bom or _looks_utf8(head, at_start=True) else "latin-1"
+        newline = detect_newline(head)
+        _, raw_first = next(_iter_raw_records(head, bom, None, bom, newline))
+        columns = _setup_columns(raw_first, encoding, bom, s)
+        if columns is None:
+            source.close()
+            return None
+        fieldnames, text_col, project, data_start = columns
+        if s.csv_engine == "pyarrow" and importlib.util.find_spec("pyarrow") is not None:
+            if is_pipe(input_path):
+                # A pipe cannot be read again if pyarrow has to fall back
+                logger.warning("CSV_ENGINE=pyarrow cannot read from a pipe; using the csv module")
+            else:
+                decode, project.decode = project.decode, None
+                source.unread(head)
+
+                def fallback() -> Iterator[RowResult]:
+                    project.decode = decode
+                    again = FollowInput(input_path, s.input_idle_timeout_s)
+                    try:
+                        skip = data_start
+                        while skip and (block := again.read(skip)):
+                            skip -= len(block)
+                        yield from StreamReader(again, project, newline)
+                    finally:
+                        again.close()
+
+                return _arrow_reader(source, encoding, project, fallback), fieldnames, text_col, source
+        source.unread(head[data_start:])
+        return StreamReader(source, project, newline), fieldnames, text_col, source
+    except Exception:
+        source.close()
+        raise
 
 
 def process_csv(
     input_path: Path,
     s: Settings,
-) -> Tuple[Iterable[RowResult], List[str], str, IO[str]] | None:
-    # Encoding fallback: try utf-8, then latin-1 - some CSVs may have non-utf8 chars
-    for encoding in ("utf-8", "latin-1"):
-        f_in: IO[str] | None = None
-        try:
-            f_in = input_path.open("r", newline="", encoding=encoding)
-            processed = _build_reader(f_in, s)
-            if processed is None:
-                f_in.close()
-                return None
-            reader, fieldnames, text_col = processed
-            return reader, fieldnames, text_col, f_in
-        except UnicodeDecodeError:
-            if f_in:
-                f_in.close()
-            logger.warning(
-                "UTF-8 decode failed; retrying with latin-1",
-                extra={"input_csv": str(input_path), "encoding": encoding},
-            )
-            continue
-        except Exception:
-            if f_in:
-                f_in.close()
-            raise
+) -> Tuple[Iterable[RowResult], List[str], str, MappedInput | FollowInput] | None:
+    if s.input_follow or is_pipe(input_path):
+        return open_csv_stream(input_path, s)
+    opened = _open_mapped(input_path, s)
+    if opened is None:
+        return None
+    mapped, fieldnames, text_col, project, encoding, data_start = opened
+    if s.csv_engine == "pyarrow":
+        if importlib.util.find_spec("pyarrow") is None:
+            logger.warning("CSV_ENGINE=pyarrow but pyarrow is not installed; using the csv module")
+        else:
+            # pyarrow reads from the file itself; the mapping is only needed
+            # if it falls back to the csv module
+            decode, project.decode = project.decode, None
+            mapped.file.seek(0)
+
+            def fallback() -> ByteRangeReader:
+                project.decode = decode
+                return ByteRangeReader(mapped.buf, data_start, None, project, data_start, mapped.newline)
+
+            return _arrow_reader(mapped.file, encoding, project, fallback), fieldnames, text_col, mapped
+    reader = ByteRangeReader(mapped.buf, data_start, None, project, data_start, mapped.newline)
+    return reader, fieldnames, text_col, mapped
 
-    logger.error("Failed to decode CSV with supported encodings", extra={"input_csv": str(input_path)})
-    return None
 
+def open_csv_range(
+    input_path: Path,
+    s: Settings,
+    shard_index: int = 0,
+    shard_count: int = 1,
+    resume_offset: int | None = None,
+) -> Tuple[ByteRangeReader, List[str], str, MappedInput] | None:
+    if s.csv_engine == "pyarrow":
+        logger.warning("CSV_ENGINE=pyarrow does not track byte offsets; "
+                       "sharded and checkpointed runs use the csv module")
+    opened = _open_mapped(input_path, s)
+    if opened is None:
+        return None
+    mapped, fieldnames, text_col, project, _, data_start = opened
+    start, end = shard_byte_range(len(mapped.buf), data_start, shard_index, shard_count)
+    if resume_offset is not None:
+        start = max(start, resume_offset)
+    reader = ByteRangeReader(mapped.buf, start, end, project, data_start, mapped.newline)
+    return reader, fieldnames, text_col, mapped
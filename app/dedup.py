@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from app.predictions import Prediction, Predictions, as_predictions
+
+PredictUnique = Callable[[List[str]], Predictions | Sequence[Prediction]]
+
+# Text deduplication in front of the model.
+# Within a batch, each distinct text is predicted once and fanned back out to
+# every row that holds it. Across batches, a bounded memo of recent texts keeps
+# repeats (retweets, boilerplate reviews) from reaching the model again.
+
+
+class TextDeduplicator:
+    def __init__(self, max_entries: int) -> None:
+        if max_entries < 0:
+            raise ValueError("max_entries must be >= 0")
+        # max_entries=0 keeps in-batch dedup only
+        self.max_entries = max_entries
+        self._memo: OrderedDict[str, Tuple[str, float]] = OrderedDict()
+        # Batches from the worker pool path look up and remember concurrently
+        self._lock = threading.Lock()
+
+    def predict(
+        self,
+        texts: List[str],
+        predict_unique: PredictUnique,
+    ) -> tuple[Predictions, int]:
+        # Returns predictions aligned with texts, plus how many rows were
+        # answered without sending their text downstream
+        slots: Dict[str, int] = {}
+        inverse = np.fromiter(
+            (slots.setdefault(text, len(slots)) for text in texts), dtype=np.intp, count=len(texts)
+        )
+        unique = list(slots)
+        labels = np.empty(len(unique), dtype=object)
+        scores = np.zeros(len(unique), dtype=np.float64)
+        todo: List[int] = []
+        with self._lock:
+            for i, text in enumerate(unique):
+                hit = self._memo.get(text)
+                if hit is not None:
+                    self._memo.move_to_end(text)
+                    labels[i], scores[i] = hit
+                else:
+                    todo.append(i)
+
+        if todo:
+            todo_texts = [unique[i] for i in todo]
+            fresh = as_predictions(predict_unique(todo_texts))
+            if len(fresh) != len(todo):
+                raise ValueError(f"Expected {len(todo)} predictions, got {len(fresh)}")
+            labels[todo] = fresh.labels
+            scores[todo] = fresh.scores
+            with self._lock:
+                for text, label, score in zip(todo_texts, fresh.labels.tolist(), fresh.scores.tolist()):
+                    self._remember(text, (label, score))
+
+        return Predictions(labels[inverse], scores[inverse]), len(texts) - len(todo)
+
+    def _remember(self, text: str, prediction: Tuple[str, float]) -> None:
+        if self.max_entries == 0:
+            return
+        self._memo[text] = prediction
+        self._memo.move_to_end(text)
+        while len(self._memo) > self.max_entries:
+            self._memo.popitem(last=False)
+
+    def __contains__(self, text: str) -> bool:
+        # Whether text would be answered from the memo
+        with self._lock:
+            return text in self._memo
+
+    def __len__(self) -> int:
+        return len(self._memo)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import io
+import os
+import stat
+import sys
+import time
+from pathlib import Path
+
+# Input that is still arriving (INPUT_FOLLOW=1, a FIFO, or INPUT_CSV=- for stdin).
+# Reads block until more bytes show up instead of treating a momentary end of
+# file as the end of input. For a pipe, EOF is real: the writer closed its end.
+# For a growing regular file, the writer marks the end by creating an empty
+# "<input>.done" file once every byte is on disk (see mark_input_done); a file
+# that stops growing for INPUT_IDLE_TIMEOUT_S without one fails the run rather
+# than hanging it.
+
+STDIN_PATH = Path("-")
+
+
+def input_done_path(input_path: Path) -> Path:
+    return input_path.with_name(f"{input_path.name}.done")
+
+
+def mark_input_done(input_path: Path) -> None:
+    # Call after the last write has been flushed to the input file
+    input_done_path(input_path).touch()
+
+
+def is_pipe(input_path: Path) -> bool:
+    if input_path == STDIN_PATH:
+        return True
+    try:
+        return stat.S_ISFIFO(os.stat(input_path).st_mode)
+    except OSError:
+        return False
+
+
+class FollowInput(io.RawIOBase):
+    def __init__(self, input_path: Path, idle_timeout_s: float, poll_s: float = 0.05) -> None:
+        super().__init__()
+        self.path = input_path
+        self.idle_timeout_s = idle_timeout_s
+        self.poll_s = poll_s
+        self._pipe = is_pipe(input_path)
+        if input_path == STDIN_PATH:
+            self._fd = os.dup(sys.stdin.fileno())
+        else:
+            # Opening a FIFO blocks until its writer shows up
+            self._fd = os.open(input_path, os.O_RDONLY)
+        self._done_path = input_done_path(input_path)
+        # Bytes handed back with unread(), served before the file
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def unread(self, data: bytes) -> None:
+        self._pending = data + self._pending
+
+    def readinto(self, b) -> int:
+        if self._pending:
+            n = min(len(b), len(self._pending))
+            b[:n] = self._pending[:n]
+            self._pending = self._pending[n:]
+            return n
+        idle_since = time.monotonic()
+        while True:
+            data = os.read(self._fd, len(b))
+            if data or self._pipe:
+                b[:len(data)] = data
+                return len(data)
+            if self._done_path.exists():
+                # The marker is created after the last write, so one more read
+                # picks up anything that landed in between
+                data = os.read(self._fd, len(b))
+                b[:len(data)] = data
+                return len(data)
+            if time.monotonic() - idle_since > self.idle_timeout_s:
+                raise TimeoutError(
+                    f"{self.path} stopped growing for {self.idle_timeout_s:g}s "
+                    f"without {self._done_path.name}"
+                )
+            time.sleep(self.poll_s)
+
+    def close(self) -> None:
+        if not self.closed:
+            os.close(self._fd)
+        super().close()
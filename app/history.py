@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Tuple
+
+logger = logging.getLogger("batch_infer")
+
+# Indexed run history (SQLite, next to RUN_HISTORY_PATH as run_history.db).
+# run_history.jsonl stays the source of truth; every record is also inserted
+# here, keyed by the byte offset of its line in the JSONL (which also gives
+# file order). That makes backfill idempotent: it re-reads the file from its
+# last watermark and skips lines that are already stored. Backfill an existing history with:
+#   python -m app.history --history output/run_history.jsonl
+
+# Record fields with their own (indexed) columns, for field-level filters
+FILTER_FIELDS = ("model_name", "dataset_type", "input_csv", "text_col")
+
+
+def history_db_path(history_path: Path) -> Path:
+    return history_path.with_suffix(".db")
+
+
+class RunHistoryStore:
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " id INTEGER PRIMARY KEY,"
+            " line_offset INTEGER UNIQUE,"
+            " timestamp TEXT,"
+            " model_name TEXT,"
+            " dataset_type TEXT,"
+            " input_csv TEXT,"
+            " text_col TEXT,"
+            " search TEXT NOT NULL,"
+            " record TEXT NOT NULL)"
+        )
+        for column in ("timestamp", "model_name", "dataset_type"):
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_runs_{column} ON runs({column})")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+
+    @staticmethod
+    def _row(record: Dict[str, Any], line_offset: int | None) -> Tuple[Any, ...]:
+        text = json.dumps(record, ensure_ascii=False)
+        fields = [record.get(name) for name in FILTER_FIELDS]
+        # The search key is lowercased once here instead of on every query
+        return (line_offset, record.get("timestamp"), *fields, text.lower(), text)
+
+    def _insert(self, rows: List[Tuple[Any, ...]]) -> None:
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO runs"
+            " (line_offset, timestamp, model_name, dataset_type, input_csv, text_col, search, record)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+    def append(self, record: Dict[str, Any], line_offset: int | None = None) -> None:
+        with self._lock:
+            self._insert([self._row(record, line_offset)])
+            self._conn.commit()
+
+    def backfill(self, history_path: Path, chunk: int = 5000) -> int:
+        # Adds JSONL lines past the last watermark; returns how many were read
+        if not history_path.exists():
+            return 0
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'jsonl_offset'").fetchone()
+            start = int(row[0]) if row else 0
+            if history_path.stat().st_size < start:
+                # The file was truncated or replaced; rebuild from scratch
+                self._conn.execute("DELETE FROM runs")
+                start = 0
+            count = 0
+            rows: List[Tuple[Any, ...]] = []
+            with history_path.open("rb") as f:
+                f.seek(start)
+                offset = start
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        # A line still being written; pick it up next time
+                        break
+                    line_offset = offset
+                    offset += len(raw)
+                    try:
+                        record = json.loads(raw)
+                    except json.JSONDecodeError:
+                        continue
+                    if not isinstance(record, dict):
+                        continue
+                    rows.append(self._row(record, line_offset))
+                    count += 1
+                    if len(rows) >= chunk:
+                        self._insert(rows)
+                        rows = []
+            self._insert(rows)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('jsonl_offset', ?)", (str(offset),)
+            )
+            self._conn.commit()
+        return count
+
+    def query(
+        self,
+        q: str | None = None,
+        filters: Dict[str, str] | None = None,
+        since: str | None = None,
+        until: str | None = None,
+        limit: int = 200,
+        offset: int = 0,
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        # Newest first for paging: offset skips that many of the newest matches.
+        # The page itself comes back oldest first, like the JSONL.
+        where: List[str] = []
+        params: List[Any] = []
+        for name, value in (filters or {}).items():
+            if name not in FILTER_FIELDS:
+                raise ValueError(f"Unknown filter field: {name}")
+            where.append(f"{name} = ?")
+            params.append(value)
+        if since:
+            where.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            where.append("timestamp < ?")
+            params.append(until)
+        if q:
+            where.append("instr(search, ?) > 0")
+            params.append(q.lower())
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM runs{clause}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT record FROM runs{clause} ORDER BY line_offset DESC LIMIT ? OFFSET ?",
+                [*params, limit, offset],
+            ).fetchall()
+        return int(total), [json.loads(record) for (record,) in reversed(rows)]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# Tail-following cache of the newest runs, for the API.
+# Remembers the JSONL's inode and how far it has been read, so each refresh
+# parses only lines appended since the last one. The newest `capacity` runs are
+# kept with their lowercased search keys (the raw line, lowercased). A
+# different inode (rotation) or a shorter file (truncation) drops everything
+# and re-reads from the start. Skipped lines count towards `total` unparsed.
+class RunHistoryTail:
+    def __init__(self, path: Path, capacity: int) -> None:
+        self.path = path
+        self.capacity = capacity
+        self.total = 0
+        self._ring: Deque[Tuple[str, Dict[str, Any]]] = deque(maxlen=capacity)
+        self._inode: int | None = None
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def _reset(self) -> None:
+        self._ring.clear()
+        self.total = 0
+        self._offset = 0
+
+    def refresh(self) -> int:
+        # Returns how many new runs were read
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                self._reset()
+                self._inode = None
+                return 0
+            if st.st_ino != self._inode or st.st_size < self._offset:
+                self._reset()
+                self._inode = st.st_ino
+            if st.st_size == self._offset:
+                return 0
+            added = 0
+            with self.path.open("rb") as f:
+                f.seek(self._offset)
+                # On a big catch-up (e.g. the first call), lines that would
+                # fall straight out of the ring are only counted, not parsed
+                skip = self._count_lines(f) - self.capacity
+                f.seek(self._offset)
+                if skip > 0:
+                    self._offset += self._skip_lines(f, skip)
+                    self.total += skip
+                    f.seek(self._offset)
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        # A line still being written; pick it up next time
+                        break
+                    self._offset += len(raw)
+                    try:
+                        record = json.loads(raw)
+                    except json.JSONDecodeError:
+                        continue
+                    if not isinstance(record, dict):
+                        continue
+                    self._ring.append((raw.decode("utf-8", errors="replace").lower(), record))
+                    added += 1
+            self.total += added
+            return added + max(skip, 0)
+
+    @staticmethod
+    def _count_lines(f, block: int = 1 << 20) -> int:
+        count = 0
+        while chunk := f.read(block):
+            count += chunk.count(b"\n")
+        return count
+
+    @staticmethod
+    def _skip_lines(f, n: int, block: int = 1 << 20) -> int:
+        # Bytes taken up by the next n lines
+        consumed = 0
+        while chunk := f.read(block):
+            newlines = chunk.count(b"\n")
+            if newlines < n:
+                n -= newlines
+                consumed += len(chunk)
+                continue
+            pos = -1
+            for _ in range(n):
+                pos = chunk.index(b"\n", pos + 1)
+            return consumed + pos + 1
+        return consumed
+
+    def query(self, q: str | None, limit: int, offset: int = 0) -> Tuple[int, List[Dict[str, Any]]] | None:
+        # Same contract as RunHistoryStore.query, or None if the ring cannot answer
+        with self._lock:
+            complete = self.total == len(self._ring)
+            if q:
+                if not complete:
+                    # Older runs were dropped, so a search could miss matches
+                    return None
+                q_lower = q.lower()
+                matches = [record for key, record in self._ring if q_lower in key]
+                total = len(matches)
+            else:
+                if offset + limit > len(self._ring) and not complete:
+                    return None
+                matches = [record for _, record in self._ring]
+                total = self.total
+        end = len(matches) - offset
+        return total, matches[max(0, end - limit):max(0, end)]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Backfill the run history index from JSONL")
+    parser.add_argument("--history", default="output/run_history.jsonl", help="Path to run history JSONL")
+    args = parser.parse_args()
+    history_path = Path(args.history)
+    store = RunHistoryStore(history_db_path(history_path))
+    try:
+        added = store.backfill(history_path)
+        total, _ = store.query(limit=0)
+    finally:
+        store.close()
+    print(f"read {added} new lines; {total} runs indexed in {history_db_path(history_path)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,33 +1,310 @@
 from __future__ import annotations
 
-from typing import Any, List, Dict
+import inspect
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List
 
-from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+import numpy as np
+from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
 
+from app.model_artifact import has_prepared_model, load_prepared_pipeline, prepared_model_dir
+from app.predictions import Predictions
+
+logger = logging.getLogger("batch_infer")
+
+ONNX_OPSET = 17
 
-def load_sentiment_pipeline(model_name: str, max_len: int):
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForSequenceClassification.from_pretrained(model_name)
 
+def _safe_max_len(config, tokenizer, max_len: int) -> int:
     # Protect against very long inputs that exceed model/tokenizer limits
     safe_max_len = max_len
-    model_max = getattr(model.config, "max_position_embeddings", None)
+    model_max = getattr(config, "max_position_embeddings", None)
     if isinstance(model_max, int) and model_max > 0:
         safe_max_len = min(safe_max_len, model_max)
 
     tok_max = getattr(tokenizer, "model_max_length", None)
     if isinstance(tok_max, int) and 0 < tok_max < 1_000_000:
         safe_max_len = min(safe_max_len, tok_max)
+    return safe_max_len
+
+
+def load_sentiment_pipeline(
+    model_name: str,
+    max_len: int,
+    backend: str = "torch",
+    onnx_cache_dir: Path | None = None,
+    onnx_opset: int = ONNX_OPSET,
+    quantize: str | None = None,
+    quant_cache_dir: Path | None = None,
+    prepared_dir: Path | None = None,
+):
+    if quantize not in (None, "int8"):
+        raise ValueError(f"Unknown quantization: {quantize!r}")
+    if backend == "onnx":
+        return load_onnx_pipeline(
+            model_name,
+            max_len,
+            onnx_cache_dir or Path("output/onnx"),
+            onnx_opset,
+            quantize=quantize,
+        )
+    if backend != "torch":
+        raise ValueError(f"Unknown backend: {backend!r}")
+    if quantize is None and prepared_dir is not None and has_prepared_model(prepared_dir, model_name):
+        # Built by `make prep-model`: no hub lookups, weights mapped from disk
+        return load_prepared_pipeline(prepared_model_dir(prepared_dir, model_name), max_len)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    if quantize == "int8":
+        model = load_quantized_model(model_name, quant_cache_dir or Path("output/quantized"))
+    else:
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+    safe_max_len = _safe_max_len(model.config, tokenizer, max_len)
+
+    # Direct tokenizer calls (encode_texts) then truncate exactly like the model does
+    tokenizer.model_max_length = safe_max_len
+
+    return TorchSentimentEngine(model, tokenizer, safe_max_len)
+
+
+# Lean replacement for the transformers pipeline: one fast-tokenizer call per
+# batch, one forward pass, and argmax/softmax over the whole logits matrix.
+# Results come back as label/score arrays (app.predictions) instead of one
+# dict per row. Subclasses only provide the forward pass.
+class SentimentEngine:
+    def __init__(self, tokenizer, id2label: Dict[int, str], max_len: int) -> None:
+        self.tokenizer = tokenizer
+        self.max_len = max_len
+        self.id2label = id2label
+        self.labels = np.array([id2label[i] for i in sorted(id2label)], dtype=object)
+
+    def _logits(self, batch) -> np.ndarray:
+        raise NotImplementedError
+
+    def _tokenize(self, texts: List[str]):
+        return self.tokenizer(
+            texts, truncation=True, max_length=self.max_len, padding=True, return_tensors="np"
+        )
+
+    def _pad(self, encodings: List[List[int]]):
+        return self.tokenizer.pad({"input_ids": encodings}, return_tensors="np")
 
-    return pipeline(
-        task="sentiment-analysis",
-        model=model,
-        tokenizer=tokenizer,
-        truncation=True,
-        max_length=safe_max_len,
-    )
+    def _postprocess(self, logits: np.ndarray) -> Predictions:
+        logits = logits.astype(np.float64, copy=False)
+        # Same defaults as the pipeline: sigmoid for single-logit models, else softmax
+        if logits.shape[-1] == 1:
+            probs = 1.0 / (1.0 + np.exp(-logits))
+        else:
+            shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+            probs = shifted / shifted.sum(axis=-1, keepdims=True)
+        label_ids = probs.argmax(axis=-1)
+        scores = np.take_along_axis(probs, label_ids[:, None], axis=-1)[:, 0]
+        return Predictions(self.labels[label_ids], scores)
 
-# Avoid reloading and reuse the pipeline
-def predict_batch(nlp, texts: List[str]) -> List[Dict[str, Any]]:
+    def __call__(self, texts: List[str]) -> Predictions:
+        if not texts:
+            return Predictions.empty()
+        return self._postprocess(self._logits(self._tokenize(texts)))
+
+    def predict_encoded(self, encodings: List[List[int]]) -> Predictions:
+        if not encodings:
+            return Predictions.empty()
+        return self._postprocess(self._logits(self._pad(encodings)))
+
+
+class TorchSentimentEngine(SentimentEngine):
+    def __init__(self, model, tokenizer, max_len: int) -> None:
+        id2label = {int(k): v for k, v in model.config.id2label.items()}
+        super().__init__(tokenizer, id2label, max_len)
+        self.model = model
+
+    def _tokenize(self, texts: List[str]):
+        return self.tokenizer(
+            texts, truncation=True, max_length=self.max_len, padding=True, return_tensors="pt"
+        )
+
+    def _pad(self, encodings: List[List[int]]):
+        return self.tokenizer.pad({"input_ids": encodings}, return_tensors="pt")
+
+    def _logits(self, batch) -> np.ndarray:
+        import torch
+
+        model = self.model
+        with torch.inference_mode():
+            logits = model(**{k: v.to(model.device) for k, v in batch.items()}).logits
+        return logits.float().cpu().numpy()
+
+
+# Avoid reloading and reuse the engine
+def predict_batch(nlp, texts: List[str]) -> Predictions:
     # Straight-forward prediction, no caching or further chunking
-    return nlp(texts)
\ No newline at end of file
+    return nlp(texts)
+
+
+# Used to sort texts by length before batching; tokenizes the batch in one call.
+# Falls back to character length when the engine exposes no tokenizer.
+def token_lengths(nlp, texts: List[str]) -> List[int]:
+    if not texts:
+        return []
+    tokenizer = getattr(nlp, "tokenizer", None)
+    if tokenizer is None:
+        return [len(text) for text in texts]
+    encoded = tokenizer(texts, truncation=False, add_special_tokens=True)
+    return [len(ids) for ids in encoded["input_ids"]]
+
+
+# Tokenize once, truncated to the engine's max length; the ids can be reused
+# for batch sizing and then passed to predict_encoded without a second pass.
+def encode_texts(nlp, texts: List[str]) -> List[List[int]]:
+    if not texts:
+        return []
+    encoded = nlp.tokenizer(texts, truncation=True, add_special_tokens=True)
+    return [list(ids) for ids in encoded["input_ids"]]
+
+
+# Same output as predict_batch, but runs the model on already tokenized ids
+def predict_encoded(nlp, encodings: List[List[int]]) -> Predictions:
+    return nlp.predict_encoded(encodings)
+
+
+# Dynamic int8 quantization (QUANTIZE=int8)
+# Linear layer weights are stored as int8 and activations are quantized on the
+# fly, which is where most of the CPU time of a transformer goes. The quantized
+# state dict is cached on disk, so later runs only build the model skeleton from
+# its config and load the int8 weights, without reading the float checkpoint.
+
+
+def quantized_model_path(cache_dir: Path, model_name: str) -> Path:
+    return cache_dir / f"{model_name.replace('/', '__')}-int8" / "model.pt"
+
+
+def load_quantized_model(model_name: str, cache_dir: Path):
+    import torch
+
+    path = quantized_model_path(cache_dir, model_name)
+    if path.exists():
+        config = AutoConfig.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_config(config)
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        # Written by us below; packed int8 params are not plain tensors
+        model.load_state_dict(torch.load(path, weights_only=False))
+        model.eval()
+        return model
+
+    logger.info("Quantizing model", extra={"model_name": model_name, "quantize": "int8"})
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+    model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".model.{os.getpid()}.pt")
+    torch.save(model.state_dict(), tmp_path)
+    os.replace(tmp_path, path)
+    return model
+
+
+# ONNX Runtime backend (BACKEND=onnx)
+# The model is exported once per (model, opset) and cached on disk; later runs
+# load the cached graph without touching the PyTorch weights at all.
+# onnxruntime is an optional dependency: pip install onnxruntime
+
+
+def onnx_model_dir(cache_dir: Path, model_name: str, opset: int = ONNX_OPSET) -> Path:
+    safe_name = model_name.replace("/", "__")
+    return cache_dir / f"{safe_name}-opset{opset}"
+
+
+def export_onnx_model(model_name: str, model_dir: Path, opset: int = ONNX_OPSET) -> Path:
+    model_path = model_dir / "model.onnx"
+    if model_path.exists():
+        return model_path
+    import torch
+
+    logger.info("Exporting model to ONNX", extra={"model_name": model_name, "opset": opset})
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    # Graph inputs follow forward()'s signature, not the tokenizer's
+    # model_input_names: BERT lists token_type_ids before attention_mask
+    input_names = [
+        name for name in inspect.signature(model.forward).parameters
+        if name in sample and name in {"input_ids", "attention_mask", "token_type_ids"}
+    ]
+    dynamic = {0: "batch", 1: "sequence"}
+
+    model_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = model_dir / f".model.{os.getpid()}.onnx"
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            # A trailing dict is passed by keyword
+            ({name: sample[name] for name in input_names},),
+            str(tmp_path),
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes={**{name: dynamic for name in input_names}, "logits": {0: "batch"}},
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+    # Rename last so a crashed export never leaves a half-written cached graph
+    os.replace(tmp_path, model_path)
+    return model_path
+
+
+def quantize_onnx_model(model_path: Path) -> Path:
+    quant_path = model_path.with_name("model.int8.onnx")
+    if quant_path.exists():
+        return quant_path
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    tmp_path = model_path.with_name(f".model.int8.{os.getpid()}.onnx")
+    quantize_dynamic(str(model_path), str(tmp_path), weight_type=QuantType.QInt8)
+    os.replace(tmp_path, quant_path)
+    return quant_path
+
+
+class OnnxSentimentEngine(SentimentEngine):
+    def __init__(self, session, tokenizer, id2label: Dict[int, str], max_len: int) -> None:
+        super().__init__(tokenizer, id2label, max_len)
+        self.session = session
+        self._input_names = [i.name for i in session.get_inputs()]
+
+    def _logits(self, batch) -> np.ndarray:
+        feeds = {}
+        for name in self._input_names:
+            if name in batch:
+                feeds[name] = np.asarray(batch[name], dtype=np.int64)
+            else:
+                # Padded ids carry no token_type_ids; single-segment input is all zeros
+                feeds[name] = np.zeros_like(np.asarray(batch["input_ids"], dtype=np.int64))
+        return self.session.run(["logits"], feeds)[0]
+
+
+def load_onnx_pipeline(
+    model_name: str,
+    max_len: int,
+    cache_dir: Path,
+    opset: int = ONNX_OPSET,
+    quantize: str | None = None,
+) -> OnnxSentimentEngine:
+    try:
+        import onnxruntime as ort
+    except ImportError as e:
+        raise RuntimeError("BACKEND=onnx requires onnxruntime (pip install onnxruntime)") from e
+
+    config = AutoConfig.from_pretrained(model_name)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    safe_max_len = _safe_max_len(config, tokenizer, max_len)
+    tokenizer.model_max_length = safe_max_len
+
+    model_path = export_onnx_model(model_name, onnx_model_dir(cache_dir, model_name, opset), opset)
+    if quantize == "int8":
+        model_path = quantize_onnx_model(model_path)
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+    id2label = {int(k): v for k, v in config.id2label.items()}
+    return OnnxSentimentEngine(session, tokenizer, id2label, safe_max_len)
@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import logging
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Sequence, Tuple
+
+from app.live import LiveChannelReader, live_channel_path, read_live_snapshot, write_live_snapshot
+
+logger = logging.getLogger("batch_infer")
+
+# Job scheduler for the dashboard API.
+# Each submitted run becomes a Job with its own id and directory
+# (JOBS_DIR/<id>/ holding live_metrics.json, its .shm channel and run.log), so
+# concurrent runs never share live state. Jobs wait in a FIFO queue and at most
+# `max_concurrent` runner processes are alive at once; every runner is capped
+# to `threads_per_job` intra-op threads (OMP_NUM_THREADS) so they share the
+# cores instead of oversubscribing them. Run history stays shared: the runner
+# appends to it under a file lock. How a runner is started is pluggable: a
+# fresh subprocess by default, or a warm runner from app.warm_pool.
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETE = "complete"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE = {QUEUED, RUNNING}
+
+RUNNER_COMMAND = (sys.executable, "-m", "app.main")
+
+# (env, log path) -> a started runner with Popen's pid/wait/terminate/kill
+Launcher = Callable[[Dict[str, str], Path], Any]
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def plan_concurrency(
+    cores: int,
+    concurrency: int | None = None,
+    threads_per_job: int | None = None,
+) -> Tuple[int, int]:
+    # (jobs at once, threads per job). Left unset, jobs get up to 4 threads
+    # each and as many run at once as the cores allow.
+    if threads_per_job is None:
+        threads_per_job = max(1, cores // concurrency) if concurrency else min(cores, 4)
+    if concurrency is None:
+        concurrency = max(1, cores // threads_per_job)
+    return concurrency, threads_per_job
+
+
+def new_job_id() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+
+
+def _now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S%z")
+
+
+@dataclass
+class Job:
+    id: str
+    input_csv: Path
+    output_csv: Path
+    job_dir: Path
+    env: Dict[str, str]
+    metrics_port: int | None = None
+    status: str = QUEUED
+    submitted_at: str = field(default_factory=_now)
+    started_at: str | None = None
+    finished_at: str | None = None
+    exit_code: int | None = None
+    process: Any = field(default=None, repr=False)
+    cancel_requested: bool = field(default=False, repr=False)
+    _reader: LiveChannelReader | None = field(default=None, repr=False)
+
+    @property
+    def live_path(self) -> Path:
+        return self.job_dir / "live_metrics.json"
+
+    @property
+    def log_path(self) -> Path:
+        return self.job_dir / "run.log"
+
+    def live(self) -> Tuple[int, Dict[str, Any] | None]:
+        if self._reader is None:
+            self._reader = LiveChannelReader(live_channel_path(self.live_path))
+        return read_live_snapshot(self.live_path, self._reader)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "input_csv": str(self.input_csv),
+            "output_csv": str(self.output_csv),
+            "live_path": str(self.live_path),
+            "log_path": str(self.log_path),
+            "pid": self.process.pid if self.process is not None else None,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "exit_code": self.exit_code,
+        }
+
+
+class JobScheduler:
+    def __init__(
+        self,
+        jobs_dir: Path,
+        max_concurrent: int,
+        threads_per_job: int,
+        command: Sequence[str] = RUNNER_COMMAND,
+        cwd: Path | None = None,
+        max_finished: int = 200,
+        launcher: Launcher | None = None,
+    ) -> None:
+        if max_concurrent <= 0:
+            raise ValueError("max_concurrent must be > 0")
+        self.jobs_dir = jobs_dir
+        self.max_concurrent = max_concurrent
+        self.threads_per_job = threads_per_job
+        self.command = list(command)
+        self.cwd = cwd
+        self.max_finished = max_finished
+        self.launcher = launcher or self._popen
+        self._jobs: Dict[str, Job] = {}
+        self._queue: Deque[Job] = deque()
+        self._finished: Deque[str] = deque()
+        self._lock = threading.Lock()
+
+    def job_dir(self, job_id: str) -> Path:
+        return self.jobs_dir / job_id
+
+    def submit(
+        self,
+        job_id: str,
+        input_csv: Path,
+        output_csv: Path,
+        env: Dict[str, str],
+        metrics_port: int | None = None,
+        snapshot: Dict[str, Any] | None = None,
+    ) -> Job:
+        # `env` holds the runner settings for this job (on top of os.environ);
+        # INPUT_CSV, OUTPUT_CSV and RUN_LIVE_PATH are set here
+        with self._lock:
+            for other in self._jobs.values():
+                if other.status not in ACTIVE:
+                    continue
+                if other.output_csv.resolve() == output_csv.resolve():
+                    raise ValueError(f"Job {other.id} is already writing {output_csv}")
+                if metrics_port is not None and other.metrics_port == metrics_port:
+                    raise ValueError(f"Job {other.id} is already using metrics port {metrics_port}")
+            if job_id in self._jobs:
+                raise ValueError(f"Duplicate job id: {job_id}")
+            job = Job(job_id, input_csv, output_csv, self.job_dir(job_id), dict(env), metrics_port)
+            job.job_dir.mkdir(parents=True, exist_ok=True)
+            write_live_snapshot(
+                job.live_path,
+                {**(snapshot or {}), "status": QUEUED, "job_id": job_id, "timestamp": _now()},
+            )
+            self._jobs[job_id] = job
+            self._queue.append(job)
+            self._dispatch()
+        return job
+
+    def _dispatch(self) -> None:
+        # Caller holds the lock
+        running = sum(1 for job in self._jobs.values() if job.status == RUNNING)
+        while self._queue and running < self.max_concurrent:
+            self._start(self._queue.popleft())
+            running += 1
+
+    def _start(self, job: Job) -> None:
+        env = os.environ.copy()
+        env.setdefault("OMP_NUM_THREADS", str(self.threads_per_job))
+        env.update(job.env)
+        env["INPUT_CSV"] = str(job.input_csv)
+        env["OUTPUT_CSV"] = str(job.output_csv)
+        env["RUN_LIVE_PATH"] = str(job.live_path)
+        # Lets the runner report startup time (dispatch to model ready)
+        env["RUN_DISPATCHED_AT"] = str(time.time())
+        _, live = job.live()
+        write_live_snapshot(job.live_path, {**(live or {}), "status": "starting", "timestamp": _now()})
+        try:
+            job.process = self.launcher(env, job.log_path)
+        except OSError:
+            logger.exception("Failed to start job", extra={"job_id": job.id})
+            self._finish(job, FAILED, None)
+            return
+        job.status = RUNNING
+        job.started_at = _now()
+        threading.Thread(target=self._watch, args=(job,), name=f"job-{job.id}", daemon=True).start()
+
+    def _popen(self, env: Dict[str, str], log_path: Path) -> subprocess.Popen[bytes]:
+        with log_path.open("ab") as log_file:
+            return subprocess.Popen(
+                self.command,
+                cwd=str(self.cwd) if self.cwd else None,
+                env=env,
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+            )
+
+    def _watch(self, job: Job) -> None:
+        assert job.process is not None
+        exit_code = job.process.wait()
+        _, live = job.live()
+        live_status = (live or {}).get("status")
+        if job.cancel_requested:
+            status = CANCELLED
+        elif live_status == COMPLETE or exit_code == 0:
+            # The runner exits 1 when some rows failed, after finishing the run
+            status = COMPLETE
+        else:
+            status = FAILED
+        with self._lock:
+            self._finish(job, status, exit_code, live)
+            self._dispatch()
+
+    def _finish(
+        self,
+        job: Job,
+        status: str,
+        exit_code: int | None,
+        live: Dict[str, Any] | None = None,
+    ) -> None:
+        # Caller holds the lock
+        job.status = status
+        job.exit_code = exit_code
+        job.finished_at = _now()
+        if (live or {}).get("status") != status:
+            write_live_snapshot(
+                job.live_path,
+                {**(live or {}), "status": status, "timestamp": job.finished_at, "exit_code": exit_code},
+            )
+        self._finished.append(job.id)
+        while len(self._finished) > self.max_finished:
+            self._jobs.pop(self._finished.popleft(), None)
+
+    def cancel(self, job_id: str, timeout_s: float = 5.0) -> Job | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in ACTIVE:
+                return job
+            if job.status == QUEUED:
+                self._queue.remove(job)
+                self._finish(job, CANCELLED, None)
+                return job
+            job.cancel_requested = True
+            proc = job.process
+        assert proc is not None
+        proc.terminate()
+        try:
+            proc.wait(timeout=timeout_s)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        # The watcher thread records the final state
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        # Newest first (the dict keeps submission order)
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def latest(self) -> Job | None:
+        jobs = self.jobs()
+        return jobs[0] if jobs else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job.status == RUNNING)
+            return {"running": running, "queued": len(self._queue), "max_concurrent": self.max_concurrent}
+
+    def wait(self, job_id: str, timeout_s: float | None = None, poll_s: float = 0.02) -> Job | None:
+        # Blocks until the job has finished (or the timeout passes)
+        deadline = None if timeout_s is None else time.monotonic() + timeout_s
+        while True:
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job.status not in ACTIVE:
+                    return job
+            if deadline is not None and time.monotonic() > deadline:
+                return job
+            time.sleep(poll_s)
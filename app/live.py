@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from app.config import Settings
+from app.run_tracking import (
+    RunStats,
+    build_live_metrics_payload,
+    ensure_parent_dir,
+    write_json_atomic,
+    write_live_metrics,
+)
+
+logger = logging.getLogger("batch_infer")
+
+# Live run state, shared between the runner and the API.
+#
+# Channel: a fixed-layout memory-mapped file next to RUN_LIVE_PATH
+# (live_metrics.shm) holding the latest payload as JSON plus a sequence number.
+# The writer bumps the sequence to odd before rewriting the payload and to even
+# after (a seqlock), so a reader that sees the same even number before and
+# after copying has a consistent record. Checking for news is an 8-byte read.
+#
+#   0 magic "BILM" | 4 version u32 | 8 seq u64 | 16 length u32 | 20 pad | 24 payload
+#
+# File: live_metrics.json stays the durable snapshot, rewritten atomically but
+# less often (LIVE_FILE_INTERVAL_MS), and always at the end of a run.
+
+_HEADER = struct.Struct("<4sIQI4x")
+_SEQ = struct.Struct("<Q")
+_SEQ_AT = 8
+_MAGIC = b"BILM"
+_VERSION = 1
+CHANNEL_SIZE = 64 * 1024
+
+
+def live_channel_path(run_live_path: Path) -> Path:
+    return run_live_path.with_suffix(".shm")
+
+
+class LiveChannelWriter:
+    def __init__(self, path: Path) -> None:
+        ensure_parent_dir(path)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            # Never truncate: readers keep their mapping across runs
+            if os.fstat(fd).st_size < CHANNEL_SIZE:
+                os.ftruncate(fd, CHANNEL_SIZE)
+            self._buf = mmap.mmap(fd, CHANNEL_SIZE)
+        finally:
+            os.close(fd)
+        magic, version, seq, length = _HEADER.unpack_from(self._buf, 0)
+        if (magic, version) == (_MAGIC, _VERSION):
+            # Carry on from the previous writer so readers only see seq grow;
+            # an odd seq means it died mid-write
+            self.seq = seq + (seq & 1)
+        else:
+            self.seq, length = 0, 0
+        _HEADER.pack_into(self._buf, 0, _MAGIC, _VERSION, self.seq, length)
+
+    def publish(self, record: Dict[str, Any]) -> int:
+        data = json.dumps(record, ensure_ascii=False).encode("utf-8")
+        if len(data) > CHANNEL_SIZE - _HEADER.size:
+            raise ValueError(f"Live payload too large for the channel ({len(data)} bytes)")
+        # Re-read seq: the API also writes (run start/stop states), one at a time
+        seq = _SEQ.unpack_from(self._buf, _SEQ_AT)[0]
+        self.seq = seq + (seq & 1)
+        _SEQ.pack_into(self._buf, _SEQ_AT, self.seq + 1)
+        self._buf[_HEADER.size:_HEADER.size + len(data)] = data
+        self.seq += 2
+        _HEADER.pack_into(self._buf, 0, _MAGIC, _VERSION, self.seq, len(data))
+        return self.seq
+
+    def close(self) -> None:
+        self._buf.close()
+
+
+class LiveChannelReader:
+    # Maps lazily: the channel appears when the first writer starts
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._buf: mmap.mmap | None = None
+
+    def _mapped(self) -> mmap.mmap | None:
+        if self._buf is None:
+            try:
+                with self.path.open("rb") as f:
+                    if os.fstat(f.fileno()).st_size < CHANNEL_SIZE:
+                        return None
+                    self._buf = mmap.mmap(f.fileno(), CHANNEL_SIZE, access=mmap.ACCESS_READ)
+            except OSError:
+                return None
+        return self._buf
+
+    def seq(self) -> int:
+        buf = self._mapped()
+        return 0 if buf is None else _SEQ.unpack_from(buf, _SEQ_AT)[0]
+
+    def read(self, retries: int = 100) -> Tuple[int, Dict[str, Any] | None]:
+        buf = self._mapped()
+        if buf is None:
+            return 0, None
+        for _ in range(retries):
+            magic, version, seq, length = _HEADER.unpack_from(buf, 0)
+            if (magic, version) != (_MAGIC, _VERSION) or length == 0:
+                return seq, None
+            if seq & 1:
+                time.sleep(0.001)
+                continue
+            data = buf[_HEADER.size:_HEADER.size + length]
+            if _SEQ.unpack_from(buf, _SEQ_AT)[0] != seq:
+                continue
+            try:
+                return seq, json.loads(data)
+            except json.JSONDecodeError:
+                return seq, None
+        raise RuntimeError("Live channel kept changing while being read")
+
+    def close(self) -> None:
+        if self._buf is not None:
+            self._buf.close()
+            self._buf = None
+
+
+def write_live_snapshot(path: Path, record: Dict[str, Any]) -> None:
+    # One-off update from outside the runner (the API's queued/starting/final
+    # states): the file and the channel, same as the publisher
+    write_json_atomic(path, record)
+    channel = LiveChannelWriter(live_channel_path(path))
+    try:
+        channel.publish(record)
+    finally:
+        channel.close()
+
+
+def read_live_snapshot(path: Path, reader: LiveChannelReader | None = None) -> Tuple[int, Dict[str, Any] | None]:
+    # Latest state from the channel, falling back to the file
+    channel = reader or LiveChannelReader(live_channel_path(path))
+    try:
+        seq, record = channel.read()
+    finally:
+        if reader is None:
+            channel.close()
+    if record is None and path.exists():
+        try:
+            record = json.loads(path.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            record = None
+    return seq, record
+
+
+def live_delta(old: Dict[str, Any] | None, new: Dict[str, Any] | None) -> Dict[str, Any] | None:
+    # Changed keys only, or None when the whole record has to be resent
+    if old is None or new is None or old.keys() - new.keys():
+        return None
+    return {k: v for k, v in new.items() if old.get(k) != v}
+
+
+# Background publisher, used by the runner.
+# The batch loop only bumps in-memory counters (RunStats) and calls touch();
+# a daemon thread publishes the latest state to the channel at most once per
+# LIVE_INTERVAL_MS, and to the file at most once per LIVE_FILE_INTERVAL_MS.
+# close() stops the thread and writes the final state to both synchronously,
+# so the last update is never lost.
+
+
+class LiveMetricsPublisher:
+    def __init__(
+        self,
+        path: Path,
+        settings: Settings,
+        stats: RunStats,
+        start: float,
+        interval_s: float,
+        file_interval_s: float = 0.0,
+    ) -> None:
+        self.path = path
+        self.settings = settings
+        self.stats = stats
+        self.start = start
+        self.interval_s = interval_s
+        self.file_interval_s = file_interval_s
+        self.text_col = settings.text_col
+        self.dataset_type: str | None = None
+        self.group_col: str | None = None
+        self.writes = 0
+        # Startup timings, published with every update; first_prediction_s is
+        # set by the first touch() after a row was predicted
+        self.timings: Dict[str, Any] = {}
+        self.origin = start if settings.dispatched_at is None else settings.dispatched_at
+        self._processed_at_start = stats.processed
+        self._file_written_at: float | None = None
+        try:
+            self._channel: LiveChannelWriter | None = LiveChannelWriter(live_channel_path(path))
+        except (OSError, ValueError):
+            logger.exception("Live channel unavailable; using the file only",
+                             extra={"run_live_path": str(path)})
+            self._channel = None
+        self._dirty = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="live-metrics", daemon=True)
+        self._thread.start()
+
+    def set_context(self, text_col: str, dataset_type: str | None, group_col: str | None) -> None:
+        self.text_col = text_col
+        self.dataset_type = dataset_type
+        self.group_col = group_col
+        self.touch()
+
+    def touch(self) -> None:
+        # Cheap enough to call after every batch
+        if "first_prediction_s" not in self.timings and self.stats.processed > self._processed_at_start:
+            self.timings["first_prediction_s"] = round(time.time() - self.origin, 3)
+        self._dirty.set()
+
+    def _publish(self, status: str, runtime_s: float | None = None, final: bool = False) -> None:
+        with self._lock:
+            # Copy the one mutable field so json never sees it change mid-dump
+            stats = replace(self.stats, error_samples=list(self.stats.error_samples))
+            payload = build_live_metrics_payload(
+                self.settings,
+                status=status,
+                text_col=self.text_col,
+                stats=stats,
+                runtime_s=round(time.time() - self.start, 3) if runtime_s is None else runtime_s,
+                dataset_type=self.dataset_type,
+                group_col=self.group_col,
+                timings=dict(self.timings),
+            )
+            if self._channel is not None:
+                try:
+                    self._channel.publish(payload)
+                except ValueError:
+                    logger.exception("Failed to publish live metrics")
+            now = time.monotonic()
+            if (final or self._file_written_at is None
+                    or now - self._file_written_at >= self.file_interval_s):
+                write_live_metrics(self.path, payload)
+                self._file_written_at = now
+            self.writes += 1
+
+    def _run(self) -> None:
+        while True:
+            self._dirty.wait()
+            if self._stop.is_set():
+                return
+            self._dirty.clear()
+            self._publish("running")
+            # Throttle: later touches within the interval fold into one write
+            if self._stop.wait(self.interval_s):
+                return
+
+    def close(self, status: str = "running", runtime_s: float | None = None) -> None:
+        if not self._stop.is_set():
+            self._stop.set()
+            self._dirty.set()
+            self._thread.join()
+        self._publish(status, runtime_s, final=True)
+        if self._channel is not None:
+            self._channel.close()
+            self._channel = None
@@ -1,34 +1,77 @@
 from __future__ import annotations
 
-import csv
 import logging
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
 from typing import Dict, List
 
-from app.batch_runner import process_batch
-from app.config import load_settings
-from app.csv_utils import process_csv
-from app.inference import load_sentiment_pipeline, predict_batch
+from app.batch_runner import process_batch, process_batches
+from app.cache import open_prediction_cache
+from app.checkpoint import (
+    Checkpoint,
+    checkpoint_path,
+    input_identity,
+    matches_input,
+    read_checkpoint,
+    write_checkpoint,
+)
+from app.config import Settings, load_settings
+from app.csv_utils import open_csv_range, process_csv
+from app.dedup import TextDeduplicator
+from app.follow import is_pipe
+from app.bucketing import bucketed_predict
+from app.inference import (
+    encode_texts,
+    load_sentiment_pipeline,
+    predict_batch,
+    predict_encoded,
+    token_lengths,
+)
+from app.live import LiveMetricsPublisher
 from app.logging_utils import setup_logging
-from app.metrics import start_metrics_server
+from app.metrics import Metrics, start_metrics_server
+from app.model_cache import ModelCache
+from app.output import open_output
+from app.sharding import shard_output_path, shard_stats_path, write_shard_stats
+from app.stages import run_pipeline
+from app.workers import InferenceWorkerPool, pool_predict, pool_predict_sorted
 from app.run_tracking import (
     RunStats, 
-    write_live_metrics,
     append_run_history,
-    build_live_metrics_payload,
     build_run_history_payload,
     ensure_parent_dir
 )
-from app.summary import dataset_name_from_path, write_group_summary
+from app.summary import GroupStats, dataset_name_from_path, write_group_summary
 
 logger = logging.getLogger("batch_infer")
 
 
-def main() -> int:
+def main(model_cache: ModelCache | None = None) -> int:
+    # model_cache: set by a warm runner (app.warm_pool) to reuse loaded models
     setup_logging()
     settings = load_settings()  # Load config from env vars safely
+    sharded = settings.shard_index is not None and settings.shard_count is not None
+    if sharded:
+        # Each shard writes its own predictions; app.merge_shards combines them
+        settings = replace(
+            settings,
+            output_csv=shard_output_path(
+                settings.output_csv, settings.shard_index, settings.shard_count
+            ),
+        )
+        if settings.max_rows is not None:
+            logger.warning("MAX_ROWS applies to each shard, not to the whole input",
+                           extra={"max_rows": settings.max_rows, "shard_count": settings.shard_count})
     metrics = start_metrics_server(settings.metrics_port)
+    try:
+        return _run(settings, sharded, metrics, model_cache)
+    finally:
+        metrics.close()
 
+
+def _run(settings: Settings, sharded: bool, metrics: Metrics, model_cache: ModelCache | None) -> int:
     logger.info(
         "Starting job",
         extra={
@@ -39,13 +82,22 @@ def main() -> int:
             "text_col": settings.text_col,
             "model_name": settings.model_name,
             "batch_size": settings.batch_size,
+            "sort_window": settings.sort_window,
+            "max_batch_tokens": settings.max_batch_tokens,
+            "pipeline": settings.pipeline,
+            "workers": settings.workers,
             "max_len": settings.max_len,
             "metrics_port": settings.metrics_port,
+            "cache_path": str(settings.cache_path) if settings.cache_path else None,
+            "shard_index": settings.shard_index,
+            "shard_count": settings.shard_count,
+            "checkpoint_every": settings.checkpoint_every,
+            "resume": settings.resume,
         },
     )
 
     # File safety first.
-    if not settings.input_csv.exists():
+    if not settings.input_csv.exists() and not is_pipe(settings.input_csv):
         logger.error("INPUT_CSV not found", extra={
                      "path": str(settings.input_csv)})
         return 2  # Config error - used for CI
@@ -54,28 +106,151 @@ def main() -> int:
     # Initialize run tracking
     start = time.time()
     stats = RunStats()
-    group_stats: Dict[str, Dict[str, float]] = {}  # In case of group summaries
+    group_stats = GroupStats()  # In case of group summaries
+
+    # Resume from the last committed checkpoint, if asked and one exists
+    ckpt_path = checkpoint_path(settings.output_csv)
+    resume_from: Checkpoint | None = None
+    if settings.resume:
+        resume_from = read_checkpoint(ckpt_path)
+        if resume_from is None:
+            logger.info("No checkpoint found; starting from the beginning",
+                        extra={"checkpoint": str(ckpt_path)})
+        elif not matches_input(resume_from, settings.input_csv) or not settings.output_csv.exists():
+            logger.error("Checkpoint does not match INPUT_CSV/OUTPUT_CSV",
+                         extra={"checkpoint": str(ckpt_path)})
+            return 2
+        else:
+            stats = resume_from.stats
+            group_stats = resume_from.group_stats
+            logger.info("Resuming from checkpoint", extra={
+                        "checkpoint": str(ckpt_path),
+                        "input_offset": resume_from.input_offset,
+                        "rows_seen": stats.rows_seen})
 
-    write_live_metrics(
+    # Batches only touch() this; live state is published in the background
+    live = LiveMetricsPublisher(
         settings.run_live_path,
-        build_live_metrics_payload(
-            settings,
-            status="running",
-            text_col=settings.text_col,
-            stats=stats,
-            runtime_s=0,
-        ),
+        settings,
+        stats,
+        start,
+        settings.live_interval_ms / 1000,
+        settings.live_file_interval_ms / 1000,
     )
+    if settings.dispatched_at is not None:
+        # Interpreter start and imports (near zero for a warm runner)
+        live.timings["startup_s"] = round(start - settings.dispatched_at, 3)
+    live.touch()
 
+    load_options = {
+        "backend": settings.backend,
+        "onnx_cache_dir": settings.onnx_cache_dir,
+        "onnx_opset": settings.onnx_opset,
+        "quantize": settings.quantize,
+        "quant_cache_dir": settings.quant_cache_dir,
+        "prepared_dir": settings.prepared_model_dir,
+    }
+    worker_pool: InferenceWorkerPool | None = None
+    model_cached = False
+    load_started = time.time()
     try:
         logger.info("Loading model...", extra={
                     "model_name": settings.model_name})
-        nlp = load_sentiment_pipeline(settings.model_name, settings.max_len)
-        logger.info("Model loaded")
+        if settings.workers > 1:
+            # Each worker process loads its own copy; the parent keeps none
+            worker_pool = InferenceWorkerPool(
+                settings.model_name,
+                settings.max_len,
+                settings.workers,
+                settings.batch_size,
+                settings.worker_threads,
+                load_options=load_options,
+            )
+            worker_pool.check_ready()
+            nlp = worker_pool
+        elif model_cache is not None:
+            nlp, model_cached = model_cache.get(
+                settings.model_name,
+                settings.max_len,
+                loader=load_sentiment_pipeline,
+                **load_options,
+            )
+        else:
+            nlp = load_sentiment_pipeline(settings.model_name, settings.max_len, **load_options)
+        logger.info("Model loaded", extra={"backend": settings.backend, "cached": model_cached})
     except Exception:
         logger.exception("Failed to load model", extra={
                          "model_name": settings.model_name})
+        if worker_pool is not None:
+            worker_pool.terminate()
+        live.close()
         return 1
+    live.timings["model_load_s"] = round(time.time() - load_started, 3)
+    live.timings["model_cached"] = model_cached
+
+    # Each backend and quantization scores slightly differently, so each gets
+    # its own keys; the default torch backend keeps the bare model name
+    cache_model = settings.model_name
+    if settings.backend != "torch":
+        cache_model += f"#{settings.backend}"
+    if settings.quantize:
+        cache_model += f"#{settings.quantize}"
+    cache = open_prediction_cache(
+        settings.cache_path,
+        cache_model,
+        settings.max_len,
+        settings.cache_max_entries,
+    )
+
+    dedup = TextDeduplicator(settings.dedup_max_entries)
+
+    # With WORKERS > 1, each flush carries one batch of BATCH_SIZE rows per
+    # worker; the batches run in parallel on the pool but succeed or fail
+    # one by one, as they would with a single worker.
+    # With MAX_BATCH_TOKENS, rows are tokenized a window at a time in the main
+    # loop to size the batch; the ids are kept for the open batch and fed
+    # straight to the model.
+    # With SORT_WINDOW, a whole window of rows goes to process_batch at once and
+    # is split into length-sorted model batches of BATCH_SIZE inside predict_fn.
+    token_memo: Dict[str, List[int]] | None = None
+    batch_limit = settings.batch_size
+    group_executor: ThreadPoolExecutor | None = None
+    if worker_pool is not None:
+        predict_fn = pool_predict if settings.sort_window is None else pool_predict_sorted
+        batch_limit = settings.sort_window or settings.batch_size * settings.workers
+        if settings.sort_window is None:
+            group_executor = ThreadPoolExecutor(max_workers=settings.workers, thread_name_prefix="batch")
+    elif settings.max_batch_tokens is not None:
+        token_memo = {}
+        memo = token_memo
+
+        def predict_tokenized(nlp_, texts: List[str]):
+            # Texts sized as cache hits can be evicted before their batch runs
+            missing = [text for text in dict.fromkeys(texts) if text not in memo]
+            if missing:
+                memo.update(zip(missing, encode_texts(nlp_, missing)))
+            return predict_encoded(nlp_, [memo[text] for text in texts])
+
+        predict_fn = predict_tokenized
+    elif settings.sort_window is not None:
+        predict_fn = bucketed_predict(predict_batch, settings.batch_size, token_lengths)
+        batch_limit = settings.sort_window
+    else:
+        predict_fn = predict_batch
+
+    # With PIPELINE, the tokenizer pool hands each batch its encodings; the
+    # model then runs on those ids (length-bucketed if SORT_WINDOW is set)
+    def predict_for(encodings: Dict[str, List[int]]):
+        def predict(nlp_, texts: List[str]):
+            return predict_encoded(nlp_, [encodings[text] for text in texts])
+
+        if settings.sort_window is None:
+            return predict
+        return bucketed_predict(
+            predict,
+            settings.batch_size,
+            lambda _nlp, texts: [len(encodings[text]) for text in texts],
+        )
 
     try:
         # Stream rows instead of reading all into memory
@@ -84,8 +259,20 @@ def main() -> int:
         group_col: str | None = None
 
         # Clean and validate CSV
-        processed = process_csv(settings.input_csv, settings)
+        if sharded or settings.checkpoint_every is not None or resume_from is not None:
+            # Byte-offset aware reader: only records starting inside this
+            # shard's range are read, and the offset can be checkpointed
+            processed = open_csv_range(
+                settings.input_csv,
+                settings,
+                settings.shard_index or 0,
+                settings.shard_count or 1,
+                resume_offset=resume_from.input_offset if resume_from else None,
+            )
+        else:
+            processed = process_csv(settings.input_csv, settings)
         if processed is None:
+            live.close()
             return 2
         reader, fieldnames, text_col, f_in = processed
 
@@ -96,68 +283,41 @@ def main() -> int:
             dataset_type = dataset_name_from_path(settings.input_csv)
             group_col = None if settings.group_col_index is None else headers_list[
                 settings.group_col_index]
-            out_headers = [text_col, "label", "score", "error"]
-
-            with settings.output_csv.open("w", newline="", encoding="utf-8") as f_out:
-                writer = csv.DictWriter(f_out, fieldnames=out_headers)
-                writer.writeheader()
-
-                batch: List[Dict[str, str]] = []
-
-                # Process rows in batches
-                for row, error in reader:
-                    stats.rows_seen += 1
-                    if settings.max_rows is not None and stats.rows_seen > settings.max_rows:
-                        logger.info("Row limit reached", extra={
-                                    "max_rows": settings.max_rows})
-                        break
-
-                    if error == "skipped_row":
-                        stats.skipped += 1
-                        continue
-                    if error:
-                        stats.failed += 1
-                        stats.invalid += 1
-                        metrics.inc_failed(1)
-                        if len(stats.error_samples) < 5:
-                            stats.error_samples.append(error)
-                        writer.writerow({text_col: "", "label": "", "score": "", "error": error})
-                        continue
-
-                    batch.append(row)
-                    # Once we have enough for a batch, process it
-                    if len(batch) >= settings.batch_size:
-                        process_batch(
-                            batch,
-                            nlp=nlp,
-                            predict_fn=predict_batch,
-                            writer=writer,
-                            metrics=metrics,
-                            settings=settings,
+            live.set_context(text_col, dataset_type, group_col)
+
+            if resume_from is not None:
+                # Drop anything written after the last commit, then append
+                os.truncate(settings.output_csv, resume_from.output_pos)
+            writer = open_output(
+                settings.output_csv,
+                settings.output_format,
+                text_col,
+                settings.id_col,
+                append=resume_from is not None,
+            )
+            try:
+                batches_done = 0
+
+                def commit_checkpoint() -> None:
+                    # Checkpoints are CSV only (enforced in config)
+                    output_pos = writer.commit_position()  # type: ignore[union-attr]
+                    write_checkpoint(
+                        ckpt_path,
+                        Checkpoint(
+                            **input_identity(settings.input_csv),
+                            input_offset=reader.offset,
+                            output_pos=output_pos,
                             stats=stats,
-                            text_col=text_col,
-                            headers=headers_set,
-                            group_col=group_col,
                             group_stats=group_stats,
-                            dataset_type=dataset_type,
-                            start=start,
-                        )
-                        logger.info(
-                            "Batch complete",
-                            extra={
-                                "rows_seen": stats.rows_seen,
-                                "processed": stats.processed,
-                                "failed": stats.failed,
-                            },
-                        )
-                        batch = []
+                        ),
+                    )
 
-                # Process any remaining rows in the last batch
-                if batch:
-                    process_batch(
-                        batch,
+                if settings.pipeline:
+                    run_pipeline(
+                        reader,
                         nlp=nlp,
-                        predict_fn=predict_batch,
+                        encode_fn=encode_texts,
+                        predict_for=predict_for,
                         writer=writer,
                         metrics=metrics,
                         settings=settings,
@@ -166,14 +326,163 @@ def main() -> int:
                         headers=headers_set,
                         group_col=group_col,
                         group_stats=group_stats,
-                        dataset_type=dataset_type,
-                        start=start,
+                        batch_limit=batch_limit,
+                        cache=cache,
+                        dedup=dedup,
+                        live=live,
                     )
+                else:
+                    batch: List[Dict[str, str]] = []
+                    batch_tokens = 0
+                    batch_texts: set[str] = set()
+                    window: List[Dict[str, str]] = []
+                    checkpoint_due = False
+
+                    def flush() -> None:
+                        nonlocal batch, batch_tokens
+                        if group_executor is not None:
+                            size = settings.batch_size
+                            process_batches(
+                                [batch[i:i + size] for i in range(0, len(batch), size)],
+                                executor=group_executor,
+                                nlp=nlp,
+                                predict_fn=predict_fn,
+                                writer=writer,
+                                metrics=metrics,
+                                stats=stats,
+                                text_col=text_col,
+                                headers=headers_set,
+                                group_col=group_col,
+                                group_stats=group_stats,
+                                cache=cache,
+                                dedup=dedup,
+                                live=live,
+                            )
+                        else:
+                            process_batch(
+                                batch,
+                                nlp=nlp,
+                                predict_fn=predict_fn,
+                                writer=writer,
+                                metrics=metrics,
+                                stats=stats,
+                                text_col=text_col,
+                                headers=headers_set,
+                                group_col=group_col,
+                                group_stats=group_stats,
+                                cache=cache,
+                                dedup=dedup,
+                                live=live,
+                            )
+                        batch = []
+                        batch_tokens = 0
+                        batch_texts.clear()
+
+                    def tokenize_window() -> None:
+                        # One tokenizer call per window, and only for texts
+                        # that dedup and the cache cannot already answer
+                        assert token_memo is not None
+                        texts = [(r.get(text_col) or "").strip() for r in window]
+                        open_texts = {(r.get(text_col) or "").strip() for r in batch}
+                        for text in [t for t in token_memo if t not in open_texts]:
+                            del token_memo[text]
+                        todo = [t for t in dict.fromkeys(texts) if t not in token_memo and t not in dedup]
+                        if cache is not None and todo:
+                            todo = [t for t, hit in zip(todo, cache.contains_many(todo)) if not hit]
+                        if todo:
+                            token_memo.update(zip(todo, encode_texts(nlp, todo)))
+
+                    def admit(row: Dict[str, str]) -> None:
+                        nonlocal batch_tokens, batches_done, checkpoint_due
+                        if token_memo is not None and settings.max_batch_tokens is not None:
+                            # A text costs tokens once per batch, and nothing if
+                            # it will be answered without the model
+                            text = (row.get(text_col) or "").strip()
+                            cost = 0 if text in batch_texts else len(token_memo.get(text, ()))
+                            # Close the open batch before this row would push it over budget
+                            if batch and batch_tokens + cost > settings.max_batch_tokens:
+                                flush()
+                                cost = len(token_memo.get(text, ()))
+                            batch_texts.add(text)
+                            batch_tokens += cost
+
+                        batch.append(row)
+                        # Once we have enough for a batch, process it
+                        if len(batch) >= batch_limit:
+                            flush()
+                            batches_done += 1
+                            if (settings.checkpoint_every is not None
+                                    and batches_done % settings.checkpoint_every == 0):
+                                checkpoint_due = True
+                            logger.info(
+                                "Batch complete",
+                                extra={
+                                    "rows_seen": stats.rows_seen,
+                                    "processed": stats.processed,
+                                    "failed": stats.failed,
+                                },
+                            )
+
+                    def drain_window() -> None:
+                        tokenize_window()
+                        for row in window:
+                            admit(row)
+                        window.clear()
+
+                    # Process rows in batches
+                    for row, error in reader:
+                        stats.rows_seen += 1
+                        if settings.max_rows is not None and stats.rows_seen > settings.max_rows:
+                            logger.info("Row limit reached", extra={
+                                        "max_rows": settings.max_rows})
+                            break
+
+                        if error == "skipped_row":
+                            stats.skipped += 1
+                            continue
+                        if error:
+                            stats.failed += 1
+                            stats.invalid += 1
+                            metrics.inc_failed(1)
+                            if len(stats.error_samples) < 5:
+                                stats.error_samples.append(error)
+                            writer.write_error(row, error)
+                            continue
+
+                        if token_memo is None:
+                            admit(row)
+                        else:
+                            window.append(row)
+                            if len(window) >= batch_limit:
+                                drain_window()
+                        if checkpoint_due and not window:
+                            # Every row read so far must be written before the
+                            # reader offset is a safe place to resume from
+                            if batch:
+                                flush()
+                            commit_checkpoint()
+                            checkpoint_due = False
+
+                    # Process any remaining rows in the last batch
+                    if window:
+                        drain_window()
+                    if batch:
+                        flush()
+            finally:
+                writer.close()
         finally:
             f_in.close()
     except Exception:
         logger.exception("Unhandled error during processing")
+        live.close()
         return 1
+    finally:
+        if cache is not None:
+            cache.close()
+        if group_executor is not None:
+            group_executor.shutdown()
+        if worker_pool is not None:
+            worker_pool.close()
 
     # Finalize run
     runtime_s = round(time.time() - start, 3)
@@ -185,21 +494,33 @@ def main() -> int:
             "failed": stats.failed,
             "runtime_s": runtime_s,
             "output_csv": str(settings.output_csv),
+            **live.timings,
         },
     )
 
-    write_live_metrics(
-        settings.run_live_path,
-        build_live_metrics_payload(
-            settings,
-            status="complete",
-            text_col=text_col,
-            stats=stats,
-            runtime_s=runtime_s,
-            dataset_type=dataset_type,
-            group_col=group_col,
-        ),
-    )
+    live.close("complete", runtime_s)
+
+    if ckpt_path.exists():
+        # The run finished; a later RESUME=1 must not pick this up again
+        ckpt_path.unlink()
+
+    if sharded:
+        stats_path = shard_stats_path(settings.output_csv)
+        try:
+            write_shard_stats(
+                stats_path,
+                text_col=text_col,
+                dataset_type=dataset_type,
+                group_col=group_col,
+                stats=stats,
+                group_stats=group_stats,
+                runtime_s=runtime_s,
+            )
+        except Exception:
+            logger.exception("Failed to write shard stats", extra={"path": str(stats_path)})
+            return 1
+        # Run history and group summaries are written once, by the merge
+        return 1 if stats.failed > 0 else 0
 
     try:
         append_run_history(
@@ -211,6 +532,7 @@ def main() -> int:
                 runtime_s=runtime_s,
                 dataset_type=dataset_type,
                 group_col=group_col,
+                timings=live.timings,
             ),
         )
     except Exception:
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import shutil
+
+from app.config import load_settings
+from app.logging_utils import setup_logging
+from app.run_tracking import (
+    RunStats,
+    append_run_history,
+    build_run_history_payload,
+    ensure_parent_dir,
+    merge_run_stats,
+)
+from app.sharding import read_shard_stats, shard_output_path, shard_stats_path
+from app.summary import GroupStats, merge_group_stats, write_group_summary
+
+logger = logging.getLogger("batch_infer")
+
+# Combine the outputs of SHARD_COUNT shard runs into what a single run writes:
+# OUTPUT_CSV, its group summary, and one run history record.
+# Run with the same env as the shards (minus SHARD_INDEX):
+#   python -m app.merge_shards --shards 8
+
+
+def main() -> int:
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Merge per-shard outputs into one run")
+    parser.add_argument("--shards", type=int, required=True, help="SHARD_COUNT used for the run")
+    args = parser.parse_args()
+    if args.shards <= 0:
+        parser.error("--shards must be > 0")
+
+    settings = load_settings()
+    shard_outputs = [shard_output_path(settings.output_csv, i, args.shards) for i in range(args.shards)]
+    missing = [
+        str(path)
+        for out in shard_outputs
+        for path in (out, shard_stats_path(out))
+        if not path.exists()
+    ]
+    if missing:
+        logger.error("Shard outputs missing", extra={"missing": missing})
+        return 2
+
+    stats = RunStats()
+    group_stats = GroupStats()
+    meta: dict = {}
+    runtime_s = 0.0
+
+    ensure_parent_dir(settings.output_csv)
+    with settings.output_csv.open("wb") as f_out:
+        for i, shard_output in enumerate(shard_outputs):
+            shard_meta, shard_stats, shard_groups = read_shard_stats(shard_stats_path(shard_output))
+            if i == 0:
+                meta = shard_meta
+            merge_run_stats(stats, shard_stats)
+            merge_group_stats(group_stats, shard_groups)
+            # Shards run side by side, so the slowest one is the wall-clock time
+            runtime_s = max(runtime_s, float(shard_meta.get("runtime_s") or 0.0))
+
+            with shard_output.open("rb") as f_in:
+                header = f_in.readline()
+                if i == 0:
+                    f_out.write(header)
+                shutil.copyfileobj(f_in, f_out, length=1024 * 1024)
+
+    text_col = meta.get("text_col") or settings.text_col
+    dataset_type = meta.get("dataset_type")
+    group_col = meta.get("group_col")
+
+    append_run_history(
+        settings.run_history_path,
+        build_run_history_payload(
+            settings,
+            text_col=text_col,
+            stats=stats,
+            runtime_s=round(runtime_s, 3),
+            dataset_type=dataset_type,
+            group_col=group_col,
+        ),
+    )
+
+    summary_json = settings.output_csv.with_name(f"{settings.output_csv.stem}_group_summary.json")
+    summary_csv = settings.output_csv.with_name(f"{settings.output_csv.stem}_group_summary.csv")
+    write_group_summary(summary_json, summary_csv, dataset_type or "dataset", group_col, group_stats)
+
+    logger.info(
+        "Shards merged",
+        extra={
+            "shards": args.shards,
+            "processed": stats.processed,
+            "failed": stats.failed,
+            "output_csv": str(settings.output_csv),
+        },
+    )
+    return 1 if stats.failed > 0 else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,18 +1,64 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from wsgiref.simple_server import WSGIServer
 
-from prometheus_client import Counter, Histogram, start_http_server
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
 
 processed_counter = Counter("records_processed_total", "Total records processed successfully")
 failed_counter = Counter("records_failed_total", "Total records failed")
 batches_counter = Counter("batches_total", "Total batches completed")
 batch_duration_hist = Histogram("batch_duration_seconds", "Batch processing duration in seconds")
 job_duration_hist = Histogram("job_duration_seconds", "Job duration in seconds")
+cache_hits_counter = Counter("prediction_cache_hits_total", "Predictions served from the cache")
+cache_misses_counter = Counter("prediction_cache_misses_total", "Predictions not found in the cache")
+queue_depth_gauge = Gauge("pipeline_queue_depth", "Items waiting in a pipeline queue", ["queue"])
+stage_stalled_gauge = Gauge(
+    "pipeline_stage_stalled_seconds",
+    "Seconds a pipeline stage spent waiting for input (starved) or output space (blocked)",
+    ["stage", "reason"],
+)
+# Online scoring (POST /api/predict); buckets are fine-grained in the
+# millisecond range so histogram_quantile gives usable p50/p95/p99
+_LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.0075, 0.01, 0.015, 0.02, 0.03, 0.05, 0.075,
+    0.1, 0.15, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+predict_latency_hist = Histogram(
+    "predict_request_latency_seconds",
+    "Online request latency from arrival to prediction",
+    buckets=_LATENCY_BUCKETS,
+)
+predict_queue_wait_hist = Histogram(
+    "predict_queue_wait_seconds",
+    "Time an online request waited for its micro-batch to start",
+    buckets=_LATENCY_BUCKETS,
+)
+predict_batch_duration_hist = Histogram(
+    "predict_batch_duration_seconds",
+    "Model time per online micro-batch",
+    buckets=_LATENCY_BUCKETS,
+)
+predict_batch_size_hist = Histogram(
+    "predict_batch_size",
+    "Texts per online micro-batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
 
 
 @dataclass
 class Metrics:
+    # The METRICS_PORT server started for this job, if any
+    server: WSGIServer | None = None
+
+    def close(self) -> None:
+        # Frees the port when the job ends; a warm runner (app.warm_pool) stays
+        # up, and the next job on that port may land on a different runner
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
     def inc_processed(self, n: int) -> None:
         processed_counter.inc(n)
 
@@ -28,8 +74,29 @@ class Metrics:
     def observe_job_duration(self, seconds: float) -> None:
         job_duration_hist.observe(seconds)
 
+    def inc_cache_hits(self, n: int) -> None:
+        cache_hits_counter.inc(n)
+
+    def inc_cache_misses(self, n: int) -> None:
+        cache_misses_counter.inc(n)
+
+    def set_queue_depth(self, queue: str, depth: int) -> None:
+        queue_depth_gauge.labels(queue=queue).set(depth)
+
+    def add_stage_stall(self, stage: str, reason: str, seconds: float) -> None:
+        stage_stalled_gauge.labels(stage=stage, reason=reason).inc(seconds)
+
+    def observe_predict_batch(self, size: int, seconds: float) -> None:
+        predict_batch_size_hist.observe(size)
+        predict_batch_duration_hist.observe(seconds)
+
+    def observe_predict_request(self, queue_wait_s: float, latency_s: float) -> None:
+        predict_queue_wait_hist.observe(queue_wait_s)
+        predict_latency_hist.observe(latency_s)
+
 
 def start_metrics_server(port: int | None) -> Metrics:
-    if port is not None:
-        start_http_server(port)
-    return Metrics()
+    if port is None:
+        return Metrics()
+    server, _ = start_http_server(port)
+    return Metrics(server)
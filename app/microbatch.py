@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, List, Sequence
+
+from app.bucketing import PredictFn
+from app.metrics import Metrics
+from app.predictions import Predictions, as_predictions
+
+logger = logging.getLogger("batch_infer")
+
+# Micro-batching for online scoring (POST /api/predict).
+# Concurrent requests are queued and one scoring thread takes them off in
+# batches: a batch closes once it holds `max_batch_size` texts or once its
+# oldest request has waited `max_wait_s`, whichever comes first. Under load
+# many single-text forward passes become a few full ones; a lone request waits
+# at most `max_wait_s` longer. A request with more texts than the batch size
+# is scored on its own. Each request gets its own slice of the batch's
+# predictions back through a Future.
+
+
+@dataclass
+class _Request:
+    texts: List[str]
+    future: Future[Predictions]
+    enqueued: float = field(default_factory=time.perf_counter)
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        nlp: Any,
+        predict_fn: PredictFn,
+        max_batch_size: int,
+        max_wait_s: float,
+        metrics: Metrics | None = None,
+    ) -> None:
+        if max_batch_size <= 0:
+            raise ValueError("max_batch_size must be > 0")
+        if max_wait_s < 0:
+            raise ValueError("max_wait_s must be >= 0")
+        self.nlp = nlp
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_s
+        self.metrics = metrics or Metrics()
+        self._queue: queue.Queue[_Request | None] = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="microbatch", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: Sequence[str]) -> Future[Predictions]:
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future: Future[Predictions] = Future()
+        if not texts:
+            future.set_result(Predictions.empty())
+            return future
+        self._queue.put(_Request(list(texts), future))
+        return future
+
+    def predict(self, texts: Sequence[str], timeout: float | None = None) -> Predictions:
+        return self.submit(texts).result(timeout)
+
+    def _run(self) -> None:
+        carry: _Request | None = None
+        stopping = False
+        while not stopping:
+            first = carry if carry is not None else self._queue.get()
+            carry = None
+            if first is None:
+                break
+            batch = [first]
+            size = len(first.texts)
+            # The deadline runs from the oldest request's arrival, so requests
+            # that queued up while the last batch was scoring go out at once
+            deadline = first.enqueued + self.max_wait_s
+            while size < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                if size + len(request.texts) > self.max_batch_size:
+                    carry = request
+                    break
+                batch.append(request)
+                size += len(request.texts)
+            self._score(batch)
+        if carry is not None:
+            self._score([carry])
+
+    def _score(self, batch: List[_Request]) -> None:
+        # Requests whose caller gave up (client disconnected) are dropped
+        batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        texts = [text for request in batch for text in request.texts]
+        started = time.perf_counter()
+        try:
+            predictions = as_predictions(self.predict_fn(self.nlp, texts))
+            if len(predictions) != len(texts):
+                raise ValueError(f"Expected {len(texts)} predictions, got {len(predictions)}")
+        except Exception as e:
+            logger.exception("Online batch failed", extra={"batch_size": len(texts)})
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        done = time.perf_counter()
+        self.metrics.observe_predict_batch(len(texts), done - started)
+        offset = 0
+        for request in batch:
+            n = len(request.texts)
+            request.future.set_result(predictions.take(range(offset, offset + n)))
+            offset += n
+            self.metrics.observe_predict_request(started - request.enqueued, done - request.enqueued)
+
+    def close(self) -> None:
+        # Requests already queued are still scored
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
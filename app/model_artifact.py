@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import time
+import warnings
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("batch_infer")
+
+# Prepared model artifacts (python -m app.model_artifact / make prep-model).
+# A model is resolved from the hub once and saved as a directory the runner
+# loads without from_pretrained:
+#   model.safetensors  every parameter and buffer, in safetensors format
+#   config.json        the model config
+#   tokenizer.json     the fast tokenizer (plus its config files)
+#   artifact.json      safe_max_len (the model/tokenizer length limit) and
+#                      which tensors are tied to which
+# Loading maps model.safetensors read-only and wraps the mapped bytes as
+# tensors without copying. Weights are page cache, not private memory, so
+# several processes on one host (WORKERS=N, warm runners) share one copy.
+# Tensors are written largest element size first so each one stays aligned.
+
+ARTIFACT_FILE = "artifact.json"
+WEIGHTS_FILE = "model.safetensors"
+ARTIFACT_VERSION = 1
+
+_DTYPES = {
+    "F64": np.float64,
+    "F32": np.float32,
+    "F16": np.float16,
+    "I64": np.int64,
+    "I32": np.int32,
+    "I16": np.int16,
+    "I8": np.int8,
+    "U8": np.uint8,
+    "BOOL": np.bool_,
+}
+_DTYPE_NAMES = {np.dtype(v): k for k, v in _DTYPES.items()}
+
+
+def prepared_model_dir(cache_dir: Path, model_name: str) -> Path:
+    return cache_dir / model_name.replace("/", "__")
+
+
+def has_prepared_model(cache_dir: Path, model_name: str) -> bool:
+    return (prepared_model_dir(cache_dir, model_name) / ARTIFACT_FILE).exists()
+
+
+def write_safetensors(path: Path, tensors: Dict[str, np.ndarray], metadata: Dict[str, str] | None = None) -> None:
+    ordered = sorted(tensors.items(), key=lambda item: -item[1].dtype.itemsize)
+    header: Dict[str, Any] = {"__metadata__": metadata or {}}
+    offset = 0
+    for name, array in ordered:
+        if array.dtype not in _DTYPE_NAMES:
+            raise ValueError(f"Unsupported dtype for {name}: {array.dtype}")
+        header[name] = {
+            "dtype": _DTYPE_NAMES[array.dtype],
+            "shape": list(array.shape),
+            "data_offsets": [offset, offset + array.nbytes],
+        }
+        offset += array.nbytes
+    raw = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    # Pad the header so the data starts 8-byte aligned
+    raw += b" " * (-(len(raw) + 8) % 8)
+    with path.open("wb") as f:
+        f.write(struct.pack("<Q", len(raw)))
+        f.write(raw)
+        for _, array in ordered:
+            f.write(np.ascontiguousarray(array).tobytes())
+
+
+def read_safetensors(path: Path) -> Tuple[Dict[str, np.ndarray], Dict[str, str]]:
+    # Arrays are read-only views of a shared mapping of the file
+    with path.open("rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    (header_len,) = struct.unpack("<Q", mapped[:8])
+    header = json.loads(mapped[8 : 8 + header_len])
+    metadata = header.pop("__metadata__", {}) or {}
+    start = 8 + header_len
+    arrays = {}
+    for name, info in header.items():
+        if info["dtype"] not in _DTYPES:
+            raise ValueError(f"Unsupported dtype for {name}: {info['dtype']}")
+        dtype = np.dtype(_DTYPES[info["dtype"]])
+        begin, end = info["data_offsets"]
+        array = np.frombuffer(mapped, dtype=dtype, count=(end - begin) // dtype.itemsize, offset=start + begin)
+        arrays[name] = array.reshape(info["shape"])
+    return arrays, metadata
+
+
+def read_artifact(model_dir: Path) -> Dict[str, Any]:
+    manifest = json.loads((model_dir / ARTIFACT_FILE).read_text(encoding="utf-8"))
+    if manifest.get("version") != ARTIFACT_VERSION:
+        raise ValueError(f"Unsupported model artifact version in {model_dir}: {manifest.get('version')!r}")
+    return manifest
+
+
+def prepare_model(model_name: str, cache_dir: Path) -> Path:
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    from app.inference import _safe_max_len
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    if not tokenizer.is_fast:
+        raise ValueError(f"{model_name} has no fast tokenizer, so there is no tokenizer.json to save")
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+
+    tensors: Dict[str, np.ndarray] = {}
+    tied: Dict[str, str] = {}
+    seen: Dict[Tuple[int, str, Tuple[int, ...]], str] = {}
+    named = [*model.named_parameters(remove_duplicate=False), *model.named_buffers(remove_duplicate=False)]
+    for name, tensor in named:
+        key = (tensor.data_ptr(), str(tensor.dtype), tuple(tensor.shape))
+        if key in seen:
+            tied[name] = seen[key]
+            continue
+        seen[key] = name
+        tensors[name] = tensor.detach().cpu().contiguous().numpy()
+
+    model_dir = prepared_model_dir(cache_dir, model_name)
+    tmp_dir = model_dir.with_name(f".{model_dir.name}.{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    write_safetensors(tmp_dir / WEIGHTS_FILE, tensors, {"format": "pt"})
+    model.config.save_pretrained(tmp_dir)
+    tokenizer.save_pretrained(tmp_dir)
+    manifest = {
+        "version": ARTIFACT_VERSION,
+        "model_name": model_name,
+        # The model's own limit; the runner takes min(MAX_LEN, safe_max_len)
+        "safe_max_len": _safe_max_len(model.config, tokenizer, 1 << 30),
+        "tied": tied,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+    (tmp_dir / ARTIFACT_FILE).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    # Swap in last so a crashed prep never leaves a half-written artifact
+    old_dir = model_dir.with_name(f".{model_dir.name}.old.{os.getpid()}")
+    if model_dir.exists():
+        os.replace(model_dir, old_dir)
+    os.replace(tmp_dir, model_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return model_dir
+
+
+def load_prepared_pipeline(model_dir: Path, max_len: int):
+    import torch
+    from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
+
+    from app.inference import TorchSentimentEngine
+
+    manifest = read_artifact(model_dir)
+    config = AutoConfig.from_pretrained(model_dir)
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    # Built without allocating or initializing weights; the mapped ones are
+    # assigned below
+    with torch.device("meta"):
+        model = AutoModelForSequenceClassification.from_config(config)
+    arrays, _ = read_safetensors(model_dir / WEIGHTS_FILE)
+    with warnings.catch_warnings():
+        # The mapping is read-only; inference never writes to the weights
+        warnings.filterwarnings("ignore", message=".*not writable.*")
+        tensors = {name: torch.from_numpy(array) for name, array in arrays.items()}
+    params: Dict[str, torch.nn.Parameter] = {}
+    for name in [*tensors, *manifest["tied"]]:
+        source = manifest["tied"].get(name, name)
+        module_name, _, attr = name.rpartition(".")
+        module = model.get_submodule(module_name)
+        if attr in module._parameters:
+            if source not in params:
+                params[source] = torch.nn.Parameter(tensors[source], requires_grad=False)
+            module._parameters[attr] = params[source]
+        else:
+            module._buffers[attr] = tensors[source]
+    missing = [name for name, t in [*model.named_parameters(), *model.named_buffers()] if t.is_meta]
+    if missing:
+        raise ValueError(f"Model artifact in {model_dir} is missing tensors: {missing[:5]}")
+    model.eval()
+
+    safe_max_len = min(max_len, int(manifest["safe_max_len"]))
+    tokenizer.model_max_length = safe_max_len
+    return TorchSentimentEngine(model, tokenizer, safe_max_len)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Prepare a memory-mappable model artifact")
+    parser.add_argument("--model", default=os.getenv("MODEL_NAME", "distilbert-base-uncased-finetuned-sst-2-english"))
+    parser.add_argument("--out-dir", default=os.getenv("PREPARED_MODEL_DIR", "output/prepared"))
+    args = parser.parse_args()
+    started = time.perf_counter()
+    model_dir = prepare_model(args.model, Path(args.out_dir))
+    manifest = read_artifact(model_dir)
+    size = (model_dir / WEIGHTS_FILE).stat().st_size
+    print(
+        f"prepared {args.model} in {time.perf_counter() - started:.1f}s -> {model_dir} "
+        f"({size / 1e6:.1f} MB weights, safe_max_len={manifest['safe_max_len']})"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
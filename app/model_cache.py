@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import gc
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Tuple
+
+logger = logging.getLogger("batch_infer")
+
+# Loaded models kept resident in a long-lived process (app.warm_pool), least
+# recently used first out. The cache is bounded by model count and by memory:
+# a model's size is its weights and buffers when it is a torch module, else
+# the growth in RSS while it loaded (ONNX sessions). The budget is enforced
+# after each load, so it can be exceeded by one model while that model loads.
+
+Loader = Callable[..., Any]
+SizeFn = Callable[[Any], int]
+CacheKey = Tuple[Any, ...]
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def model_nbytes(nlp: Any) -> int:
+    model = getattr(nlp, "model", None)
+    if model is None or not hasattr(model, "parameters"):
+        return 0
+    tensors = [*model.parameters(), *model.buffers()]
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def _default_loader(*args: Any, **kwargs: Any) -> Any:
+    # Imported here: transformers/torch load with the first model
+    from app.inference import load_sentiment_pipeline
+
+    return load_sentiment_pipeline(*args, **kwargs)
+
+
+class ModelCache:
+    def __init__(self, max_bytes: int, max_models: int, size_fn: SizeFn = model_nbytes) -> None:
+        if max_models <= 0:
+            raise ValueError("max_models must be > 0")
+        self.max_bytes = max_bytes
+        self.max_models = max_models
+        self.size_fn = size_fn
+        self._entries: OrderedDict[CacheKey, Tuple[Any, int]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model_name: str, max_len: int, **load_options: Any) -> CacheKey:
+        return (model_name, max_len, *sorted((k, str(v)) for k, v in load_options.items()))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(size for _, size in self._entries.values())
+
+    def resident(self) -> List[str]:
+        # Model names, most recently used last
+        return [key[0] for key in self._entries]
+
+    def get(
+        self,
+        model_name: str,
+        max_len: int,
+        loader: Loader | None = None,
+        **load_options: Any,
+    ) -> Tuple[Any, bool]:
+        # Returns (engine, whether it was already resident)
+        key = self.key(model_name, max_len, **load_options)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], True
+        self.misses += 1
+        # Make room by count first; memory is checked once the size is known
+        while len(self._entries) >= self.max_models:
+            self._evict()
+        rss_before = rss_bytes()
+        started = time.perf_counter()
+        nlp = (loader or _default_loader)(model_name, max_len, **load_options)
+        size = self.size_fn(nlp) or max(rss_bytes() - rss_before, 0)
+        self._entries[key] = (nlp, size)
+        logger.info(
+            "Model cached",
+            extra={"model_name": model_name, "bytes": size, "load_s": round(time.perf_counter() - started, 3)},
+        )
+        # The model just loaded always stays, even if it alone is over budget
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            self._evict()
+        return nlp, False
+
+    def _evict(self) -> None:
+        key, (_, size) = self._entries.popitem(last=False)
+        logger.info("Model evicted", extra={"model_name": key[0], "bytes": size})
+        gc.collect()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        gc.collect()
+
+
+def cache_info(cache: ModelCache) -> Dict[str, Any]:
+    return {
+        "models": cache.resident(),
+        "bytes": cache.nbytes,
+        "hits": cache.hits,
+        "misses": cache.misses,
+    }
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import csv
+import os
+from pathlib import Path
+from typing import Any, Dict, IO, List
+
+from app.predictions import Predictions
+
+# Prediction output writers (OUTPUT_FORMAT=csv|parquet|arrow).
+# Every writer takes whole batches: write_predictions gets the batch's rows and
+# label/score arrays, write_error records one failed row, and end_batch marks a
+# batch boundary. The columnar writers buffer until end_batch and then emit the
+# batch as a single record batch with typed label (string) and score (float64)
+# columns; failed rows carry a null score.
+
+def output_columns(text_col: str, id_col: str | None) -> List[str]:
+    columns = [text_col, "label", "score", "error"]
+    return [id_col, *columns] if id_col else columns
+
+
+class CsvOutput:
+    def __init__(self, f_out: IO[str], text_col: str, id_col: str | None, write_header: bool) -> None:
+        self._f = f_out
+        self.text_col = text_col
+        self.id_col = id_col
+        self._writer = csv.DictWriter(f_out, fieldnames=output_columns(text_col, id_col))
+        if write_header:
+            self._writer.writeheader()
+
+    def write_error(self, row: Dict[str, str] | None, error: str) -> None:
+        out: Dict[str, Any] = {
+            self.text_col: (row or {}).get(self.text_col, ""),
+            "label": "",
+            "score": "",
+            "error": error,
+        }
+        if self.id_col:
+            out[self.id_col] = (row or {}).get(self.id_col, "")
+        self._writer.writerow(out)
+
+    def write_predictions(self, rows: List[Dict[str, str]], predictions: Predictions) -> None:
+        text_col, id_col = self.text_col, self.id_col
+        # tolist gives plain str/float, which csv writes cleanly
+        self._writer.writerows(
+            {
+                **({id_col: r.get(id_col, "")} if id_col else {}),
+                text_col: r.get(text_col, ""),
+                "label": label,
+                "score": score,
+                "error": "",
+            }
+            for r, label, score in zip(rows, predictions.labels.tolist(), predictions.scores.tolist())
+        )
+
+    def end_batch(self) -> None:
+        pass
+
+    def commit_position(self) -> int:
+        # Durable end of the written output, for checkpoints
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        return self._f.tell()
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class ArrowOutput:
+    def __init__(self, path: Path, output_format: str, text_col: str, id_col: str | None) -> None:
+        import pyarrow as pa
+
+        self._pa = pa
+        self.text_col = text_col
+        self.id_col = id_col
+        fields = [pa.field(text_col, pa.string()), pa.field("label", pa.string()),
+                  pa.field("score", pa.float64()), pa.field("error", pa.string())]
+        if id_col:
+            fields.insert(0, pa.field(id_col, pa.string()))
+        self.schema = pa.schema(fields)
+        if output_format == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(str(path), self.schema)
+        else:
+            self._writer = pa.ipc.new_file(str(path), self.schema)
+        self._reset()
+
+    def _reset(self) -> None:
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._labels: List[Any] = []
+        self._scores: List[Any] = []
+        self._errors: List[str] = []
+
+    def write_error(self, row: Dict[str, str] | None, error: str) -> None:
+        row = row or {}
+        if self.id_col:
+            self._ids.append(row.get(self.id_col, ""))
+        self._texts.append(row.get(self.text_col, ""))
+        self._labels.append("")
+        self._scores.append(None)
+        self._errors.append(error)
+
+    def write_predictions(self, rows: List[Dict[str, str]], predictions: Predictions) -> None:
+        if self.id_col:
+            self._ids.extend(r.get(self.id_col, "") for r in rows)
+        self._texts.extend(r.get(self.text_col, "") for r in rows)
+        self._labels.extend(predictions.labels.tolist())
+        self._scores.extend(predictions.scores.tolist())
+        self._errors.extend([""] * len(rows))
+
+    def end_batch(self) -> None:
+        if not self._texts:
+            return
+        pa = self._pa
+        columns = [self._texts, self._labels, self._scores, self._errors]
+        if self.id_col:
+            columns.insert(0, self._ids)
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, self.schema)],
+            schema=self.schema,
+        )
+        self._writer.write_batch(batch)
+        self._reset()
+
+    def close(self) -> None:
+        self.end_batch()
+        self._writer.close()
+
+
+OutputWriter = CsvOutput | ArrowOutput
+
+
+def open_output(
+    path: Path,
+    output_format: str,
+    text_col: str,
+    id_col: str | None,
+    append: bool = False,
+) -> OutputWriter:
+    if output_format == "csv":
+        f_out = path.open("a" if append else "w", newline="", encoding="utf-8")
+        return CsvOutput(f_out, text_col, id_col, write_header=not append)
+    if append:
+        raise ValueError(f"OUTPUT_FORMAT={output_format} cannot be appended to")
+    return ArrowOutput(path, output_format, text_col, id_col)
+
+
+def read_output_rows(path: Path, limit: int) -> List[Dict[str, Any]]:
+    # Rows as the API returns them, whatever format the run wrote
+    if path.suffix in (".parquet", ".arrow"):
+        import pyarrow as pa
+
+        if path.suffix == ".parquet":
+            import pyarrow.parquet as pq
+
+            batches = pq.ParquetFile(str(path)).iter_batches()
+        else:
+            reader = pa.ipc.open_file(str(path))
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        rows: List[Dict[str, Any]] = []
+        for batch in batches:
+            rows.extend(batch.to_pylist())
+            if limit > 0 and len(rows) >= limit:
+                return rows[:limit]
+        return rows
+
+    rows = []
+    with path.open("r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            rows.append(row)
+            if limit > 0 and len(rows) >= limit:
+                break
+    return rows
@@ -0,0 +1,335 @@
+from __future__ import annotations
+
+import csv
+import io
+import logging
+import mmap
+import os
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from app.csv_utils import ends_in_quotes
+
+logger = logging.getLogger("batch_infer")
+
+# Row-offset index for prediction CSVs, so the API can serve any page of a
+# multi-GB output without parsing everything before it.
+# One scan records, per row, its byte offset, its label (as a code into a small
+# label table) and its score (NaN for failed rows). Pages are then a seek per
+# row (one read for a contiguous page), and label/score filters are array
+# masks. The index is saved next to the output as a hidden .npz sidecar and
+# extended, not rebuilt, when the output has only grown (a run still writing).
+# A rerun that rewrites the file is told apart by its inode and a checksum of
+# the bytes the index already covers (their head and tail).
+# Parquet/Arrow outputs are columnar already and are paged through pyarrow.
+
+INDEX_VERSION = 2
+
+# Bytes checksummed at each end of the indexed span
+_FINGERPRINT_BYTES = 4096
+
+Page = Tuple[int, List[Dict[str, Any]]]
+
+
+def index_path(output_path: Path) -> Path:
+    return output_path.with_name(f".{output_path.name}.idx.npz")
+
+
+def _first_record(buf) -> Tuple[List[str], int]:
+    scanner = _RecordScanner(buf, 0)
+    for row in csv.reader(scanner._lines()):
+        if row:
+            return row, scanner.consumed
+    return [], 0
+
+
+class _RecordScanner:
+    # csv.reader over latin-1 lines cut from the mapping (a 1:1 byte view), so
+    # the bytes consumed after each record are its end offset. A last record
+    # without its newline is left out: the writer may still be mid-row.
+    def __init__(self, buf, start: int, block_size: int = 1 << 20) -> None:
+        self._buf = buf
+        self._start = start
+        self._block_size = block_size
+        self.consumed = start
+
+    def _lines(self) -> Iterator[str]:
+        buf, size, block = self._buf, len(self._buf), self._block_size
+        pos = self._start
+        carry = ""
+        while pos < size:
+            chunk = carry + buf[pos:pos + block].decode("latin-1")
+            pos += block
+            lines = chunk.split("\n")
+            carry = lines.pop()
+            for line in lines:
+                self.consumed += len(line) + 1
+                yield line + "\n"
+
+    def __iter__(self) -> Iterator[Tuple[int, List[str]]]:
+        start = self.consumed
+        pending: Tuple[int, List[str]] | None = None
+        for row in csv.reader(self._lines()):
+            if pending is not None:
+                yield pending
+                pending = None
+            if row:
+                pending = (start, row)
+            start = self.consumed
+        if pending is not None:
+            # At the end of input, csv.reader also returns a record whose
+            # quoted field is still open; leave that one for the next scan
+            if ends_in_quotes(self._buf[pending[0]:self.consumed], False):
+                self.consumed = pending[0]
+            else:
+                yield pending
+
+
+def _fingerprint(buf, end: int) -> int:
+    head = buf[:min(end, _FINGERPRINT_BYTES)]
+    return zlib.crc32(buf[max(end - _FINGERPRINT_BYTES, len(head)):end], zlib.crc32(head))
+
+
+def _utf8(cell: str) -> str:
+    return cell if cell.isascii() else cell.encode("latin-1").decode("utf-8", errors="replace")
+
+
+class PredictionIndex:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._reset()
+
+    def _reset(self) -> None:
+        self.header: List[str] = []
+        self.labels: List[str] = []
+        self.offsets = np.zeros(0, dtype=np.int64)
+        self.label_ids = np.zeros(0, dtype=np.int32)
+        self.scores = np.zeros(0, dtype=np.float64)
+        # Bytes covered by the index, and the file state it was taken from
+        self.end = 0
+        self.mtime_ns = 0
+        self.inode = 0
+        self.fingerprint = 0
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    @classmethod
+    def open(cls, path: Path) -> PredictionIndex:
+        index = cls(path)
+        index._load()
+        index.refresh()
+        return index
+
+    def _load(self) -> None:
+        sidecar = index_path(self.path)
+        if not sidecar.exists():
+            return
+        try:
+            with np.load(sidecar, allow_pickle=False) as data:
+                meta = [int(v) for v in data["meta"]]
+                if meta[0] != INDEX_VERSION:
+                    return
+                _, end, mtime_ns, inode, fingerprint = meta
+                self.header = data["header"].tolist()
+                self.labels = data["labels"].tolist()
+                self.offsets = data["offsets"]
+                self.label_ids = data["label_ids"]
+                self.scores = data["scores"]
+                self.end, self.mtime_ns = end, mtime_ns
+                self.inode, self.fingerprint = inode, fingerprint
+        except (OSError, ValueError, KeyError):
+            logger.warning("Ignoring unreadable prediction index", extra={"path": str(sidecar)})
+            self._reset()
+
+    def _save(self) -> None:
+        sidecar = index_path(self.path)
+        tmp = sidecar.with_name(f"{sidecar.name}.tmp")
+        try:
+            with tmp.open("wb") as f:
+                np.savez(
+                    f,
+                    meta=np.array(
+                        [INDEX_VERSION, self.end, self.mtime_ns, self.inode, self.fingerprint], dtype=np.int64
+                    ),
+                    header=np.array(self.header, dtype=str),
+                    labels=np.array(self.labels, dtype=str),
+                    offsets=self.offsets,
+                    label_ids=self.label_ids,
+                    scores=self.scores,
+                )
+            os.replace(tmp, sidecar)
+        except OSError:
+            # Read-only output dir: keep the index in memory only
+            logger.warning("Could not save prediction index", extra={"path": str(sidecar)})
+
+    def refresh(self) -> None:
+        # Bring the index up to date with the file: extend it if the file only
+        # grew, rebuild it if the file was replaced or rewritten
+        st = os.stat(self.path)
+        if st.st_size == self.end and st.st_mtime_ns == self.mtime_ns:
+            return
+        with self.path.open("rb") as f:
+            if st.st_size == 0:
+                self._reset()
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                header, header_end = _first_record(buf)
+                header = [_utf8(cell) for cell in header]
+                if not header:
+                    # Header not fully written yet
+                    self._reset()
+                    return
+                if (
+                    self.end == 0
+                    or st.st_size < self.end
+                    or st.st_ino != self.inode
+                    or header != self.header
+                    or _fingerprint(buf, self.end) != self.fingerprint
+                ):
+                    self._reset()
+                    self.header = header
+                    self.end = header_end
+                self._extend(buf)
+                self.fingerprint = _fingerprint(buf, self.end)
+        self.mtime_ns = st.st_mtime_ns
+        self.inode = st.st_ino
+        self._save()
+
+    def _extend(self, buf) -> None:
+        if "label" not in self.header or "score" not in self.header:
+            raise ValueError(f"{self.path} has no label/score columns")
+        label_idx = self.header.index("label")
+        score_idx = self.header.index("score")
+        codes = {label: i for i, label in enumerate(self.labels)}
+        offsets: List[int] = []
+        label_ids: List[int] = []
+        scores: List[float] = []
+        scanner = _RecordScanner(buf, self.end)
+        for start, row in scanner:
+            label = _utf8(row[label_idx]) if label_idx < len(row) else ""
+            code = codes.get(label)
+            if code is None:
+                code = codes[label] = len(self.labels)
+                self.labels.append(label)
+            try:
+                score = float(row[score_idx]) if score_idx < len(row) and row[score_idx] else float("nan")
+            except ValueError:
+                score = float("nan")
+            offsets.append(start)
+            label_ids.append(code)
+            scores.append(score)
+        self.offsets = np.concatenate([self.offsets, np.asarray(offsets, dtype=np.int64)])
+        self.label_ids = np.concatenate([self.label_ids, np.asarray(label_ids, dtype=np.int32)])
+        self.scores = np.concatenate([self.scores, np.asarray(scores, dtype=np.float64)])
+        self.end = scanner.consumed
+
+    def select(
+        self,
+        offset: int,
+        limit: int,
+        label: str | None = None,
+        min_score: float | None = None,
+        max_score: float | None = None,
+    ) -> Tuple[int, np.ndarray]:
+        # Row numbers for one page, plus the number of matching rows
+        if label is None and min_score is None and max_score is None:
+            total = len(self)
+            return total, np.arange(min(offset, total), min(offset + limit, total))
+        mask = np.ones(len(self), dtype=bool)
+        if label is not None:
+            code = self.labels.index(label) if label in self.labels else -1
+            mask &= self.label_ids == code
+        # NaN (failed rows) never passes a score bound
+        if min_score is not None:
+            mask &= self.scores >= min_score
+        if max_score is not None:
+            mask &= self.scores <= max_score
+        matches = np.flatnonzero(mask)
+        return len(matches), matches[offset:offset + limit]
+
+    def rows(self, positions: np.ndarray) -> List[Dict[str, str]]:
+        if len(positions) == 0:
+            return []
+        bounds = np.append(self.offsets, self.end)
+        out: List[Dict[str, str]] = []
+        with self.path.open("rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                if positions[-1] - positions[0] == len(positions) - 1:
+                    # Contiguous page: one slice
+                    chunks = [buf[bounds[positions[0]]:bounds[positions[-1] + 1]]]
+                else:
+                    chunks = [buf[bounds[i]:bounds[i + 1]] for i in positions]
+                for chunk in chunks:
+                    reader = csv.reader(io.StringIO(chunk.decode("utf-8", errors="replace"), newline=""))
+                    out.extend(dict(zip(self.header, row)) for row in reader if row)
+        return out
+
+    def page(self, offset: int, limit: int, **filters: Any) -> Page:
+        total, positions = self.select(offset, limit, **filters)
+        return total, self.rows(positions)
+
+
+def read_columnar_page(
+    path: Path,
+    offset: int,
+    limit: int,
+    label: str | None = None,
+    min_score: float | None = None,
+    max_score: float | None = None,
+) -> Page:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        source = pq.ParquetFile(str(path))
+        columns = source.read(columns=["label", "score"])
+    else:
+        source = pa.ipc.open_file(pa.memory_map(str(path)))
+        table = source.read_all()  # zero-copy over the mapping
+        columns = table.select(["label", "score"])
+    mask = pa.array(np.ones(columns.num_rows, dtype=bool))
+    if label is not None:
+        mask = pc.and_(mask, pc.equal(columns["label"], label))
+    if min_score is not None:
+        mask = pc.and_(mask, pc.greater_equal(columns["score"], min_score))
+    if max_score is not None:
+        mask = pc.and_(mask, pc.less_equal(columns["score"], max_score))
+    matches = np.flatnonzero(pc.fill_null(mask, False).to_numpy(zero_copy_only=False))
+    selected = matches[offset:offset + limit]
+    if len(selected) == 0:
+        return len(matches), []
+    if path.suffix == ".parquet":
+        # Only read the row groups the page falls in
+        sizes = [source.metadata.row_group(i).num_rows for i in range(source.num_row_groups)]
+        starts = np.cumsum([0, *sizes])
+        groups = sorted(set(np.searchsorted(starts, selected, side="right") - 1))
+        table = source.read_row_groups(groups)
+        base = np.concatenate([np.arange(starts[g], starts[g + 1]) for g in groups])
+        selected = np.searchsorted(base, selected)
+    return len(matches), table.take(pa.array(selected)).to_pylist()
+
+
+def read_prediction_page(
+    path: Path,
+    offset: int,
+    limit: int,
+    indexes: Dict[Path, PredictionIndex] | None = None,
+    **filters: Any,
+) -> Page:
+    # Pass `indexes` to keep CSV indexes in memory between calls
+    if path.suffix in (".parquet", ".arrow"):
+        return read_columnar_page(path, offset, limit, **filters)
+    index = indexes.get(path) if indexes is not None else None
+    if index is None:
+        index = PredictionIndex.open(path)
+        if indexes is not None:
+            indexes[path] = index
+    else:
+        index.refresh()
+    return index.page(offset, limit, **filters)
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+Prediction = Dict[str, Any]
+
+# Label kinds used for stats: anything that is neither "pos" nor "neg" is neutral
+POSITIVE, NEGATIVE, NEUTRAL = 0, 1, 2
+
+# Column-oriented predictions: one label array and one score array per batch.
+# The inference engine produces these directly from the model's logits, and
+# batch_runner consumes them without building a dict per row. Anything that
+# still returns the pipeline's list of {"label", "score"} dicts (test stubs,
+# custom predict functions) is converted once with as_predictions.
+
+
+@dataclass
+class Predictions:
+    labels: np.ndarray  # dtype=object, one label string per row
+    scores: np.ndarray  # float64
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def take(self, indices: Sequence[int] | np.ndarray) -> Predictions:
+        idx = np.asarray(indices, dtype=np.intp)
+        return Predictions(self.labels[idx], self.scores[idx])
+
+    def to_dicts(self) -> List[Prediction]:
+        return [
+            {"label": label, "score": score}
+            for label, score in zip(self.labels.tolist(), self.scores.tolist())
+        ]
+
+    @classmethod
+    def empty(cls) -> Predictions:
+        return cls(np.empty(0, dtype=object), np.empty(0, dtype=np.float64))
+
+    @classmethod
+    def from_dicts(cls, predictions: Sequence[Prediction]) -> Predictions:
+        labels = np.empty(len(predictions), dtype=object)
+        scores = np.zeros(len(predictions), dtype=np.float64)
+        for i, prediction in enumerate(predictions):
+            labels[i] = prediction.get("label", "") or ""
+            try:
+                scores[i] = float(prediction.get("score", 0.0))
+            except (TypeError, ValueError):
+                # Unparseable scores count as 0.0, as they always have
+                pass
+        return cls(labels, scores)
+
+
+def as_predictions(predictions: Predictions | Sequence[Prediction]) -> Predictions:
+    if isinstance(predictions, Predictions):
+        return predictions
+    return Predictions.from_dicts(list(predictions))
+
+
+def concat_predictions(parts: Sequence[Predictions]) -> Predictions:
+    if not parts:
+        return Predictions.empty()
+    return Predictions(
+        np.concatenate([p.labels for p in parts]),
+        np.concatenate([p.scores for p in parts]),
+    )
+
+
+# Put per-chunk results back in input order: chunks[i] holds the input
+# indices that parts[i] was predicted for.
+def unscatter(chunks: Sequence[Sequence[int]], parts: Sequence[Predictions]) -> Predictions:
+    for chunk, part in zip(chunks, parts):
+        if len(part) != len(chunk):
+            raise ValueError(f"Expected {len(chunk)} predictions, got {len(part)}")
+    if not chunks:
+        return Predictions.empty()
+    order = np.concatenate([np.asarray(chunk, dtype=np.intp) for chunk in chunks])
+    combined = concat_predictions(parts)
+    labels = np.empty(len(order), dtype=object)
+    scores = np.zeros(len(order), dtype=np.float64)
+    labels[order] = combined.labels
+    scores[order] = combined.scores
+    return Predictions(labels, scores)
+
+
+def label_kinds(labels: np.ndarray) -> np.ndarray:
+    # Classify each distinct label once, then broadcast back to the rows
+    if len(labels) == 0:
+        return np.zeros(0, dtype=np.intp)
+    unique, inverse = np.unique(labels.astype(str), return_inverse=True)
+    kinds = np.empty(len(unique), dtype=np.intp)
+    for i, label in enumerate(unique.tolist()):
+        label_norm = label.lower()
+        if "pos" in label_norm:
+            kinds[i] = POSITIVE
+        elif "neg" in label_norm:
+            kinds[i] = NEGATIVE
+        else:
+            kinds[i] = NEUTRAL
+    return kinds[inverse.reshape(-1)]
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+import fcntl
 import json
 import logging
-from dataclasses import dataclass, field
+import os
+import sqlite3
+import tempfile
+from dataclasses import asdict, dataclass, field, fields
 from pathlib import Path
 import time
 from typing import Any, Dict
 from app.config import Settings
+from app.history import RunHistoryStore, history_db_path
 
 logger = logging.getLogger("batch_infer")
 
@@ -23,19 +28,72 @@ class RunStats:
     positive: int = 0
     negative: int = 0
     neutral: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    deduped: int = 0
+
+
+def run_stats_to_dict(stats: RunStats) -> Dict[str, Any]:
+    return asdict(stats)
+
+
+def run_stats_from_dict(data: Dict[str, Any]) -> RunStats:
+    known = {f.name for f in fields(RunStats)}
+    return RunStats(**{k: v for k, v in data.items() if k in known})
+
+
+def merge_run_stats(into: RunStats, other: RunStats) -> None:
+    for f in fields(RunStats):
+        if f.name == "error_samples":
+            into.error_samples.extend(other.error_samples[: max(0, 5 - len(into.error_samples))])
+        else:
+            setattr(into, f.name, getattr(into, f.name) + getattr(other, f.name))
 
 
 def append_run_history(path: Path, record: Dict[str, Any]) -> None:
     ensure_parent_dir(path)
-    with path.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    with path.open("ab") as f:
+        # Concurrent runs append to the same file: the lock keeps the offset
+        # read here and the line written below together
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0, os.SEEK_END)
+        line_offset = f.tell()
+        f.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        f.flush()
+    # Also index it; the JSONL line above is the record of truth, so a failure
+    # here is only logged (app.history backfill can catch up later)
+    try:
+        store = RunHistoryStore(history_db_path(path))
+        try:
+            store.append(record, line_offset)
+        finally:
+            store.close()
+    except sqlite3.Error:
+        logger.exception("Failed to index run history", extra={"run_history_path": str(path)})
+
+
+def write_json_atomic(path: Path, record: Dict[str, Any]) -> None:
+    # Readers see either the old or the new file, never a partial write
+    ensure_parent_dir(path)
+    # A temp file of its own per call: concurrent jobs and the live publisher
+    # may write the same target at once
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False
+    ) as f:
+        tmp_path = Path(f.name)
+        try:
+            json.dump(record, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+    os.replace(tmp_path, path)
 
 
 def write_live_metrics(path: Path, record: Dict[str, Any]) -> None:
     try:
-        ensure_parent_dir(path)
-        with path.open("w", encoding="utf-8") as f:
-            json.dump(record, f, ensure_ascii=False)
+        write_json_atomic(path, record)
     except Exception:
         logger.exception("Failed to write live metrics",
                          extra={"run_live_path": str(path)})
@@ -67,6 +125,10 @@ def _base_payload(
         "positive": stats.positive,
         "negative": stats.negative,
         "neutral": stats.neutral,
+        "cache_hits": stats.cache_hits,
+        "cache_misses": stats.cache_misses,
+        "deduped": stats.deduped,
+        "dedup_ratio": round(stats.deduped / stats.processed, 6) if stats.processed else 0,
         "runtime_s": runtime_s,
     }
 
@@ -79,6 +141,7 @@ def build_live_metrics_payload(
     runtime_s: float,
     dataset_type: str | None = None,
     group_col: str | None = None,
+    timings: Dict[str, Any] | None = None,
 ) -> Dict[str, Any]:
     payload = _base_payload(settings, text_col, stats, runtime_s)
     payload["status"] = status
@@ -86,6 +149,7 @@ def build_live_metrics_payload(
         payload["dataset_type"] = dataset_type
     if group_col is not None:
         payload["group_col"] = group_col
+    payload.update(timings or {})
     return payload
 
 
@@ -96,10 +160,13 @@ def build_run_history_payload(
     runtime_s: float,
     dataset_type: str | None,
     group_col: str | None,
+    timings: Dict[str, Any] | None = None,
 ) -> Dict[str, Any]:
     payload = _base_payload(settings, text_col, stats, runtime_s)
     payload["dataset_type"] = dataset_type
     payload["group_col"] = group_col
+    # Startup timings (startup_s, model_load_s, model_cached, first_prediction_s)
+    payload.update(timings or {})
     return payload
 
 
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from app.run_tracking import RunStats, run_stats_from_dict, run_stats_to_dict, write_json_atomic
+from app.summary import GroupStats, group_stats_from_dict, group_stats_to_dict
+
+# Per-shard artifacts for SHARD_INDEX/SHARD_COUNT runs. Each shard writes its
+# predictions to its own CSV plus a stats JSON; app.merge_shards combines them.
+
+
+def shard_output_path(output_csv: Path, index: int, count: int) -> Path:
+    return output_csv.with_name(
+        f"{output_csv.stem}.shard-{index:05d}-of-{count:05d}{output_csv.suffix}"
+    )
+
+
+def shard_stats_path(shard_output: Path) -> Path:
+    return shard_output.with_name(f"{shard_output.stem}_stats.json")
+
+
+def write_shard_stats(
+    path: Path,
+    *,
+    text_col: str,
+    dataset_type: str | None,
+    group_col: str | None,
+    stats: RunStats,
+    group_stats: GroupStats,
+    runtime_s: float,
+) -> None:
+    write_json_atomic(
+        path,
+        {
+            "text_col": text_col,
+            "dataset_type": dataset_type,
+            "group_col": group_col,
+            "runtime_s": runtime_s,
+            "stats": run_stats_to_dict(stats),
+            "group_stats": group_stats_to_dict(group_stats),
+        },
+    )
+
+
+def read_shard_stats(path: Path) -> Tuple[Dict[str, Any], RunStats, GroupStats]:
+    record = json.loads(path.read_text(encoding="utf-8"))
+    stats = run_stats_from_dict(record.pop("stats"))
+    group_stats = group_stats_from_dict(record.pop("group_stats"))
+    return record, stats, group_stats
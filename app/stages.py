@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List
+
+from app.batch_runner import BatchResult, record_batch, run_batch_inference
+from app.cache import PredictionCache
+from app.config import Settings
+from app.csv_utils import RowResult
+from app.dedup import TextDeduplicator
+from app.live import LiveMetricsPublisher
+from app.output import OutputWriter
+from app.run_tracking import RunStats
+from app.summary import GroupStats
+
+logger = logging.getLogger("batch_infer")
+
+# Staged version of the main loop, enabled with PIPELINE=1:
+#
+#   reader thread -> tokenizer pool -> [tokenized] -> inference -> [results] -> writer thread
+#
+# Queues are bounded, so a slow stage pushes back on the ones before it instead
+# of buffering the whole file. Every item travels through the queues in file
+# order, which keeps the output identical to the serial loop. Inference runs on
+# the calling thread; RunStats changes (apart from the reader's row counters)
+# and all output happen on the writer thread.
+
+Encodings = Dict[str, List[int]]
+PredictFactory = Callable[[Encodings], Callable[[Any, List[str]], List[Dict[str, Any]]]]
+
+_DONE = object()
+
+
+class _Stopped(Exception):
+    pass
+
+
+class _Channel:
+    def __init__(self, name: str, maxsize: int, metrics, stop: threading.Event) -> None:
+        self.name = name
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=maxsize)
+        self._metrics = metrics
+        self._stop = stop
+
+    def put(self, item: Any, stage: str) -> None:
+        waited_from = time.perf_counter()
+        while True:
+            try:
+                self._queue.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                if self._stop.is_set():
+                    raise _Stopped()
+        self._metrics.add_stage_stall(stage, "blocked", time.perf_counter() - waited_from)
+        self._metrics.set_queue_depth(self.name, self._queue.qsize())
+
+    def get(self, stage: str) -> Any:
+        waited_from = time.perf_counter()
+        while True:
+            try:
+                item = self._queue.get(timeout=0.1)
+                break
+            except queue.Empty:
+                if self._stop.is_set():
+                    raise _Stopped()
+        self._metrics.add_stage_stall(stage, "starved", time.perf_counter() - waited_from)
+        self._metrics.set_queue_depth(self.name, self._queue.qsize())
+        return item
+
+
+def _encode_unique(encode_fn, nlp, texts: List[str]) -> Encodings:
+    unique = list(dict.fromkeys(texts))
+    return dict(zip(unique, encode_fn(nlp, unique)))
+
+
+def run_pipeline(
+    reader: Iterable[RowResult],
+    *,
+    nlp,
+    encode_fn,
+    predict_for: PredictFactory,
+    writer: OutputWriter,
+    metrics,
+    settings: Settings,
+    stats: RunStats,
+    text_col: str,
+    headers: set[str],
+    group_col: str | None,
+    group_stats: GroupStats,
+    batch_limit: int,
+    cache: PredictionCache | None = None,
+    dedup: TextDeduplicator | None = None,
+    live: LiveMetricsPublisher | None = None,
+) -> None:
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    tokenized = _Channel("tokenized", settings.pipeline_queue_size, metrics, stop)
+    results = _Channel("results", settings.pipeline_queue_size, metrics, stop)
+    pool = ThreadPoolExecutor(
+        max_workers=settings.pipeline_workers, thread_name_prefix="tokenizer"
+    )
+
+    def fail(exc: BaseException) -> None:
+        errors.append(exc)
+        stop.set()
+
+    def read_stage() -> None:
+        batch: List[Dict[str, str]] = []
+
+        def submit(rows: List[Dict[str, str]]) -> None:
+            texts = [(r.get(text_col) or "").strip() for r in rows]
+            future: Future[Encodings] = pool.submit(_encode_unique, encode_fn, nlp, texts)
+            tokenized.put(("batch", rows, future), "reader")
+
+        try:
+            for row, error in reader:
+                stats.rows_seen += 1
+                if settings.max_rows is not None and stats.rows_seen > settings.max_rows:
+                    logger.info("Row limit reached", extra={"max_rows": settings.max_rows})
+                    break
+                if error == "skipped_row":
+                    stats.skipped += 1
+                    continue
+                if error:
+                    tokenized.put(("invalid", row, error), "reader")
+                    continue
+                batch.append(row)
+                if len(batch) >= batch_limit:
+                    submit(batch)
+                    batch = []
+            if batch:
+                submit(batch)
+            tokenized.put(_DONE, "reader")
+        except _Stopped:
+            return
+        except BaseException as exc:
+            fail(exc)
+
+    def write_stage() -> None:
+        try:
+            while True:
+                item = results.get("writer")
+                if item is _DONE:
+                    return
+                if item[0] == "invalid":
+                    _, row, error = item
+                    stats.failed += 1
+                    stats.invalid += 1
+                    metrics.inc_failed(1)
+                    if len(stats.error_samples) < 5:
+                        stats.error_samples.append(error)
+                    writer.write_error(row, error)
+                    continue
+                record_batch(
+                    item[1],
+                    writer=writer,
+                    metrics=metrics,
+                    stats=stats,
+                    text_col=text_col,
+                    headers=headers,
+                    group_col=group_col,
+                    group_stats=group_stats,
+                    live=live,
+                )
+                logger.info(
+                    "Batch complete",
+                    extra={
+                        "rows_seen": stats.rows_seen,
+                        "processed": stats.processed,
+                        "failed": stats.failed,
+                    },
+                )
+        except _Stopped:
+            return
+        except BaseException as exc:
+            fail(exc)
+
+    threads = [
+        threading.Thread(target=read_stage, name="reader", daemon=True),
+        threading.Thread(target=write_stage, name="writer", daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    # Inference stage
+    try:
+        while True:
+            item = tokenized.get("inference")
+            if item is _DONE:
+                results.put(_DONE, "inference")
+                break
+            if item[0] == "invalid":
+                results.put(item, "inference")
+                continue
+            _, rows, future = item
+            try:
+                encodings = future.result()
+            except Exception as e:
+                # Tokenization is part of prediction in the serial path, so a
+                # failure here fails the batch the same way a model error does
+                result = BatchResult(rows=rows, error=str(e))
+            else:
+                result = run_batch_inference(
+                    rows,
+                    nlp=nlp,
+                    predict_fn=predict_for(encodings),
+                    text_col=text_col,
+                    cache=cache,
+                    dedup=dedup,
+                )
+            results.put(("batch", result), "inference")
+    except _Stopped:
+        pass
+    except BaseException as exc:
+        fail(exc)
+    finally:
+        for thread in threads:
+            thread.join()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    if errors:
+        raise errors[0]
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
 import csv
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 import json
 from pathlib import Path
-from typing import Dict
+from typing import Any, Dict, Iterator, Sequence, Tuple
 
+import numpy as np
+
+from app.predictions import NEGATIVE, POSITIVE
 from app.run_tracking import ensure_parent_dir
 
 
@@ -17,7 +20,70 @@ class GroupStatsEntry:
     score_sum: float = 0.0
 
 
-GroupStatsMap = Dict[str, GroupStatsEntry]
+# Per-group counters kept as parallel arrays indexed by group id, so a whole
+# batch is folded in with a few bincount calls instead of one dict update per
+# row. Group ids are handed out in first-seen order, which keeps the summary
+# order identical to the old dict of GroupStatsEntry. Entries are only built
+# on read (items, [] and the JSON helpers).
+class GroupStats:
+    def __init__(self) -> None:
+        self._ids: Dict[str, int] = {}
+        self._total = np.zeros(0, dtype=np.int64)
+        self._positive = np.zeros(0, dtype=np.int64)
+        self._negative = np.zeros(0, dtype=np.int64)
+        self._score_sum = np.zeros(0, dtype=np.float64)
+
+    def _reserve(self, size: int) -> None:
+        capacity = len(self._total)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2, 16)
+        for name in ("_total", "_positive", "_negative", "_score_sum"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def group_ids(self, groups: Sequence[str]) -> np.ndarray:
+        ids = self._ids
+        out = np.fromiter(
+            (ids.setdefault(group, len(ids)) for group in groups), dtype=np.intp, count=len(groups)
+        )
+        self._reserve(len(ids))
+        return out
+
+    def add(self, group_ids: np.ndarray, kinds: np.ndarray, scores: np.ndarray) -> None:
+        n = len(self._ids)
+        self._total[:n] += np.bincount(group_ids, minlength=n)
+        self._positive[:n] += np.bincount(group_ids[kinds == POSITIVE], minlength=n)
+        self._negative[:n] += np.bincount(group_ids[kinds == NEGATIVE], minlength=n)
+        self._score_sum[:n] += np.bincount(group_ids, weights=scores, minlength=n)
+
+    def add_entry(self, group: str, entry: GroupStatsEntry) -> None:
+        i = int(self.group_ids([group])[0])
+        self._total[i] += int(entry.total)
+        self._positive[i] += int(entry.positive)
+        self._negative[i] += int(entry.negative)
+        self._score_sum[i] += entry.score_sum
+
+    def __getitem__(self, group: str) -> GroupStatsEntry:
+        i = self._ids[group]
+        return GroupStatsEntry(
+            total=float(self._total[i]),
+            positive=float(self._positive[i]),
+            negative=float(self._negative[i]),
+            score_sum=float(self._score_sum[i]),
+        )
+
+    def items(self) -> Iterator[Tuple[str, GroupStatsEntry]]:
+        for group in self._ids:
+            yield group, self[group]
+
+    def __contains__(self, group: object) -> bool:
+        return group in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
 
 
 def dataset_name_from_path(path: Path) -> str:
@@ -27,23 +93,20 @@ def dataset_name_from_path(path: Path) -> str:
     return stem or "dataset"
 
 
-def update_group_stats(
-    stats: GroupStatsMap,
-    group_value: str,
-    label: str,
-    score: float,
-) -> None:
-    entry = stats.setdefault(
-        group_value,
-        GroupStatsEntry(),
-    )
-    entry.total += 1
-    label_norm = (label or "").lower()
-    if "pos" in label_norm:
-        entry.positive += 1
-    elif "neg" in label_norm:
-        entry.negative += 1
-    entry.score_sum += score
+def group_stats_to_dict(stats: GroupStats) -> Dict[str, Dict[str, float]]:
+    return {group: asdict(entry) for group, entry in stats.items()}
+
+
+def group_stats_from_dict(data: Dict[str, Dict[str, Any]]) -> GroupStats:
+    stats = GroupStats()
+    for group, entry in data.items():
+        stats.add_entry(group, GroupStatsEntry(**entry))
+    return stats
+
+
+def merge_group_stats(into: GroupStats, other: GroupStats) -> None:
+    for group, entry in other.items():
+        into.add_entry(group, entry)
 
 
 def write_group_summary(
@@ -51,7 +114,7 @@ def write_group_summary(
     csv_path: Path,
     dataset_type: str,
     group_col: str | None,
-    stats: GroupStatsMap,
+    stats: GroupStats,
 ) -> None:
     if not stats:
         return
@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import atexit
+import importlib
+import logging
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import traceback
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.model_cache import ModelCache
+
+logger = logging.getLogger("batch_infer")
+
+# Warm runners for the API's job scheduler (WARM_POOL=1).
+# Instead of a fresh `python -m app.main` per job, each job goes to a
+# long-lived runner process that has already imported torch/transformers and
+# keeps recently used models loaded (app.model_cache). The runner applies the
+# job's environment, points stdout/stderr at the job's log and calls
+# app.main.main() with its model cache, so a run behaves exactly like a cold
+# one minus the startup. A job is handed to an idle runner that already holds
+# its model when there is one. Cancelling a job kills its runner; a fresh one
+# takes its place on the next job.
+
+RUNNER_ENTRY = "app.main:main"
+
+Entry = Callable[[ModelCache], int]
+
+
+def _resolve(spec: str) -> Entry:
+    module, name = spec.split(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def _run_job(entry: Entry, cache: ModelCache, env: Dict[str, str], log_path: str) -> int:
+    os.environ.clear()
+    os.environ.update(env)
+    threads = env.get("OMP_NUM_THREADS")
+    if threads:
+        # torch only reads OMP_NUM_THREADS at import, which already happened
+        try:
+            import torch
+
+            torch.set_num_threads(int(threads))
+        except (ImportError, ValueError):
+            pass
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = os.dup(1), os.dup(2)
+    with open(log_path, "ab") as log:
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+    try:
+        return int(entry(cache) or 0)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else 1
+    except BaseException:
+        traceback.print_exc()
+        return 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(saved[0], 1)
+        os.dup2(saved[1], 2)
+        os.close(saved[0])
+        os.close(saved[1])
+
+
+def _serve(conn, entry_spec: str, max_bytes: int, max_models: int, cwd: str | None) -> None:
+    # Runner process: import everything once, then run jobs until told to stop
+    if cwd:
+        os.chdir(cwd)
+    entry = _resolve(entry_spec)
+    cache = ModelCache(max_bytes, max_models)
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        env, log_path = job
+        exit_code = _run_job(entry, cache, env, log_path)
+        conn.send((exit_code, cache.resident()))
+
+
+class _Runner:
+    def __init__(self, ctx, entry: str, max_bytes: int, max_models: int, cwd: Path | None) -> None:
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_serve,
+            args=(child, entry, max_bytes, max_models, str(cwd) if cwd else None),
+            name="warm-runner",
+        )
+        self.process.start()
+        child.close()
+        self.resident: List[str] = []
+        self.jobs = 0
+
+
+class WarmRun:
+    # Popen-like handle for one job on a warm runner (what JobScheduler uses)
+    def __init__(self, runner: _Runner) -> None:
+        self._runner = runner
+        self.pid = runner.process.pid
+        self.returncode: int | None = None
+        self._done = threading.Event()
+
+    def poll(self) -> int | None:
+        return self.returncode
+
+    def wait(self, timeout: float | None = None) -> int:
+        if not self._done.wait(timeout):
+            raise subprocess.TimeoutExpired("warm-runner", timeout or 0)
+        assert self.returncode is not None
+        return self.returncode
+
+    def terminate(self) -> None:
+        self._runner.process.terminate()
+
+    def kill(self) -> None:
+        self._runner.process.kill()
+
+
+class WarmRunnerPool:
+    def __init__(
+        self,
+        size: int,
+        max_model_bytes: int,
+        max_models: int,
+        entry: str = RUNNER_ENTRY,
+        cwd: Path | None = None,
+        prestart: bool = True,
+    ) -> None:
+        if size <= 0:
+            raise ValueError("size must be > 0")
+        self.size = size
+        # max_model_bytes is for the whole pool; each runner gets an equal share
+        self.max_model_bytes = max_model_bytes
+        self.runner_model_bytes = max_model_bytes // size
+        self.max_models = max_models
+        self.entry = entry
+        self.cwd = cwd
+        # spawn, not fork: the API process has threads and an event loop
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: List[_Runner] = []
+        self._busy: List[_Runner] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        if prestart:
+            self.start()
+        atexit.register(self.close)
+
+    def start(self) -> None:
+        # Bring the pool up to size ahead of the first jobs; without this,
+        # runners are started as jobs arrive
+        with self._lock:
+            if not self._closed:
+                self._idle.extend(self._spawn() for _ in range(self.size - len(self._idle) - len(self._busy)))
+
+    def _spawn(self) -> _Runner:
+        return _Runner(self._ctx, self.entry, self.runner_model_bytes, self.max_models, self.cwd)
+
+    def _checkout(self, model_name: str | None) -> _Runner:
+        with self._lock:
+            self._idle = [r for r in self._idle if r.process.is_alive()]
+            runner = next((r for r in self._idle if model_name in r.resident), None)
+            if runner is None and self._idle:
+                runner = self._idle[0]
+            if runner is not None:
+                self._idle.remove(runner)
+            else:
+                runner = self._spawn()
+            self._busy.append(runner)
+        return runner
+
+    def launch(self, env: Dict[str, str], log_path: Path) -> WarmRun:
+        runner = self._checkout(env.get("MODEL_NAME"))
+        run = WarmRun(runner)
+        runner.conn.send((env, str(log_path)))
+        runner.jobs += 1
+        threading.Thread(target=self._collect, args=(runner, run), name="warm-run", daemon=True).start()
+        return run
+
+    def _collect(self, runner: _Runner, run: WarmRun) -> None:
+        alive = True
+        try:
+            exit_code, runner.resident = runner.conn.recv()
+        except (EOFError, OSError):
+            # Killed (cancel) or crashed: report how it died and drop it
+            alive = False
+            runner.process.join()
+            exit_code = runner.process.exitcode if runner.process.exitcode is not None else 1
+            runner.conn.close()
+        with self._lock:
+            self._busy.remove(runner)
+            if alive and not self._closed and len(self._idle) < self.size:
+                self._idle.append(runner)
+            elif alive:
+                self._stop(runner)
+        # The runner is back in the pool before the scheduler hears the job ended
+        run.returncode = exit_code
+        run._done.set()
+
+    @staticmethod
+    def _stop(runner: _Runner) -> None:
+        try:
+            runner.conn.send(None)
+        except OSError:
+            pass
+        runner.process.join(timeout=5)
+        if runner.process.is_alive():
+            runner.process.terminate()
+        runner.conn.close()
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "idle": len(self._idle),
+                "busy": len(self._busy),
+                "resident": sorted({name for r in self._idle + self._busy for name in r.resident}),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            runners: Tuple[_Runner, ...] = (*self._idle, *self._busy)
+            self._idle, self._busy = [], []
+        for runner in runners:
+            if runner.process.is_alive():
+                runner.process.terminate()
+            runner.process.join(timeout=5)
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+from typing import Any, Callable, Dict, List
+
+from app.bucketing import PredictFn, length_buckets
+from app.predictions import Predictions, as_predictions, unscatter
+
+logger = logging.getLogger("batch_infer")
+
+# Data-parallel inference across processes (WORKERS=N).
+# Each worker process loads the model once and pins torch to its own slice of
+# intra-op threads, so N workers share the cores instead of fighting over them.
+# The parent keeps doing everything else (reading, dedup, cache, stats, output);
+# it only splits each batch into model-sized chunks, runs them on the workers in
+# parallel and puts the predictions back in input order.
+
+_worker_nlp: Any = None
+_worker_predict: PredictFn | None = None
+_worker_error: str | None = None
+
+
+def _init_worker(
+    model_name: str,
+    max_len: int,
+    threads: int,
+    loader: Callable[..., Any] | None,
+    predictor: PredictFn | None,
+    load_options: Dict[str, Any],
+) -> None:
+    global _worker_nlp, _worker_predict, _worker_error
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    # An initializer that raises makes Pool respawn the worker forever, so the
+    # error is kept and reported by the first task instead
+    try:
+        if loader is None or predictor is None:
+            # Imported here so the parent does not need torch/transformers loaded
+            from app.inference import load_sentiment_pipeline, predict_batch
+
+            loader = loader or load_sentiment_pipeline
+            predictor = predictor or predict_batch
+        _worker_nlp = loader(model_name, max_len, **load_options)
+        _worker_predict = predictor
+    except Exception as e:
+        _worker_error = f"{type(e).__name__}: {e}"
+
+
+def _predict_chunk(texts: List[str]) -> Predictions:
+    if _worker_error is not None or _worker_predict is None:
+        raise RuntimeError(f"Worker failed to load model: {_worker_error}")
+    # Arrays pickle far more compactly than a dict per row
+    return as_predictions(_worker_predict(_worker_nlp, texts))
+
+
+def _check_ready(_: int) -> str | None:
+    return _worker_error
+
+
+def default_threads_per_worker(workers: int) -> int:
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+class InferenceWorkerPool:
+    def __init__(
+        self,
+        model_name: str,
+        max_len: int,
+        workers: int,
+        batch_size: int,
+        threads_per_worker: int | None = None,
+        loader: Callable[..., Any] | None = None,
+        predictor: PredictFn | None = None,
+        load_options: Dict[str, Any] | None = None,
+    ) -> None:
+        if workers <= 0:
+            raise ValueError("workers must be > 0")
+        self.workers = workers
+        self.batch_size = batch_size
+        self.threads_per_worker = threads_per_worker or default_threads_per_worker(workers)
+        # spawn: forked children would inherit the parent's torch thread pools
+        ctx = multiprocessing.get_context("spawn")
+        self._pool = ctx.Pool(
+            processes=workers,
+            initializer=_init_worker,
+            initargs=(
+                model_name,
+                max_len,
+                self.threads_per_worker,
+                loader,
+                predictor,
+                dict(load_options or {}),
+            ),
+        )
+
+    def check_ready(self) -> None:
+        # Surface model load errors at startup rather than on the first batch
+        for error in self._pool.map(_check_ready, range(self.workers), chunksize=1):
+            if error is not None:
+                raise RuntimeError(f"Worker failed to load model: {error}")
+
+    def predict(self, texts: List[str], lengths: List[int] | None = None) -> Predictions:
+        if not texts:
+            return Predictions.empty()
+        if lengths is None:
+            chunks = [
+                list(range(i, min(i + self.batch_size, len(texts))))
+                for i in range(0, len(texts), self.batch_size)
+            ]
+        else:
+            chunks = length_buckets(lengths, self.batch_size)
+        # map keeps chunk order, so results line up with the chunk indices
+        outputs = self._pool.map(_predict_chunk, [[texts[i] for i in chunk] for chunk in chunks])
+        return unscatter(chunks, outputs)
+
+    def close(self) -> None:
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self) -> None:
+        self._pool.terminate()
+        self._pool.join()
+
+
+def pool_predict(pool: InferenceWorkerPool, texts: List[str]) -> Predictions:
+    return pool.predict(texts)
+
+
+def pool_predict_sorted(pool: InferenceWorkerPool, texts: List[str]) -> Predictions:
+    # The parent has no tokenizer in worker mode, so character length stands in
+    # for token length when grouping a SORT_WINDOW into similar-length chunks
+    return pool.predict(texts, lengths=[len(text) for text in texts])
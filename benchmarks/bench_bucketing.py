@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import time
+from pathlib import Path
+from typing import List
+
+from app.bucketing import bucketed_predict
+from app.inference import load_sentiment_pipeline, predict_batch, token_lengths
+
+# Compare rows/sec of file-order batching against length-bucketed batching.
+# Usage: python -m benchmarks.bench_bucketing --input data/test-set.csv --text-col text
+
+
+def _load_texts(path: Path, text_col: str, max_rows: int | None) -> List[str]:
+    texts: List[str] = []
+    for encoding in ("utf-8", "latin-1"):
+        try:
+            with path.open("r", newline="", encoding=encoding) as f:
+                texts = []
+                for row in csv.DictReader(f):
+                    text = (row.get(text_col) or "").strip()
+                    if text:
+                        texts.append(text)
+                    if max_rows is not None and len(texts) >= max_rows:
+                        break
+            return texts
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f"Could not decode {path}")
+
+
+def _run(nlp, predict_fn, texts: List[str], window: int) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(texts), window):
+        predict_fn(nlp, texts[i:i + window])
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark length-bucketed batching")
+    parser.add_argument("--input", default="data/test-set.csv", help="Input CSV")
+    parser.add_argument("--text-col", default="text", help="Text column name")
+    parser.add_argument("--model", default="distilbert-base-uncased-finetuned-sst-2-english")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--window", type=int, default=1024, help="SORT_WINDOW for the bucketed run")
+    parser.add_argument("--max-len", type=int, default=256)
+    parser.add_argument("--max-rows", type=int, default=None)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = _load_texts(Path(args.input), args.text_col, args.max_rows)
+    nlp = load_sentiment_pipeline(args.model, args.max_len)
+    bucketed = bucketed_predict(predict_batch, args.batch_size, token_lengths)
+
+    # Warm up once so the first measured run does not pay for lazy init
+    predict_batch(nlp, texts[: args.batch_size])
+
+    print(f"rows={len(texts)} batch_size={args.batch_size} window={args.window}")
+    for name, fn, window in (
+        ("file-order", predict_batch, args.batch_size),
+        ("bucketed", bucketed, args.window),
+    ):
+        best = min(_run(nlp, fn, texts, window) for _ in range(args.repeats))
+        print(f"{name:>10}: {best:8.2f}s  {len(texts) / best:10.1f} rows/sec")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import dataclasses
+import tempfile
+import time
+from pathlib import Path
+
+from app.config import load_settings
+from app.csv_utils import process_csv
+
+# Parse throughput of the input reader: the old DictReader + full-row sanitize
+# loop against the column-projected reader (csv module and, if installed, pyarrow).
+# Usage: python -m benchmarks.bench_csv_parse --input data/test-set.csv --text-col text --copies 50
+
+
+def _dictreader_baseline(path: Path, text_col: str) -> int:
+    # What every row used to cost: a DictReader dict plus a stripped copy of it
+    count = 0
+    with path.open("r", newline="", encoding="latin-1") as f:
+        for row in csv.DictReader(f):
+            sanitized = {k: ("" if v is None else str(v).strip()) for k, v in row.items() if k is not None}
+            if sanitized.get(text_col, ""):
+                count += 1
+    return count
+
+
+def _projected(path: Path, settings) -> int:
+    processed = process_csv(path, settings)
+    if processed is None:
+        raise SystemExit("Could not read input")
+    reader, _, _, f_in = processed
+    try:
+        return sum(1 for row, error in reader if error is None)
+    finally:
+        f_in.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark CSV parse throughput")
+    parser.add_argument("--input", default="data/test-set.csv", help="Input CSV")
+    parser.add_argument("--text-col", default="text", help="Text column name")
+    parser.add_argument("--copies", type=int, default=50, help="Repeat the data rows to make a larger file")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    source = Path(args.input)
+    header, _, body = source.read_bytes().partition(b"\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.csv"
+        with path.open("wb") as f:
+            f.write(header + b"\n")
+            for _ in range(args.copies):
+                f.write(body if body.endswith(b"\n") else body + b"\n")
+        size_mb = path.stat().st_size / 1e6
+
+        base = dataclasses.replace(load_settings(), text_col=args.text_col)
+        runs = [
+            ("dictreader", lambda: _dictreader_baseline(path, args.text_col)),
+            ("projected", lambda: _projected(path, base)),
+            ("pyarrow", lambda: _projected(path, dataclasses.replace(base, csv_engine="pyarrow"))),
+        ]
+        print(f"file={size_mb:.1f} MB copies={args.copies}")
+        for name, fn in runs:
+            timings = []
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                rows = fn()
+                timings.append(time.perf_counter() - start)
+            best = min(timings)
+            print(f"{name:>10}: {best:8.3f}s  {rows / best:12.0f} rows/sec  {size_mb / best:8.1f} MB/s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
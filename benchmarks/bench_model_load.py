@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from app.model_artifact import has_prepared_model, prepare_model
+
+# Model startup before and after `make prep-model`: N processes load the model
+# at once, either through from_pretrained or from the prepared artifact, and
+# each reports its load time and memory once loaded. RSS counts the mapped
+# weights in every process; PSS splits shared pages between the processes
+# that map them, so total PSS is what the host really spends on N copies.
+# Usage: python -m benchmarks.bench_model_load --procs 4
+
+
+def _memory() -> Dict[str, int]:
+    # kB values from /proc/self/smaps_rollup (Linux)
+    fields = {"Rss": "rss", "Pss": "pss", "Private_Clean": "private", "Private_Dirty": "private"}
+    out = {"rss": 0, "pss": 0, "private": 0}
+    with open("/proc/self/smaps_rollup", encoding="ascii") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in fields:
+                out[fields[key]] += int(value.split()[0]) * 1024
+    return out
+
+
+def _child(mode: str, model: str, max_len: int, prepared_dir: Path) -> int:
+    started = time.perf_counter()
+    from app.inference import load_sentiment_pipeline, predict_batch
+
+    imported = time.perf_counter()
+    nlp = load_sentiment_pipeline(model, max_len, prepared_dir=prepared_dir if mode == "prepared" else None)
+    predict_batch(nlp, ["warm up"])
+    loaded = time.perf_counter()
+    print(json.dumps({"import_s": imported - started, "load_s": loaded - imported, **_memory()}), flush=True)
+    # Stay resident until every process has reported
+    sys.stdin.read()
+    return 0
+
+
+def _run(mode: str, args: argparse.Namespace) -> List[Dict[str, float]]:
+    command = [
+        sys.executable, "-m", "benchmarks.bench_model_load", "--child", mode,
+        "--model", args.model, "--max-len", str(args.max_len), "--prepared-dir", args.prepared_dir,
+    ]
+    procs = [
+        subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for _ in range(args.procs)
+    ]
+    try:
+        return [json.loads(p.stdout.readline()) for p in procs]
+    finally:
+        for p in procs:
+            p.stdin.close()
+            p.wait()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark model startup from the hub vs a prepared artifact")
+    parser.add_argument("--model", default="distilbert-base-uncased-finetuned-sst-2-english")
+    parser.add_argument("--max-len", type=int, default=256)
+    parser.add_argument("--prepared-dir", default="output/prepared")
+    parser.add_argument("--procs", type=int, default=4, help="Processes loading the model at once")
+    parser.add_argument("--child", choices=["hub", "prepared"], default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return _child(args.child, args.model, args.max_len, Path(args.prepared_dir))
+
+    if not has_prepared_model(Path(args.prepared_dir), args.model):
+        prepare_model(args.model, Path(args.prepared_dir))
+    mb = 1024 * 1024
+    print(f"model={args.model} procs={args.procs}")
+    print(f"{'mode':>9} {'import':>8} {'load':>8} {'rss/proc':>10} {'private/proc':>13} {'pss total':>10}")
+    for mode in ("hub", "prepared"):
+        stats = _run(mode, args)
+        n = len(stats)
+        print(
+            f"{mode:>9} {sum(s['import_s'] for s in stats) / n:7.2f}s {sum(s['load_s'] for s in stats) / n:7.2f}s "
+            f"{sum(s['rss'] for s in stats) / n / mb:8.0f}MB {sum(s['private'] for s in stats) / n / mb:11.0f}MB "
+            f"{sum(s['pss'] for s in stats) / mb:8.0f}MB"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+import urllib.request
+from typing import Callable, List
+
+import numpy as np
+
+from app.microbatch import MicroBatcher
+from app.predictions import Predictions
+
+# Load generator for online scoring (POST /api/predict).
+# N closed-loop clients send one-text requests back to back; reports requests/sec
+# and client-side p50/p95/p99 latency. By default it drives the micro-batcher
+# in-process against a stub model whose cost is a fixed per-call overhead plus
+# a per-text cost (roughly how a CPU forward pass scales), once without
+# batching and once per --max-wait-ms. With --url it hits a running API instead.
+# Usage: python -m benchmarks.bench_predict --clients 32 --duration 5
+#        python -m benchmarks.bench_predict --url http://localhost:8000/api/predict
+
+
+class StubModel:
+    def __init__(self, overhead_s: float, per_text_s: float) -> None:
+        self.overhead_s = overhead_s
+        self.per_text_s = per_text_s
+
+    def __call__(self, _nlp: object, texts: List[str]) -> Predictions:
+        time.sleep(self.overhead_s + self.per_text_s * len(texts))
+        return Predictions(np.array(["POSITIVE"] * len(texts), dtype=object), np.full(len(texts), 0.9))
+
+
+def _http_request(url: str) -> Callable[[str], None]:
+    def send(text: str) -> None:
+        body = json.dumps({"text": text}).encode("utf-8")
+        req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            resp.read()
+
+    return send
+
+
+def _load(send: Callable[[str], None], clients: int, duration_s: float) -> List[float]:
+    latencies: List[float] = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration_s
+
+    def client(i: int) -> None:
+        own: List[float] = []
+        n = 0
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            send(f"client {i} request {n} was pretty good")
+            own.append(time.perf_counter() - start)
+            n += 1
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies
+
+
+def _report(label: str, latencies: List[float], duration_s: float) -> None:
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    print(
+        f"{label:<24} {len(latencies) / duration_s:10.1f} req/s "
+        f"p50={p50:7.2f}ms p95={p95:7.2f}ms p99={p99:7.2f}ms"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark micro-batched online scoring")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per configuration")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", default="1,5,10", help="Comma-separated waits to compare")
+    parser.add_argument("--overhead-ms", type=float, default=5.0, help="Stub model cost per call")
+    parser.add_argument("--per-text-ms", type=float, default=0.3, help="Stub model cost per text")
+    parser.add_argument("--url", default=None, help="Load a running /api/predict instead of the stub")
+    args = parser.parse_args()
+
+    print(f"clients={args.clients} duration={args.duration}s")
+    if args.url:
+        _report(args.url, _load(_http_request(args.url), args.clients, args.duration), args.duration)
+        return 0
+
+    model = StubModel(args.overhead_ms / 1000, args.per_text_ms / 1000)
+    configs = [("unbatched", 1, 0.0)] + [
+        (f"batch<={args.max_batch} wait={ms}ms", args.max_batch, float(ms) / 1000)
+        for ms in args.max_wait_ms.split(",")
+    ]
+    for label, max_batch, max_wait_s in configs:
+        batcher = MicroBatcher(None, model, max_batch, max_wait_s)
+        try:
+            latencies = _load(lambda text: batcher.predict([text]), args.clients, args.duration)
+        finally:
+            batcher.close()
+        _report(label, latencies, args.duration)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from app.history import RunHistoryStore, RunHistoryTail, history_db_path
+
+# /api/runs latency against history size: the old full JSONL rescan, the
+# in-memory tail cache and the SQLite index. Each timed request follows one
+# freshly appended run, as the dashboard sees during normal use.
+# Usage: python -m benchmarks.bench_run_history --sizes 10000,100000,1000000
+
+
+def _record(i: int) -> Dict[str, Any]:
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S+0000", time.gmtime(1_700_000_000 + i * 60)),
+        "input_csv": f"output/uploads/batch-{i}.csv",
+        "output_csv": f"output/predictions_{i}.csv",
+        "text_col": "text",
+        "model_name": f"model-{i % 5}",
+        "batch_size": 32,
+        "max_len": 256,
+        "max_rows": None,
+        "metrics_port": None,
+        "rows_seen": 1000,
+        "processed": 990,
+        "failed": 10,
+        "skipped": 0,
+        "invalid": 10,
+        "error_samples": ["missing_text"],
+        "avg_score": 0.91,
+        "positive": 500,
+        "negative": 400,
+        "neutral": 90,
+        "runtime_s": 12.5,
+        "dataset_type": f"dataset-{i % 11}",
+        "group_col": None,
+    }
+
+
+def _rescan(path: Path, q: str | None, limit: int) -> List[Dict[str, Any]]:
+    # What /api/runs used to do on every request
+    runs = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                runs.append(json.loads(line))
+    if q:
+        runs = [r for r in runs if q.lower() in json.dumps(r).lower()]
+    return runs[-limit:]
+
+
+def _timed(fn: Callable[[], Any], repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark /api/runs backends")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated history sizes")
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--cache-size", type=int, default=5000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'runs':>9} {'backend':>8} {'cold':>9} {'page':>9} {'search':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "run_history.jsonl"
+            with path.open("w", encoding="utf-8") as f:
+                for i in range(size):
+                    f.write(json.dumps(_record(i)) + "\n")
+            q = f"batch-{size // 2}."
+            n = size
+
+            def append() -> None:
+                nonlocal n
+                # Plain JSONL append, so the index has something to catch up on
+                with path.open("a", encoding="utf-8") as f:
+                    f.write(json.dumps(_record(n)) + "\n")
+                n += 1
+
+            # The rescan is slow enough at 1M that one run per request is plenty
+            rescan_repeats = 1 if size > 100_000 else args.repeats
+            page = _timed(lambda: (append(), _rescan(path, None, args.limit)), rescan_repeats)
+            search = _timed(lambda: (append(), _rescan(path, q, args.limit)), rescan_repeats)
+            print(f"{size:>9} {'rescan':>8} {'-':>9} {page * 1e3:>7.1f}ms {search * 1e3:>7.1f}ms")
+
+            tail = RunHistoryTail(path, args.cache_size)
+            cold = _timed(tail.refresh, 1)
+            page = _timed(lambda: (append(), tail.refresh(), tail.query(None, args.limit)), args.repeats)
+            print(f"{size:>9} {'tail':>8} {cold * 1e3:>7.1f}ms {page * 1e3:>7.1f}ms {'(index)':>9}")
+
+            store = RunHistoryStore(history_db_path(path))
+            try:
+                cold = _timed(lambda: store.backfill(path), 1)
+                page = _timed(lambda: (append(), store.backfill(path), store.query(limit=args.limit)),
+                              args.repeats)
+                search = _timed(lambda: (append(), store.backfill(path), store.query(q=q, limit=args.limit)),
+                                args.repeats)
+            finally:
+                store.close()
+            print(f"{size:>9} {'sqlite':>8} {cold * 1e3:>7.1f}ms {page * 1e3:>7.1f}ms {search * 1e3:>7.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
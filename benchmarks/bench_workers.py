@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from pathlib import Path
+
+from app.workers import InferenceWorkerPool, default_threads_per_worker
+from benchmarks.bench_bucketing import _load_texts
+
+# Scaling benchmark for WORKERS=N: rows/sec from 1 to N worker processes.
+# Usage: python -m benchmarks.bench_workers --input data/test-set.csv --text-col text --max-workers 8
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark multi-process inference scaling")
+    parser.add_argument("--input", default="data/test-set.csv", help="Input CSV")
+    parser.add_argument("--text-col", default="text", help="Text column name")
+    parser.add_argument("--model", default="distilbert-base-uncased-finetuned-sst-2-english")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-len", type=int, default=256)
+    parser.add_argument("--max-rows", type=int, default=None)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    texts = _load_texts(Path(args.input), args.text_col, args.max_rows)
+    print(f"rows={len(texts)} batch_size={args.batch_size} cpus={os.cpu_count()}")
+
+    baseline: float | None = None
+    workers = 1
+    while workers <= args.max_workers:
+        pool = InferenceWorkerPool(args.model, args.max_len, workers, args.batch_size)
+        try:
+            # Model load happens in the workers; keep it out of the timing
+            pool.check_ready()
+            pool.predict(texts[: args.batch_size * workers])
+            start = time.perf_counter()
+            pool.predict(texts)
+            elapsed = time.perf_counter() - start
+        finally:
+            pool.close()
+        rate = len(texts) / elapsed
+        baseline = baseline or rate
+        print(
+            f"workers={workers:>3} threads/worker={default_threads_per_worker(workers):>3} "
+            f"{elapsed:8.2f}s {rate:10.1f} rows/sec  x{rate / baseline:.2f}"
+        )
+        workers *= 2
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+from typing import List
+
+from app.inference import load_sentiment_pipeline, predict_batch
+from app.predictions import Predictions, as_predictions, concat_predictions
+from benchmarks.bench_bucketing import _load_texts
+
+# Decide per model whether QUANTIZE=int8 is worth it: rows/sec of the float and
+# int8 models on the same texts, and how often their labels agree.
+# Usage: python -m benchmarks.eval_quantize --input data/test-set.csv --text-col text
+
+
+def _predict_all(nlp, texts: List[str], batch_size: int) -> tuple[Predictions, float]:
+    parts = []
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        parts.append(as_predictions(predict_batch(nlp, texts[i:i + batch_size])))
+    return concat_predictions(parts), time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Evaluate int8 dynamic quantization")
+    parser.add_argument("--input", default="data/test-set.csv", help="Input CSV")
+    parser.add_argument("--text-col", default="text", help="Text column name")
+    parser.add_argument("--model", default="distilbert-base-uncased-finetuned-sst-2-english")
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx"])
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-len", type=int, default=256)
+    parser.add_argument("--max-rows", type=int, default=None)
+    args = parser.parse_args()
+
+    texts = _load_texts(Path(args.input), args.text_col, args.max_rows)
+    print(f"rows={len(texts)} batch_size={args.batch_size} backend={args.backend}")
+
+    results = {}
+    for quantize in (None, "int8"):
+        nlp = load_sentiment_pipeline(args.model, args.max_len, backend=args.backend, quantize=quantize)
+        # Warm up once so the measured pass does not pay for lazy init
+        predict_batch(nlp, texts[: args.batch_size])
+        predictions, elapsed = _predict_all(nlp, texts, args.batch_size)
+        results[quantize or "float"] = predictions
+        print(f"{quantize or 'float':>6}: {elapsed:8.2f}s  {len(texts) / elapsed:10.1f} rows/sec")
+
+    base, quant = results["float"], results["int8"]
+    agree = int((base.labels == quant.labels).sum())
+    max_delta = float(abs(base.scores - quant.scores).max()) if len(base) else 0.0
+    print(f"label agreement: {agree}/{len(base)} ({agree / max(len(base), 1):.2%})")
+    print(f"max score delta: {max_delta:.4f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,55 @@
+import csv
+from pathlib import Path
+
+import pytest
+
+from app.bucketing import bucketed_predict, length_buckets
+from tests.test_helper import import_main, write_csv
+
+
+def test_length_buckets_group_similar_lengths() -> None:
+    assert length_buckets([5, 1, 4, 2], batch_size=2) == [[1, 3], [2, 0]]
+
+
+def test_bucketed_predict_restores_input_order() -> None:
+    calls: list[list[str]] = []
+
+    def predict(_nlp, texts):
+        calls.append(list(texts))
+        return [{"label": t, "score": 1.0} for t in texts]
+
+    wrapped = bucketed_predict(predict, 2, lambda _nlp, texts: [len(t) for t in texts])
+    out = wrapped(None, ["long text", "a", "medium", "bb"])
+
+    assert out.labels.tolist() == ["long text", "a", "medium", "bb"]
+    assert calls == [["a", "bb"], ["medium", "long text"]]
+
+
+def test_sort_window_keeps_output_order(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    input_path = tmp_path / "data" / "input.csv"
+    texts = ["a much longer review text", "short", "mid length", "tiny", "x"]
+    write_csv(input_path, rows=[[t] for t in texts], header=["Text"])
+
+    monkeypatch.setenv("INPUT_CSV", str(input_path))
+    monkeypatch.setenv("BATCH_SIZE", "2")
+    monkeypatch.setenv("SORT_WINDOW", "4")
+
+    main_mod = import_main(monkeypatch)
+    monkeypatch.setattr(main_mod, "load_sentiment_pipeline", lambda *_args, **_kwargs: object())
+    batches: list[list[str]] = []
+
+    def predict(_nlp, batch):
+        batches.append(list(batch))
+        return [{"label": "POSITIVE", "score": len(t)} for t in batch]
+
+    monkeypatch.setattr(main_mod, "predict_batch", predict)
+
+    assert main_mod.main() == 0
+    assert batches[0] == ["tiny", "short"]
+    assert all(len(b) <= 2 for b in batches)
+
+    with (tmp_path / "output" / "predictions.csv").open("r", newline="", encoding="utf-8") as handle:
+        rows = list(csv.DictReader(handle))
+    assert [r["Text"] for r in rows] == texts
+    assert [float(r["score"]) for r in rows] == [float(len(t)) for t in texts]
@@ -0,0 +1,74 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from tests.test_helper import import_main, write_csv
+
+
+class _Crash(BaseException):
+    pass
+
+
+def _predict(_nlp, texts):
+    return [{"label": "NEGATIVE" if "3" in t else "POSITIVE", "score": 0.5} for t in texts]
+
+
+def _setup(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, name: str):
+    monkeypatch.setenv("OUTPUT_CSV", str(tmp_path / name / "predictions.csv"))
+    monkeypatch.setenv("RUN_HISTORY_PATH", str(tmp_path / name / "run_history.jsonl"))
+    # Absolute, as the crashed run's live publisher can outlive the test's chdir
+    monkeypatch.setenv("RUN_LIVE_PATH", str(tmp_path / name / "live_metrics.json"))
+    main_mod = import_main(monkeypatch)
+    monkeypatch.setattr(main_mod, "load_sentiment_pipeline", lambda *_args, **_kwargs: object())
+    monkeypatch.setattr(main_mod, "predict_batch", _predict)
+    return main_mod
+
+
+def _results(out_dir: Path) -> tuple[str, str, dict]:
+    history = json.loads((out_dir / "run_history.jsonl").read_text(encoding="utf-8").splitlines()[-1])
+    counts = {k: history[k] for k in ("rows_seen", "processed", "failed", "invalid", "positive", "negative")}
+    return (
+        (out_dir / "predictions.csv").read_text(encoding="utf-8"),
+        (out_dir / "predictions_group_summary.json").read_text(encoding="utf-8"),
+        counts,
+    )
+
+
+def test_resume_after_crash_matches_uninterrupted_run(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    input_path = tmp_path / "data" / "input.csv"
+    rows = [["" if i == 7 else f"text {i}", f"g{i % 2}"] for i in range(20)]
+    write_csv(input_path, rows=rows, header=["Text", "Group"])
+    monkeypatch.setenv("INPUT_CSV", str(input_path))
+    monkeypatch.setenv("GROUP_COL_INDEX", "1")
+    monkeypatch.setenv("BATCH_SIZE", "3")
+    monkeypatch.setenv("CHECKPOINT_EVERY", "2")
+
+    main_mod = _setup(tmp_path, monkeypatch, "clean")
+    assert main_mod.main() == 1  # the empty text row counts as failed
+    assert not (tmp_path / "clean" / "predictions_checkpoint.json").exists()
+
+    main_mod = _setup(tmp_path, monkeypatch, "crashed")
+    calls = {"n": 0}
+
+    def crashing(_nlp, texts):
+        calls["n"] += 1
+        if calls["n"] == 4:
+            raise _Crash()
+        return _predict(_nlp, texts)
+
+    monkeypatch.setattr(main_mod, "predict_batch", crashing)
+    with pytest.raises(_Crash):
+        main_mod.main()
+    checkpoint = json.loads((tmp_path / "crashed" / "predictions_checkpoint.json").read_text(encoding="utf-8"))
+    assert checkpoint["stats"]["processed"] == 6
+
+    monkeypatch.setenv("RESUME", "1")
+    monkeypatch.setattr(main_mod, "predict_batch", _predict)
+    assert main_mod.main() == 1
+
+    assert _results(tmp_path / "crashed") == _results(tmp_path / "clean")
+    assert not (tmp_path / "crashed" / "predictions_checkpoint.json").exists()
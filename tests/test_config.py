@@ -37,3 +37,39 @@ def test_group_col_index_non_negative(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setenv("GROUP_COL_INDEX", "-1")
     with pytest.raises(ValueError, match="GROUP_COL_INDEX"):
         load_settings()
+
+
+def test_sort_window_not_smaller_than_batch(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("BATCH_SIZE", "32")
+    monkeypatch.setenv("SORT_WINDOW", "16")
+    with pytest.raises(ValueError, match="SORT_WINDOW"):
+        load_settings()
+
+
+def test_max_batch_tokens_excludes_sort_window(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("MAX_BATCH_TOKENS", "4096")
+    monkeypatch.setenv("SORT_WINDOW", "1024")
+    with pytest.raises(ValueError, match="MAX_BATCH_TOKENS"):
+        load_settings()
+
+
+def test_workers_exclude_pipeline(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("WORKERS", "4")
+    monkeypatch.setenv("PIPELINE", "1")
+    with pytest.raises(ValueError, match="WORKERS"):
+        load_settings()
+
+
+def test_shard_index_in_range(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("SHARD_INDEX", "4")
+    monkeypatch.setenv("SHARD_COUNT", "4")
+    with pytest.raises(ValueError, match="SHARD_INDEX"):
+        load_settings()
+
+
+def test_quantize_validation(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("QUANTIZE", "int4")
+    with pytest.raises(ValueError, match="QUANTIZE"):
+        load_settings()
+    monkeypatch.setenv("QUANTIZE", "INT8")
+    assert load_settings().quantize == "int8"
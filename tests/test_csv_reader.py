@@ -0,0 +1,109 @@
+from pathlib import Path
+
+import pytest
+
+from app.config import load_settings
+from app.csv_utils import detect_encoding, process_csv
+
+
+def _read_all(path: Path, monkeypatch: pytest.MonkeyPatch, **env: str):
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    reader, fieldnames, text_col, f_in = process_csv(path, load_settings())
+    try:
+        return list(reader), fieldnames, text_col
+    finally:
+        f_in.close()
+
+
+ROWS = 'id,Text,Group,Extra\n1, good ,A,x\n\n2,,B,y\n,,,\n3,"multi\nline",,z\n4,short\n'
+
+
+def test_reader_projects_text_and_group_columns(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    path = tmp_path / "input.csv"
+    path.write_text(ROWS, encoding="utf-8")
+
+    rows, fieldnames, text_col = _read_all(path, monkeypatch, GROUP_COL_INDEX="2")
+
+    assert fieldnames == ["id", "Text", "Group", "Extra"]
+    assert text_col == "Text"
+    assert rows == [
+        ({"Text": "good", "Group": "A"}, None),
+        (None, "missing_text"),
+        (None, "skipped_row"),
+        ({"Text": "multi\nline", "Group": ""}, None),
+        ({"Text": "short", "Group": ""}, None),
+    ]
+
+
+@pytest.mark.parametrize("follow", ["0", "1"])
+def test_reader_handles_cr_line_endings(follow: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # Files saved with old Mac line endings end every line in a lone \r
+    path = tmp_path / "input.csv"
+    path.write_bytes(ROWS.replace("\n", "\r").encode("utf-8"))
+    (tmp_path / "input.csv.done").touch()
+
+    rows, fieldnames, _ = _read_all(path, monkeypatch, GROUP_COL_INDEX="2", INPUT_FOLLOW=follow)
+
+    assert fieldnames == ["id", "Text", "Group", "Extra"]
+    assert rows == [
+        ({"Text": "good", "Group": "A"}, None),
+        (None, "missing_text"),
+        (None, "skipped_row"),
+        ({"Text": "multi\rline", "Group": ""}, None),
+        ({"Text": "short", "Group": ""}, None),
+    ]
+
+
+def test_pyarrow_engine_matches_python_engine(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "input.csv"
+    path.write_text(ROWS, encoding="utf-8")
+
+    expected, _, _ = _read_all(path, monkeypatch, GROUP_COL_INDEX="2")
+    rows, _, _ = _read_all(path, monkeypatch, GROUP_COL_INDEX="2", CSV_ENGINE="pyarrow")
+    assert rows == expected
+
+
+@pytest.mark.parametrize("follow", ["0", "1"])
+def test_pyarrow_engine_reads_ragged_rows_in_order(
+    follow: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "input.csv"
+    # Enough well-formed rows that the ragged ones land in a later block
+    good = "".join(f"{i},text {i},G\n" for i in range(300_000))
+    path.write_text(f"id,Text,Group\n{good}2,short\n3,\"ok\",B,extra\n4,last,C\n", encoding="utf-8")
+    (tmp_path / "input.csv.done").touch()
+
+    expected, _, _ = _read_all(path, monkeypatch, GROUP_COL_INDEX="2", INPUT_FOLLOW=follow)
+    rows, _, _ = _read_all(path, monkeypatch, GROUP_COL_INDEX="2", INPUT_FOLLOW=follow, CSV_ENGINE="pyarrow")
+    assert rows[-3:] == [
+        ({"Text": "short", "Group": ""}, None),
+        ({"Text": "ok", "Group": "B"}, None),
+        ({"Text": "last", "Group": "C"}, None),
+    ]
+    assert rows == expected
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        "﻿Text,Group\ncafé crème,Zürich\n".encode("utf-8"),
+        "Text,Group\ncafé crème,Zürich\n".encode("latin-1"),
+    ],
+)
+def test_reader_decodes_utf8_and_latin1(data: bytes, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    path = tmp_path / "input.csv"
+    path.write_bytes(data)
+
+    rows, fieldnames, _ = _read_all(path, monkeypatch, GROUP_COL_INDEX="1")
+
+    assert fieldnames == ["Text", "Group"]
+    assert rows == [({"Text": "café crème", "Group": "Zürich"}, None)]
+
+
+def test_detect_encoding_samples_whole_file() -> None:
+    data = "ü".encode("utf-8") * 5000 + b"\xe9" + b"a" * 5000
+    assert detect_encoding(data, samples=4, sample_size=1024) == ("latin-1", 0)
+    assert detect_encoding(data[:-5001], samples=4, sample_size=1024) == ("utf-8", 0)
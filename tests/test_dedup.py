@@ -0,0 +1,69 @@
+import csv
+import json
+from pathlib import Path
+
+import pytest
+
+from app.dedup import TextDeduplicator
+from tests.test_helper import import_main, write_csv
+
+
+def test_dedup_fans_out_and_remembers_across_batches() -> None:
+    dedup = TextDeduplicator(max_entries=10)
+    calls: list[list[str]] = []
+
+    def predict(texts):
+        calls.append(list(texts))
+        return [{"label": t.upper(), "score": 0.5} for t in texts]
+
+    predictions, deduped = dedup.predict(["a", "b", "a"], predict)
+    assert predictions.labels.tolist() == ["A", "B", "A"]
+    assert deduped == 1
+
+    predictions, deduped = dedup.predict(["b", "c"], predict)
+    assert predictions.labels.tolist() == ["B", "C"]
+    assert deduped == 1
+    assert calls == [["a", "b"], ["c"]]
+
+
+def test_dedup_without_memo_only_folds_within_batch() -> None:
+    dedup = TextDeduplicator(max_entries=0)
+    calls: list[list[str]] = []
+
+    def predict(texts):
+        calls.append(list(texts))
+        return [{"label": "POSITIVE", "score": 0.5} for _ in texts]
+
+    dedup.predict(["a", "a"], predict)
+    dedup.predict(["a"], predict)
+    assert calls == [["a"], ["a"]]
+
+
+def test_main_reports_dedup_ratio(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    input_path = tmp_path / "data" / "input.csv"
+    write_csv(input_path, rows=[["rt"], ["rt"], ["new"], ["rt"]], header=["Text"])
+
+    monkeypatch.setenv("INPUT_CSV", str(input_path))
+    monkeypatch.setenv("BATCH_SIZE", "2")
+
+    main_mod = import_main(monkeypatch)
+    monkeypatch.setattr(main_mod, "load_sentiment_pipeline", lambda *_args, **_kwargs: object())
+    sent: list[str] = []
+
+    def predict(_nlp, texts):
+        sent.extend(texts)
+        return [{"label": "POSITIVE", "score": 0.9} for _ in texts]
+
+    monkeypatch.setattr(main_mod, "predict_batch", predict)
+
+    assert main_mod.main() == 0
+    assert sent == ["rt", "new"]
+
+    with (tmp_path / "output" / "predictions.csv").open("r", newline="", encoding="utf-8") as handle:
+        texts = [row["Text"] for row in csv.DictReader(handle)]
+    assert texts == ["rt", "rt", "new", "rt"]
+
+    live = json.loads((tmp_path / "output" / "live_metrics.json").read_text(encoding="utf-8"))
+    assert live["deduped"] == 2
+    assert live["dedup_ratio"] == 0.5
@@ -1,8 +1,11 @@
 import json
 from pathlib import Path
 
+import numpy as np
 import pytest
 
+from app.predictions import label_kinds
+from app.summary import GroupStats, group_stats_from_dict, group_stats_to_dict
 from tests.test_helper import stub_inference, write_csv
 
 
@@ -34,4 +37,23 @@ def test_group_summary_written(tmp_path: Path, monkeypatch: pytest.MonkeyPatch)
     assert payload["group_col"] == "Group"
 
     groups = {item["group"] for item in payload["groups"]}
-    assert {"A", "B", "(unknown)"}.issubset(groups)
\ No newline at end of file
+    assert {"A", "B", "(unknown)"}.issubset(groups)
+
+def test_group_stats_fold_batches_in_first_seen_order() -> None:
+    stats = GroupStats()
+    for groups, labels, scores in (
+        (["B", "A", "B"], ["POSITIVE", "NEGATIVE", "neutral"], [0.5, 0.25, 1.0]),
+        (["C", "A"], ["positive", "POSITIVE"], [1.0, 0.75]),
+    ):
+        stats.add(
+            stats.group_ids(groups),
+            label_kinds(np.array(labels, dtype=object)),
+            np.array(scores),
+        )
+
+    assert group_stats_to_dict(stats) == {
+        "B": {"total": 2.0, "positive": 1.0, "negative": 0.0, "score_sum": 1.5},
+        "A": {"total": 2.0, "positive": 1.0, "negative": 1.0, "score_sum": 1.0},
+        "C": {"total": 1.0, "positive": 1.0, "negative": 0.0, "score_sum": 1.0},
+    }
+    assert group_stats_to_dict(group_stats_from_dict(group_stats_to_dict(stats))) == group_stats_to_dict(stats)
@@ -23,9 +23,9 @@ def import_main(monkeypatch: pytest.MonkeyPatch):
             return cls()
 
     dummy_module = SimpleNamespace(
+        AutoConfig=_Dummy,
         AutoModelForSequenceClassification=_Dummy,
         AutoTokenizer=_Dummy,
-        pipeline=lambda *_args, **_kwargs: None,
     )
     monkeypatch.setitem(sys.modules, "transformers", dummy_module)
     main_mod = importlib.import_module("app.main")
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from app.predictions import Predictions, unscatter
+from tests.test_helper import import_main
+
+
+class _Tokenizer:
+    def __call__(self, texts, **_kwargs):
+        return {"input_ids": [[len(t)] for t in texts]}
+
+
+def test_engine_returns_label_and_score_arrays(monkeypatch: pytest.MonkeyPatch) -> None:
+    import_main(monkeypatch)
+    from app.inference import SentimentEngine, predict_batch
+
+    class _Engine(SentimentEngine):
+        def _logits(self, batch):
+            # Long texts lean positive, short ones negative
+            return np.array([[0.0, n - 3.0] for [n] in batch["input_ids"]])
+
+    engine = _Engine(_Tokenizer(), {0: "NEGATIVE", 1: "POSITIVE"}, max_len=16)
+    predictions = predict_batch(engine, ["great stuff", "no"])
+
+    assert isinstance(predictions, Predictions)
+    assert predictions.labels.tolist() == ["POSITIVE", "NEGATIVE"]
+    assert predictions.scores.dtype == np.float64
+    assert predictions.scores[1] == pytest.approx(1 / (1 + np.exp(-1.0)))
+    assert len(predict_batch(engine, [])) == 0
+
+
+def test_dict_predictions_convert_and_unscatter() -> None:
+    parts = [
+        Predictions.from_dicts([{"label": "B", "score": "0.5"}, {"label": "D", "score": "n/a"}]),
+        Predictions.from_dicts([{"label": "A", "score": 1}]),
+    ]
+    merged = unscatter([[1, 2], [0]], parts)
+
+    assert merged.labels.tolist() == ["A", "B", "D"]
+    assert merged.scores.tolist() == [1.0, 0.5, 0.0]
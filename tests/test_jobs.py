@@ -0,0 +1,93 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+from app.jobs import CANCELLED, COMPLETE, FAILED, QUEUED, RUNNING, JobScheduler, plan_concurrency
+from app.live import read_live_snapshot
+
+REPO = Path(__file__).resolve().parents[1]
+
+# Stand-in for app.main: waits for a release file, then reports through its
+# own live path the way the runner does
+FAKE_RUNNER = """
+import os, sys, time
+from pathlib import Path
+from app.live import write_live_snapshot
+release = Path(os.environ["INPUT_CSV"] + ".release")
+while not release.exists():
+    time.sleep(0.01)
+code = int(release.read_text() or 0)
+if code == 0:
+    write_live_snapshot(Path(os.environ["RUN_LIVE_PATH"]), {
+        "status": "complete",
+        "input_csv": os.environ["INPUT_CSV"],
+        "threads": os.environ["OMP_NUM_THREADS"],
+    })
+sys.exit(code)
+"""
+
+
+def _scheduler(tmp_path: Path, max_concurrent: int) -> JobScheduler:
+    return JobScheduler(
+        tmp_path / "jobs",
+        max_concurrent,
+        threads_per_job=2,
+        command=[sys.executable, "-c", FAKE_RUNNER],
+        cwd=REPO,
+    )
+
+
+def _release(input_csv: Path, exit_code: int = 0) -> None:
+    input_csv.with_name(f"{input_csv.name}.release").write_text(str(exit_code))
+
+
+def test_plan_concurrency() -> None:
+    assert plan_concurrency(16) == (4, 4)
+    assert plan_concurrency(2) == (1, 2)
+    assert plan_concurrency(16, concurrency=8) == (8, 2)
+    assert plan_concurrency(16, threads_per_job=1) == (16, 1)
+
+
+def test_jobs_queue_behind_the_concurrency_limit(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("OMP_NUM_THREADS", raising=False)
+    scheduler = _scheduler(tmp_path, max_concurrent=1)
+    inputs = [tmp_path / f"in{i}.csv" for i in range(3)]
+    jobs = [
+        scheduler.submit(f"job{i}", path, tmp_path / f"out{i}.csv", {}) for i, path in enumerate(inputs)
+    ]
+    assert [job.status for job in jobs] == [RUNNING, QUEUED, QUEUED]
+    assert scheduler.counts() == {"running": 1, "queued": 2, "max_concurrent": 1}
+    with pytest.raises(ValueError):
+        scheduler.submit("dup", tmp_path / "x.csv", tmp_path / "out2.csv", {})
+
+    _release(inputs[0])
+    assert scheduler.wait("job0", timeout_s=10).status == COMPLETE
+    assert scheduler.get("job1").status == RUNNING
+    _release(inputs[1], exit_code=3)
+    assert scheduler.wait("job1", timeout_s=10).status == FAILED
+    _release(inputs[2])
+    assert scheduler.wait("job2", timeout_s=10).status == COMPLETE
+
+    # Every job reported through its own live state
+    for job, path in zip(jobs, inputs):
+        _, live = read_live_snapshot(job.live_path)
+        assert live["status"] == job.status
+        if job.status == COMPLETE:
+            assert live["input_csv"] == str(path)
+            assert live["threads"] == "2"
+    assert [job.id for job in scheduler.jobs()] == ["job2", "job1", "job0"]
+
+
+def test_cancel_queued_and_running_jobs(tmp_path: Path) -> None:
+    scheduler = _scheduler(tmp_path, max_concurrent=1)
+    running = scheduler.submit("a", tmp_path / "a.csv", tmp_path / "a_out.csv", {})
+    queued = scheduler.submit("b", tmp_path / "b.csv", tmp_path / "b_out.csv", {})
+
+    scheduler.cancel("b")
+    assert queued.status == CANCELLED and queued.process is None
+    scheduler.cancel("a")
+    assert scheduler.wait("a", timeout_s=10).status == CANCELLED
+    _, live = read_live_snapshot(running.live_path)
+    assert live["status"] == CANCELLED
+    assert scheduler.counts()["running"] == 0
@@ -0,0 +1,58 @@
+import json
+import time
+from pathlib import Path
+
+from app.config import load_settings
+from app.live import (
+    LiveChannelReader,
+    LiveChannelWriter,
+    LiveMetricsPublisher,
+    live_channel_path,
+    live_delta,
+)
+from app.run_tracking import RunStats
+
+
+def test_publisher_throttles_and_flushes_final_state(tmp_path: Path) -> None:
+    path = tmp_path / "live_metrics.json"
+    stats = RunStats()
+    live = LiveMetricsPublisher(path, load_settings(), stats, time.time(), interval_s=60)
+
+    for _ in range(100):
+        stats.processed += 1
+        live.touch()
+    deadline = time.time() + 5
+    while live.writes == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    # The first touch is written; the rest wait out the interval
+    assert live.writes == 1
+
+    live.close("complete", runtime_s=1.5)
+    record = json.loads(path.read_text(encoding="utf-8"))
+    assert live.writes == 2
+    assert record["status"] == "complete"
+    assert record["processed"] == 100
+    assert not list(tmp_path.glob(".*.tmp"))
+
+
+def test_channel_publishes_with_sequence_numbers(tmp_path: Path) -> None:
+    path = live_channel_path(tmp_path / "live_metrics.json")
+    reader = LiveChannelReader(path)
+    assert reader.read() == (0, None)
+
+    writer = LiveChannelWriter(path)
+    first = writer.publish({"status": "running", "processed": 1})
+    assert reader.read() == (first, {"status": "running", "processed": 1})
+    writer.close()
+
+    # A new writer (the next run, or the API) continues the sequence
+    writer = LiveChannelWriter(path)
+    second = writer.publish({"status": "complete", "processed": 5})
+    writer.close()
+    assert second > first
+    assert reader.seq() == second
+    assert live_delta({"status": "running", "processed": 1}, reader.read()[1]) == {
+        "status": "complete",
+        "processed": 5,
+    }
+    reader.close()
@@ -0,0 +1,60 @@
+import threading
+from typing import List
+
+import pytest
+
+from app.microbatch import MicroBatcher
+
+
+class _Recorder:
+    # Stub model: label from the text, score from its length
+    def __init__(self) -> None:
+        self.batches: List[List[str]] = []
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, _nlp: object, texts: List[str]) -> List[dict]:
+        self.entered.set()
+        self.gate.wait(5)
+        self.batches.append(list(texts))
+        if "boom" in texts:
+            raise RuntimeError("model failed")
+        return [{"label": "POSITIVE" if "good" in t else "NEGATIVE", "score": float(len(t))} for t in texts]
+
+
+def test_concurrent_requests_share_a_batch() -> None:
+    model = _Recorder()
+    batcher = MicroBatcher(None, model, max_batch_size=16, max_wait_s=0.2)
+    try:
+        futures = [batcher.submit([f"good {i}" if i % 2 else f"bad {i}"]) for i in range(6)]
+        results = [f.result(5) for f in futures]
+    finally:
+        batcher.close()
+    assert model.batches == [["bad 0", "good 1", "bad 2", "good 3", "bad 4", "good 5"]]
+    for i, predictions in enumerate(results):
+        assert predictions.to_dicts() == [
+            {"label": "POSITIVE" if i % 2 else "NEGATIVE", "score": float(len(f"bad {i}") + i % 2)}
+        ]
+
+
+def test_batches_close_at_max_size_and_errors_reach_each_request() -> None:
+    model = _Recorder()
+    model.gate.clear()
+    batcher = MicroBatcher(None, model, max_batch_size=3, max_wait_s=0)
+    try:
+        # The first batch holds the model while the rest queue up behind it
+        first = batcher.submit(["a"])
+        assert model.entered.wait(5)
+        queued = [batcher.submit(["b", "c"]), batcher.submit(["d"]), batcher.submit(["e", "f", "g", "h"])]
+        failing = [batcher.submit(["boom"]), batcher.submit(["x"])]
+        model.gate.set()
+        assert len(first.result(5)) == 1
+        assert [len(f.result(5)) for f in queued] == [2, 1, 4]
+        for f in failing:
+            with pytest.raises(RuntimeError, match="model failed"):
+                f.result(5)
+        assert len(batcher.predict([])) == 0
+    finally:
+        batcher.close()
+    assert model.batches == [["a"], ["b", "c", "d"], ["e", "f", "g", "h"], ["boom", "x"]]
@@ -0,0 +1,44 @@
+import json
+import struct
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.model_artifact import ARTIFACT_FILE, read_artifact, read_safetensors, write_safetensors
+
+
+def test_safetensors_round_trip_is_mapped_and_aligned(tmp_path: Path) -> None:
+    path = tmp_path / "model.safetensors"
+    tensors = {
+        "mask": np.array([True, False, True]),
+        "embeddings.weight": np.arange(15, dtype=np.float32).reshape(5, 3),
+        "position_ids": np.arange(7, dtype=np.int64)[None, :],
+        "half": np.ones(3, dtype=np.float16),
+    }
+    write_safetensors(path, tensors, {"format": "pt"})
+
+    arrays, metadata = read_safetensors(path)
+    assert metadata == {"format": "pt"}
+    assert arrays.keys() == tensors.keys()
+    for name, expected in tensors.items():
+        assert arrays[name].dtype == expected.dtype
+        np.testing.assert_array_equal(arrays[name], expected)
+        # A read-only view of the mapped file, aligned for its dtype
+        assert not arrays[name].flags.writeable and not arrays[name].flags.owndata
+        assert arrays[name].flags.aligned
+
+    # Standard layout: u64 header length, JSON header, one contiguous data buffer
+    raw = path.read_bytes()
+    (header_len,) = struct.unpack("<Q", raw[:8])
+    assert (8 + header_len) % 8 == 0
+    header = json.loads(raw[8 : 8 + header_len])
+    spans = sorted(info["data_offsets"] for name, info in header.items() if name != "__metadata__")
+    assert spans[0][0] == 0 and spans[-1][1] == len(raw) - 8 - header_len
+    assert all(a[1] == b[0] for a, b in zip(spans, spans[1:]))
+
+
+def test_artifact_version_is_checked(tmp_path: Path) -> None:
+    (tmp_path / ARTIFACT_FILE).write_text(json.dumps({"version": 99}), encoding="utf-8")
+    with pytest.raises(ValueError, match="version"):
+        read_artifact(tmp_path)
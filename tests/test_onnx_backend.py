@@ -0,0 +1,100 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from tests.test_helper import import_main
+
+
+class _Session:
+    def __init__(self, logits):
+        self.logits = np.asarray(logits, dtype=np.float32)
+        self.feeds = None
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input_ids"), SimpleNamespace(name="attention_mask")]
+
+    def run(self, _outputs, feeds):
+        self.feeds = feeds
+        return [self.logits]
+
+
+class _Tokenizer:
+    def pad(self, encoded, return_tensors=None):
+        width = max(len(ids) for ids in encoded["input_ids"])
+        return {
+            "input_ids": [ids + [0] * (width - len(ids)) for ids in encoded["input_ids"]],
+            "attention_mask": [[1] * len(ids) + [0] * (width - len(ids)) for ids in encoded["input_ids"]],
+        }
+
+
+def test_onnx_pipeline_matches_predict_contract(monkeypatch: pytest.MonkeyPatch) -> None:
+    import_main(monkeypatch)
+    from app.inference import OnnxSentimentEngine, predict_encoded
+
+    session = _Session([[2.0, -1.0], [-3.0, 1.0]])
+    nlp = OnnxSentimentEngine(session, _Tokenizer(), {0: "NEGATIVE", 1: "POSITIVE"}, max_len=16)
+
+    predictions = predict_encoded(nlp, [[101, 7, 102], [101, 102]])
+    assert predictions.labels.tolist() == ["NEGATIVE", "POSITIVE"]
+    assert predictions.scores[0] == pytest.approx(1 / (1 + np.exp(-3.0)), rel=1e-5)
+    assert session.feeds["attention_mask"].tolist() == [[1, 1, 1], [1, 1, 0]]
+
+
+def test_cached_onnx_graph_skips_export(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    import_main(monkeypatch)
+    from app.inference import export_onnx_model, onnx_model_dir
+
+    model_dir = onnx_model_dir(tmp_path, "org/model", opset=17)
+    assert model_dir.name == "org__model-opset17"
+    assert onnx_model_dir(tmp_path, "org/model", opset=18) != model_dir
+
+    model_dir.mkdir(parents=True)
+    (model_dir / "model.onnx").write_bytes(b"graph")
+    # torch is never imported when the cached graph is reused
+    assert export_onnx_model("org/model", model_dir, 17) == model_dir / "model.onnx"
+
+
+class _BertOrderTokenizer:
+    # BERT tokenizers list token_type_ids before attention_mask
+    model_input_names = ["input_ids", "token_type_ids", "attention_mask"]
+
+    def __call__(self, texts, return_tensors=None):
+        import torch
+
+        ids = torch.tensor([[101, 7, 8, 9, 102]] * len(texts))
+        return {
+            "input_ids": ids,
+            "token_type_ids": torch.zeros_like(ids),
+            "attention_mask": torch.ones_like(ids),
+        }
+
+
+def test_onnx_export_matches_torch_for_bert_input_order(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    torch = pytest.importorskip("torch")
+    ort = pytest.importorskip("onnxruntime")
+    transformers = pytest.importorskip("transformers")
+    import_main(monkeypatch)
+    from app import inference
+
+    torch.manual_seed(0)
+    config = transformers.BertConfig(
+        vocab_size=128, hidden_size=16, num_hidden_layers=1, num_attention_heads=2, intermediate_size=32
+    )
+    model = transformers.BertForSequenceClassification(config).eval()
+    monkeypatch.setattr(inference.AutoTokenizer, "from_pretrained", lambda _name: _BertOrderTokenizer())
+    monkeypatch.setattr(inference.AutoModelForSequenceClassification, "from_pretrained", lambda _name: model)
+
+    path = inference.export_onnx_model("tiny-bert", tmp_path, 17)
+    session = ort.InferenceSession(str(path), providers=["CPUExecutionProvider"])
+    assert [i.name for i in session.get_inputs()] == ["input_ids", "attention_mask", "token_type_ids"]
+
+    # A padded row and a second segment, so a swapped mask and segment ids would show
+    ids = torch.tensor([[101, 7, 8, 102, 0], [101, 9, 102, 10, 102]])
+    mask = torch.tensor([[1, 1, 1, 1, 0], [1, 1, 1, 1, 1]])
+    segments = torch.tensor([[0, 0, 0, 0, 0], [0, 0, 0, 1, 1]])
+    with torch.no_grad():
+        expected = model(input_ids=ids, attention_mask=mask, token_type_ids=segments).logits.numpy()
+    feeds = {"input_ids": ids.numpy(), "attention_mask": mask.numpy(), "token_type_ids": segments.numpy()}
+    np.testing.assert_allclose(session.run(["logits"], feeds)[0], expected, rtol=1e-4, atol=1e-5)
@@ -0,0 +1,54 @@
+import csv
+from pathlib import Path
+
+import pytest
+
+from app.output import read_output_rows
+from tests.test_helper import stub_inference, write_csv
+
+
+def _run(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, **env: str) -> None:
+    monkeypatch.chdir(tmp_path)
+    input_path = tmp_path / "data" / "input.csv"
+    write_csv(input_path, rows=[["r1", "good"], ["r2", ""], ["r3", "fine"]], header=["id", "Text"])
+    monkeypatch.setenv("INPUT_CSV", str(input_path))
+    monkeypatch.setenv("ID_COL", "id")
+    monkeypatch.setenv("BATCH_SIZE", "2")
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    # The row without text counts as failed, hence exit code 1
+    assert stub_inference(monkeypatch).main() == 1
+
+
+@pytest.mark.parametrize("env", [{}, {"CSV_ENGINE": "pyarrow"}])
+def test_csv_output_passes_id_column_through(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, env: dict[str, str]
+) -> None:
+    if env.get("CSV_ENGINE") == "pyarrow":
+        pytest.importorskip("pyarrow")
+    _run(tmp_path, monkeypatch, **env)
+
+    with (tmp_path / "output" / "predictions.csv").open("r", newline="", encoding="utf-8") as handle:
+        reader = csv.DictReader(handle)
+        rows = list(reader)
+    assert reader.fieldnames == ["id", "Text", "label", "score", "error"]
+    assert [(r["id"], r["Text"], r["error"]) for r in rows] == [
+        ("r2", "", "missing_text"),
+        ("r1", "good", ""),
+        ("r3", "fine", ""),
+    ]
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "arrow"])
+def test_columnar_output_is_typed(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, output_format: str) -> None:
+    pytest.importorskip("pyarrow")
+    _run(tmp_path, monkeypatch, OUTPUT_FORMAT=output_format)
+
+    path = tmp_path / "output" / f"predictions.{output_format}"
+    rows = read_output_rows(path, limit=0)
+    assert rows == [
+        {"id": "r2", "Text": "", "label": "", "score": None, "error": "missing_text"},
+        {"id": "r1", "Text": "good", "label": "POSITIVE", "score": 0.9, "error": ""},
+        {"id": "r3", "Text": "fine", "label": "POSITIVE", "score": 0.9, "error": ""},
+    ]
+    assert read_output_rows(path, limit=1) == rows[:1]
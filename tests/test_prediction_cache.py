@@ -0,0 +1,77 @@
+import csv
+import json
+from pathlib import Path
+
+import pytest
+
+from app.cache import PredictionCache
+from tests.test_helper import import_main, write_csv
+
+
+def test_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    cache = PredictionCache(tmp_path / "cache.sqlite", "model", 128, max_entries=2)
+    cache.put_many(["a", "b"], [{"label": "POSITIVE", "score": 0.9}, {"label": "NEGATIVE", "score": 0.8}])
+    # Touch "a" so that "b" becomes the eviction candidate
+    assert cache.get_many(["a"])[0] == {"label": "POSITIVE", "score": 0.9}
+    cache.put_many(["c"], [{"label": "POSITIVE", "score": 0.7}])
+
+    hits = cache.get_many(["a", "b", "c"])
+    assert hits[0] is not None
+    assert hits[1] is None
+    assert hits[2] is not None
+    assert len(cache) == 2
+    cache.close()
+
+
+def test_cache_key_ignores_whitespace_but_not_model(tmp_path: Path) -> None:
+    path = tmp_path / "cache.sqlite"
+    cache = PredictionCache(path, "model-a", 128, max_entries=10)
+    cache.put_many(["good  movie"], [{"label": "POSITIVE", "score": 0.9}])
+    assert cache.get_many([" good movie "])[0] is not None
+    cache.close()
+
+    other = PredictionCache(path, "model-b", 128, max_entries=10)
+    assert other.get_many(["good movie"])[0] is None
+    other.close()
+
+
+def test_second_run_is_served_from_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    input_path = tmp_path / "data" / "input.csv"
+    write_csv(input_path, rows=[["great"], ["awful"], ["great"]], header=["Text"])
+
+    monkeypatch.setenv("INPUT_CSV", str(input_path))
+    monkeypatch.setenv("CACHE_PATH", str(tmp_path / "cache" / "predictions.sqlite"))
+    monkeypatch.setenv("BATCH_SIZE", "8")
+
+    main_mod = import_main(monkeypatch)
+    monkeypatch.setattr(main_mod, "load_sentiment_pipeline", lambda *_args, **_kwargs: object())
+
+    seen: list[list[str]] = []
+
+    def predict(_nlp, texts):
+        seen.append(list(texts))
+        return [{"label": "POSITIVE" if t == "great" else "NEGATIVE", "score": 0.9} for t in texts]
+
+    monkeypatch.setattr(main_mod, "predict_batch", predict)
+
+    assert main_mod.main() == 0
+    assert main_mod.main() == 0
+    # Only the first run reaches the model
+    assert len(seen) == 1
+    # Another backend does not reuse torch's predictions
+    monkeypatch.setenv("BACKEND", "onnx")
+    assert main_mod.main() == 0
+    assert len(seen) == 2
+    monkeypatch.delenv("BACKEND")
+    assert main_mod.main() == 0
+    assert len(seen) == 2
+
+    with (tmp_path / "output" / "predictions.csv").open("r", newline="", encoding="utf-8") as handle:
+        labels = [row["label"] for row in csv.DictReader(handle)]
+    assert labels == ["POSITIVE", "NEGATIVE", "POSITIVE"]
+
+    live = json.loads((tmp_path / "output" / "live_metrics.json").read_text(encoding="utf-8"))
+    # The repeated "great" is folded by in-batch dedup before the cache lookup
+    assert live["cache_hits"] == 2
+    assert live["cache_misses"] == 0
@@ -0,0 +1,80 @@
+import csv
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.output import open_output
+from app.output_index import PredictionIndex, index_path, read_prediction_page
+from app.predictions import Predictions
+
+
+def _write(path: Path, rows, mode: str = "w") -> None:
+    with path.open(mode, newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if mode == "w":
+            writer.writerow(["text", "label", "score", "error"])
+        writer.writerows(rows)
+
+
+ROWS = [
+    ["plain", "POSITIVE", "0.9", ""],
+    ['multi\nline "quoted"', "NEGATIVE", "0.8", ""],
+    ["café", "POSITIVE", "0.4", ""],
+    ["broken", "", "", "prediction failed"],
+    ["last", "NEGATIVE", "0.95", ""],
+]
+
+
+def test_index_pages_filters_and_follows_appends(tmp_path: Path) -> None:
+    path = tmp_path / "predictions.csv"
+    _write(path, ROWS)
+
+    index = PredictionIndex.open(path)
+    assert index_path(path).exists()
+    total, rows = index.page(1, 2)
+    assert total == 5
+    assert [r["text"] for r in rows] == ['multi\nline "quoted"', "café"]
+
+    last = dict(zip(["text", "label", "score", "error"], ROWS[4]))
+    assert index.page(0, 10, label="NEGATIVE", min_score=0.9) == (1, [last])
+    # Failed rows have no score, so any score bound excludes them
+    assert index.page(0, 10, max_score=1.0)[0] == 4
+
+    # A half-written row is left for later; the reloaded index picks up the rest
+    _write(path, [["new", "POSITIVE", "0.5", ""]], mode="a")
+    with path.open("a", encoding="utf-8") as f:
+        f.write('"still writ')
+    total, rows = read_prediction_page(path, 5, 10)
+    assert (total, [r["text"] for r in rows]) == (6, ["new"])
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_columnar_page(fmt: str, tmp_path: Path) -> None:
+    pytest.importorskip("pyarrow")
+
+    path = tmp_path / f"predictions.{fmt}"
+    writer = open_output(path, fmt, "text", None)
+    for start in (0, 3):
+        labels = np.array(["POSITIVE", "NEGATIVE", "POSITIVE"], dtype=object)
+        scores = np.array([0.9, 0.8, 0.4]) + start / 100
+        writer.write_predictions([{"text": f"t{start + i}"} for i in range(3)], Predictions(labels, scores))
+        writer.end_batch()
+    writer.close()
+
+    total, rows = read_prediction_page(path, 1, 2, label="POSITIVE")
+    assert total == 4
+    assert [r["text"] for r in rows] == ["t2", "t3"]
+
+
+def test_rewritten_output_is_reindexed(tmp_path: Path) -> None:
+    path = tmp_path / "predictions.csv"
+    _write(path, ROWS[:3])
+    assert read_prediction_page(path, 0, 10)[0] == 3
+
+    # A rerun rewrites the same file, with the same header and more bytes
+    longer = [[f"rerun text {i} " * 3, "NEGATIVE", "0.25", ""] for i in range(6)]
+    _write(path, longer)
+    total, rows = read_prediction_page(path, 0, 10)
+    assert total == 6
+    assert [r["text"] for r in rows] == [row[0] for row in longer]
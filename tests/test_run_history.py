@@ -0,0 +1,114 @@
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from app.history import RunHistoryStore, RunHistoryTail, history_db_path
+from app.run_tracking import append_run_history, write_json_atomic
+
+
+def _record(i: int) -> dict:
+    return {
+        "timestamp": f"2026-01-{i + 1:02d}T00:00:00+0000",
+        "model_name": "model-a" if i % 2 else "model-b",
+        "dataset_type": "reviews",
+        "input_csv": f"data/in-{i}.csv",
+        "processed": i,
+    }
+
+
+def test_backfill_is_incremental_and_idempotent(tmp_path: Path) -> None:
+    history = tmp_path / "run_history.jsonl"
+    # Written before the index existed
+    history.write_text("".join(json.dumps(_record(i)) + "\n" for i in range(3)), encoding="utf-8")
+    append_run_history(history, _record(3))
+
+    store = RunHistoryStore(history_db_path(history))
+    assert store.backfill(history) == 4
+    assert store.backfill(history) == 0
+    total, runs = store.query(limit=10)
+    assert total == 4
+    assert [r["processed"] for r in runs] == [0, 1, 2, 3]
+
+    # A replaced (shorter) file is re-indexed from scratch
+    history.write_text(json.dumps(_record(9)) + "\n", encoding="utf-8")
+    store.backfill(history)
+    assert [r["processed"] for r in store.query()[1]] == [9]
+    store.close()
+
+
+def test_query_filters_and_pages(tmp_path: Path) -> None:
+    history = tmp_path / "run_history.jsonl"
+    for i in range(10):
+        append_run_history(history, _record(i))
+    store = RunHistoryStore(history_db_path(history))
+
+    total, runs = store.query(filters={"model_name": "model-a"}, limit=2, offset=1)
+    assert total == 5
+    # Newest first for paging, oldest first within the page
+    assert [r["processed"] for r in runs] == [5, 7]
+
+    total, runs = store.query(q="IN-4", since="2026-01-03", until="2026-01-09")
+    assert (total, [r["processed"] for r in runs]) == (1, [4])
+    store.close()
+
+
+def test_tail_reads_only_new_lines_and_follows_rotation(tmp_path: Path) -> None:
+    history = tmp_path / "run_history.jsonl"
+    tail = RunHistoryTail(history, capacity=3)
+    assert tail.refresh() == 0
+
+    for i in range(2):
+        append_run_history(history, _record(i))
+    assert tail.refresh() == 2
+    append_run_history(history, _record(2))
+    assert tail.refresh() == 1
+    assert tail.query("IN-1", limit=10) == (1, [_record(1)])
+
+    append_run_history(history, _record(3))
+    tail.refresh()
+    # Run 0 fell out of the ring: recent pages still work, searches do not
+    assert tail.query(None, limit=2) == (4, [_record(2), _record(3)])
+    assert tail.query("in-", limit=10) is None
+    assert tail.query(None, limit=2, offset=2) is None
+
+    # A cold start only parses what fits in the ring
+    fresh = RunHistoryTail(history, capacity=3)
+    assert fresh.refresh() == 4
+    assert fresh.query(None, limit=3) == (4, [_record(1), _record(2), _record(3)])
+
+    # Rotation: a new file under the same name
+    rotated = tmp_path / "rotated.jsonl"
+    rotated.write_text(json.dumps(_record(7)) + "\n", encoding="utf-8")
+    rotated.replace(history)
+    assert tail.refresh() == 1
+    assert tail.query(None, limit=10) == (1, [_record(7)])
+
+
+def _append_many(history: Path, start: int) -> None:
+    for i in range(start, start + 25):
+        append_run_history(history, _record(i % 28))
+
+
+def test_concurrent_appends_keep_every_run(tmp_path: Path) -> None:
+    # Parallel jobs share the history; each line must get its own offset
+    history = tmp_path / "run_history.jsonl"
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        list(pool.map(partial(_append_many, history), range(0, 100, 25)))
+
+    store = RunHistoryStore(history_db_path(history))
+    total, _ = store.query(limit=0)
+    assert total == 100
+
+
+def test_concurrent_atomic_writes_never_expose_partial_files(tmp_path: Path) -> None:
+    path = tmp_path / "live_metrics.json"
+
+    def write(i: int) -> None:
+        for _ in range(20):
+            write_json_atomic(path, {"writer": i, "padding": "x" * 200_000})
+            assert json.loads(path.read_text(encoding="utf-8"))["padding"] == "x" * 200_000
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(write, range(4)))
+    assert [p.name for p in tmp_path.iterdir()] == ["live_metrics.json"]
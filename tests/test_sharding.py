@@ -0,0 +1,101 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+from app import csv_utils
+from app.csv_utils import ByteRangeReader, RowProjector, _iter_raw_records, detect_newline, shard_byte_range
+from tests.test_helper import stub_inference, write_csv
+
+
+def test_byte_ranges_cover_each_record_once() -> None:
+    data = b'Text\n"multi\nline",x\nplain\n\n"a ""quoted"" one"\nlast\n'
+    header_len = len(b"Text\n")
+    seen = []
+    for i in range(4):
+        start, end = shard_byte_range(len(data), header_len, i, 4)
+        seen.extend(raw for _, raw in _iter_raw_records(data, start, end))
+    assert seen == [b'"multi\nline",x\n', b"plain\n", b"\n", b'"a ""quoted"" one"\n', b"last\n"]
+
+
+@pytest.mark.parametrize("newline", [b"\n", b"\r\n", b"\r"])
+def test_range_reader_never_starts_inside_quoted_field(newline: bytes, monkeypatch: pytest.MonkeyPatch) -> None:
+    # Shard starts are resolved from the bytes near them, never from the top
+    monkeypatch.setattr(csv_utils, "_align_exact", None)
+    # Long multi-line quoted fields whose inner lines look like records
+    header = b"Id,Text\n"
+    body = b"".join(
+        b'%d,"' % i + b"".join(b'%d,fake ""row"" %d\n' % (i, j) for j in range(20)) + b'end"\n'
+        for i in range(10)
+    )
+    data = (header + body).replace(b"\n", newline)
+    header = header.replace(b"\n", newline)
+    newline = detect_newline(data)
+    project = RowProjector(["Id", "Text"], "Text", None, False, id_col="Id")
+    whole = list(ByteRangeReader(data, len(header), None, project, len(header), newline))
+    assert len(whole) == 10 and all(error is None for _, error in whole)
+
+    sharded = []
+    for i in range(4):
+        start, end = shard_byte_range(len(data), len(header), i, 4)
+        sharded.extend(ByteRangeReader(data, start, end, project, len(header), newline))
+    assert sharded == whole
+
+
+def test_stray_quotes_fall_back_to_exact_alignment() -> None:
+    # csv reads 5" as text, which throws off a plain quote count
+    header = b"Id,Text\n"
+    body = b"".join(
+        b'%d,"quoted\nover ""two"" lines"\n%d,a 5" screen\n' % (i, i) for i in range(40)
+    )
+    data = header + body
+    project = RowProjector(["Id", "Text"], "Text", None, False, id_col="Id")
+    whole = list(ByteRangeReader(data, len(header), None, project, len(header)))
+    assert len(whole) == 80
+
+    sharded = []
+    for i in range(5):
+        start, end = shard_byte_range(len(data), len(header), i, 5)
+        sharded.extend(ByteRangeReader(data, start, end, project, len(header)))
+    assert sharded == whole
+
+
+def _outputs(out_dir: Path) -> tuple[list[str], dict, dict]:
+    lines = (out_dir / "predictions.csv").read_text(encoding="utf-8").splitlines()
+    summary = json.loads((out_dir / "predictions_group_summary.json").read_text(encoding="utf-8"))
+    history = json.loads((out_dir / "run_history.jsonl").read_text(encoding="utf-8").splitlines()[-1])
+    counts = {k: history[k] for k in ("rows_seen", "processed", "failed", "skipped", "positive", "avg_score")}
+    return lines, summary, counts
+
+
+def test_merged_shards_match_single_run(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    input_path = tmp_path / "data" / "input.csv"
+    rows = [[f"review {i}\nsecond line" if i % 5 == 0 else f"review {i}", f"g{i % 3}"] for i in range(40)]
+    write_csv(input_path, rows=rows, header=["Text", "Group"])
+
+    monkeypatch.setenv("INPUT_CSV", str(input_path))
+    monkeypatch.setenv("GROUP_COL_INDEX", "1")
+    monkeypatch.setenv("BATCH_SIZE", "4")
+
+    monkeypatch.setenv("OUTPUT_CSV", str(tmp_path / "single" / "predictions.csv"))
+    monkeypatch.setenv("RUN_HISTORY_PATH", str(tmp_path / "single" / "run_history.jsonl"))
+    main_mod = stub_inference(monkeypatch)
+    assert main_mod.main() == 0
+
+    monkeypatch.setenv("OUTPUT_CSV", str(tmp_path / "sharded" / "predictions.csv"))
+    monkeypatch.setenv("RUN_HISTORY_PATH", str(tmp_path / "sharded" / "run_history.jsonl"))
+    monkeypatch.setenv("SHARD_COUNT", "3")
+    for i in range(3):
+        monkeypatch.setenv("SHARD_INDEX", str(i))
+        assert main_mod.main() == 0
+    assert not (tmp_path / "sharded" / "run_history.jsonl").exists()
+
+    monkeypatch.delenv("SHARD_INDEX")
+    monkeypatch.delenv("SHARD_COUNT")
+    monkeypatch.setattr(sys, "argv", ["merge_shards", "--shards", "3"])
+    from app import merge_shards
+
+    assert merge_shards.main() == 0
+    assert _outputs(tmp_path / "sharded") == _outputs(tmp_path / "single")
@@ -0,0 +1,50 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from tests.test_helper import import_main, write_csv
+
+
+def _run(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, pipeline: bool) -> str:
+    tmp_path.mkdir()
+    monkeypatch.chdir(tmp_path)
+    input_path = tmp_path / "data" / "input.csv"
+    rows = [["good", "A"], ["", "A"], ["bad", "B"], ["boom", "B"], ["fine", "C"], [",", ""], ["bad", "A"]]
+    write_csv(input_path, rows=rows, header=["Text", "Group"])
+
+    monkeypatch.setenv("INPUT_CSV", str(input_path))
+    monkeypatch.setenv("GROUP_COL_INDEX", "1")
+    monkeypatch.setenv("BATCH_SIZE", "2")
+    monkeypatch.setenv("PIPELINE", "1" if pipeline else "0")
+    monkeypatch.setenv("PIPELINE_QUEUE_SIZE", "1")
+
+    main_mod = import_main(monkeypatch)
+    monkeypatch.setattr(main_mod, "load_sentiment_pipeline", lambda *_args, **_kwargs: object())
+
+    def predict(_nlp, texts):
+        if "boom" in texts:
+            raise RuntimeError("boom")
+        return [{"label": "NEGATIVE" if t == "bad" else "POSITIVE", "score": 0.5} for t in texts]
+
+    def encode(_nlp, texts):
+        return [[ord(c) for c in t] for t in texts]
+
+    def predict_encoded(_nlp, encodings):
+        return predict(_nlp, ["".join(chr(i) for i in ids) for ids in encodings])
+
+    monkeypatch.setattr(main_mod, "predict_batch", predict)
+    monkeypatch.setattr(main_mod, "encode_texts", encode)
+    monkeypatch.setattr(main_mod, "predict_encoded", predict_encoded)
+
+    assert main_mod.main() == 1
+    output = (tmp_path / "output" / "predictions.csv").read_text(encoding="utf-8")
+    summary = json.loads((tmp_path / "output" / "predictions_group_summary.json").read_text(encoding="utf-8"))
+    return output + json.dumps(summary, sort_keys=True)
+
+
+def test_pipeline_matches_serial_output(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    serial = _run(tmp_path / "serial", monkeypatch, pipeline=False)
+    staged = _run(tmp_path / "staged", monkeypatch, pipeline=True)
+    assert "boom" in serial
+    assert staged == serial
@@ -0,0 +1,89 @@
+import os
+import threading
+from pathlib import Path
+
+import pytest
+
+from app.config import load_settings
+from app.csv_utils import process_csv
+from app.follow import mark_input_done
+
+ROWS = 'id,Text,Group\n1, good ,A\n2,,B\n3,"multi\nline",C\n4,short,D\n'
+EXPECTED = [
+    ({"Text": "good", "Group": "A"}, None),
+    (None, "missing_text"),
+    ({"Text": "multi\nline", "Group": "C"}, None),
+    ({"Text": "short", "Group": "D"}, None),
+]
+
+
+@pytest.mark.parametrize("engine", ["python", "pyarrow"])
+def test_growing_input_is_read_while_written(engine: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    if engine == "pyarrow":
+        pytest.importorskip("pyarrow")
+    monkeypatch.setenv("INPUT_FOLLOW", "1")
+    monkeypatch.setenv("GROUP_COL_INDEX", "2")
+    monkeypatch.setenv("CSV_ENGINE", engine)
+    path = tmp_path / "upload.csv"
+    path.write_bytes(b"")
+    first_row_read = threading.Event()
+    data = ROWS.encode("utf-8")
+    # Cut inside the header and inside the quoted field
+    cuts = [0, 7, data.index(b"2,"), data.index(b"line"), len(data)]
+
+    def upload() -> None:
+        with path.open("ab") as f:
+            for i, (a, b) in enumerate(zip(cuts, cuts[1:])):
+                if i == 2 and engine == "python":
+                    # The first data row must come out before the rest is sent
+                    assert first_row_read.wait(5)
+                f.write(data[a:b])
+                f.flush()
+        mark_input_done(path)
+
+    writer = threading.Thread(target=upload)
+    writer.start()
+    reader, fieldnames, _, f_in = process_csv(path, load_settings())
+    rows = []
+    try:
+        for row in reader:
+            rows.append(row)
+            first_row_read.set()
+    finally:
+        f_in.close()
+        writer.join()
+    assert fieldnames == ["id", "Text", "Group"]
+    assert rows == EXPECTED
+
+
+def test_fifo_input_ends_at_eof(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("GROUP_COL_INDEX", "2")
+    path = tmp_path / "input.fifo"
+    os.mkfifo(path)
+
+    def upload() -> None:
+        with path.open("wb") as f:
+            f.write(ROWS.encode("utf-8"))
+
+    writer = threading.Thread(target=upload)
+    writer.start()
+    reader, _, _, f_in = process_csv(path, load_settings())
+    try:
+        assert list(reader) == EXPECTED
+    finally:
+        f_in.close()
+        writer.join()
+
+
+def test_stalled_input_times_out(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("INPUT_FOLLOW", "1")
+    monkeypatch.setenv("INPUT_IDLE_TIMEOUT_S", "1")
+    path = tmp_path / "upload.csv"
+    path.write_text("Text\nfirst\nsecond", encoding="utf-8")
+
+    reader, _, _, f_in = process_csv(path, load_settings())
+    try:
+        with pytest.raises(TimeoutError):
+            list(reader)
+    finally:
+        f_in.close()
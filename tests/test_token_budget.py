@@ -0,0 +1,75 @@
+from pathlib import Path
+
+import pytest
+
+from tests.test_helper import import_main, write_csv
+
+
+def test_batches_close_on_token_budget(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    input_path = tmp_path / "data" / "input.csv"
+    texts = ["one two three", "four", "five six", "seven eight nine ten", "eleven"]
+    write_csv(input_path, rows=[[t] for t in texts], header=["Text"])
+
+    monkeypatch.setenv("INPUT_CSV", str(input_path))
+    monkeypatch.setenv("BATCH_SIZE", "3")
+    monkeypatch.setenv("MAX_BATCH_TOKENS", "5")
+
+    main_mod = import_main(monkeypatch)
+    monkeypatch.setattr(main_mod, "load_sentiment_pipeline", lambda *_args, **_kwargs: object())
+
+    encoded: list[list[str]] = []
+
+    def encode(_nlp, batch):
+        encoded.append(list(batch))
+        return [[len(w) for w in t.split()] for t in batch]
+
+    batches: list[list[list[int]]] = []
+
+    def predict(_nlp, encodings):
+        batches.append(encodings)
+        return [{"label": "POSITIVE", "score": 0.9} for _ in encodings]
+
+    monkeypatch.setattr(main_mod, "encode_texts", encode)
+    monkeypatch.setattr(main_mod, "predict_encoded", predict)
+
+    assert main_mod.main() == 0
+    # Every text is tokenized exactly once, a window of BATCH_SIZE rows per call
+    assert encoded == [texts[:3], texts[3:]]
+    # Token counts per row are 3, 1, 2, 4, 1 with a budget of 5
+    assert [len(b) for b in batches] == [2, 1, 2]
+    assert batches[0] == [[3, 3, 5], [4]]
+
+
+def test_known_texts_are_not_tokenized(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    input_path = tmp_path / "data" / "input.csv"
+    texts = ["a b", "c", "a b", "d e f", "c", "g"]
+    write_csv(input_path, rows=[[t] for t in texts], header=["Text"])
+    monkeypatch.setenv("INPUT_CSV", str(input_path))
+    monkeypatch.setenv("BATCH_SIZE", "2")
+    monkeypatch.setenv("MAX_BATCH_TOKENS", "50")
+    monkeypatch.setenv("CACHE_PATH", str(tmp_path / "cache.db"))
+
+    main_mod = import_main(monkeypatch)
+    monkeypatch.setattr(main_mod, "load_sentiment_pipeline", lambda *_args, **_kwargs: object())
+    encoded: list[list[str]] = []
+
+    def encode(_nlp, batch):
+        encoded.append(list(batch))
+        return [[1] * len(t.split()) for t in batch]
+
+    monkeypatch.setattr(main_mod, "encode_texts", encode)
+    monkeypatch.setattr(
+        main_mod, "predict_encoded", lambda _nlp, encodings: [{"label": "POSITIVE", "score": 0.9} for _ in encodings]
+    )
+
+    assert main_mod.main() == 0
+    # Repeats are answered by dedup, so only new texts reach the tokenizer
+    assert encoded == [["a b", "c"], ["d e f"], ["g"]]
+
+    # A second run is served from the prediction cache without tokenizing
+    monkeypatch.setenv("DEDUP_MAX_ENTRIES", "0")
+    encoded.clear()
+    assert main_mod.main() == 0
+    assert encoded == []
@@ -0,0 +1,147 @@
+import json
+import os
+import socket
+import time
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from app.jobs import CANCELLED, COMPLETE, FAILED, JobScheduler
+from app.model_cache import ModelCache
+from app.warm_pool import WarmRunnerPool
+from tests.test_helper import import_main, write_csv
+
+FAKE_ENTRY = "tests.test_warm_pool:fake_main"
+
+
+def _fake_loader(model_name: str, max_len: int, **_: Any) -> str:
+    return f"{model_name}@{max_len}"
+
+
+def fake_main(model_cache: ModelCache) -> int:
+    # Stand-in for app.main.main on a warm runner
+    print("run", os.environ["INPUT_CSV"], flush=True)
+    if os.environ.get("HANG"):
+        time.sleep(60)
+    _, cached = model_cache.get(os.environ["MODEL_NAME"], 8, loader=_fake_loader)
+    Path(os.environ["OUTPUT_CSV"]).write_text(json.dumps({"pid": os.getpid(), "cached": cached}))
+    return int(os.environ.get("EXIT_CODE", "0"))
+
+
+def test_model_cache_evicts_least_recently_used() -> None:
+    cache = ModelCache(max_bytes=10**9, max_models=2, size_fn=lambda _: 1)
+    assert cache.get("a", 8, loader=_fake_loader) == ("a@8", False)
+    cache.get("b", 8, loader=_fake_loader)
+    assert cache.get("a", 8, loader=_fake_loader) == ("a@8", True)
+    cache.get("c", 8, loader=_fake_loader)
+    assert cache.resident() == ["a", "c"]
+    assert (cache.hits, cache.misses) == (1, 3)
+
+    # Over the memory budget only the newest model stays
+    sized = ModelCache(max_bytes=150, max_models=5, size_fn=lambda _: 100)
+    sized.get("a", 8, loader=_fake_loader)
+    sized.get("b", 8, loader=_fake_loader)
+    assert sized.resident() == ["b"] and sized.nbytes == 100
+
+
+def test_warm_runner_is_reused_with_its_model(tmp_path: Path) -> None:
+    pool = WarmRunnerPool(1, 10**9, 2, entry=FAKE_ENTRY, prestart=False)
+    scheduler = JobScheduler(tmp_path / "jobs", 1, 1, launcher=pool.launch)
+    try:
+        results = []
+        for i, env in enumerate([{"MODEL_NAME": "m"}, {"MODEL_NAME": "m"}, {"MODEL_NAME": "m", "EXIT_CODE": "3"}]):
+            out = tmp_path / f"out{i}.csv"
+            job = scheduler.submit(f"job{i}", tmp_path / f"in{i}.csv", out, env)
+            results.append((scheduler.wait(job.id, timeout_s=60).status, json.loads(out.read_text())))
+        assert [status for status, _ in results] == [COMPLETE, COMPLETE, FAILED]
+        assert len({r["pid"] for _, r in results}) == 1
+        assert [r["cached"] for _, r in results] == [False, True, True]
+        assert "run " in scheduler.get("job1").log_path.read_text()
+        assert pool.info() == {"idle": 1, "busy": 0, "resident": ["m"]}
+    finally:
+        pool.close()
+
+
+def test_pool_starts_runners_on_demand_with_a_shared_budget() -> None:
+    pool = WarmRunnerPool(2, 4000, 2, entry=FAKE_ENTRY, prestart=False)
+    try:
+        assert pool.info()["idle"] == 0
+        # The memory budget is for the whole pool
+        assert pool.runner_model_bytes == 2000
+        pool.start()
+        assert pool.info()["idle"] == 2
+        pool.start()
+        assert pool.info()["idle"] == 2
+    finally:
+        pool.close()
+
+
+def test_cancelled_warm_run_replaces_its_runner(tmp_path: Path) -> None:
+    pool = WarmRunnerPool(1, 10**9, 2, entry=FAKE_ENTRY, prestart=False)
+    scheduler = JobScheduler(tmp_path / "jobs", 1, 1, launcher=pool.launch)
+    try:
+        hung = scheduler.submit("hung", tmp_path / "a.csv", tmp_path / "a_out.csv", {"MODEL_NAME": "m", "HANG": "1"})
+        deadline = time.monotonic() + 60
+        while "run " not in (hung.log_path.read_text() if hung.log_path.exists() else ""):
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        scheduler.cancel("hung")
+        assert scheduler.wait("hung", timeout_s=10).status == CANCELLED
+        assert pool.info()["idle"] == 0
+
+        job = scheduler.submit("next", tmp_path / "b.csv", tmp_path / "b_out.csv", {"MODEL_NAME": "m"})
+        assert scheduler.wait("next", timeout_s=60).status == COMPLETE
+        assert json.loads(job.output_csv.read_text())["pid"] != hung.process.pid
+    finally:
+        pool.close()
+
+
+def test_main_reports_startup_timings(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    input_path = tmp_path / "input.csv"
+    write_csv(input_path, rows=[["good"], ["bad"]], header=["Text"])
+    monkeypatch.setenv("INPUT_CSV", str(input_path))
+    monkeypatch.setenv("RUN_DISPATCHED_AT", str(time.time()))
+    main_mod = import_main(monkeypatch)
+    monkeypatch.setattr(
+        main_mod,
+        "predict_batch",
+        lambda _nlp, texts: [{"label": "POSITIVE", "score": 0.9} for _ in texts],
+    )
+    cache = ModelCache(10**9, 1, size_fn=lambda _: 1)
+    monkeypatch.setattr(main_mod, "load_sentiment_pipeline", _fake_loader)
+
+    assert main_mod.main(cache) == 0
+    assert main_mod.main(cache) == 0
+    runs = [json.loads(line) for line in (tmp_path / "output" / "run_history.jsonl").read_text().splitlines()]
+    assert [run["model_cached"] for run in runs] == [False, True]
+    for run in runs:
+        assert 0 <= run["startup_s"] <= run["first_prediction_s"]
+        assert run["model_load_s"] >= 0
+
+
+def test_metrics_port_is_free_between_jobs(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    input_path = tmp_path / "input.csv"
+    write_csv(input_path, rows=[["good"]], header=["Text"])
+    with socket.socket() as probe:
+        probe.bind(("", 0))
+        port = probe.getsockname()[1]
+    monkeypatch.setenv("INPUT_CSV", str(input_path))
+    monkeypatch.setenv("METRICS_PORT", str(port))
+    main_mod = import_main(monkeypatch)
+    monkeypatch.setattr(
+        main_mod,
+        "predict_batch",
+        lambda _nlp, texts: [{"label": "POSITIVE", "score": 0.9} for _ in texts],
+    )
+    monkeypatch.setattr(main_mod, "load_sentiment_pipeline", _fake_loader)
+    cache = ModelCache(10**9, 1, size_fn=lambda _: 1)
+
+    # Two jobs on the same port in a row, as on one warm runner
+    assert main_mod.main(cache) == 0
+    assert main_mod.main(cache) == 0
+    # A job on another runner can bind the port once this one is done
+    with socket.socket() as other:
+        other.bind(("", port))
@@ -0,0 +1,78 @@
+import functools
+import json
+from pathlib import Path
+
+import pytest
+
+from app.workers import InferenceWorkerPool
+from tests.test_helper import import_main, write_csv
+
+
+# Module-level so spawned workers can unpickle them
+def _load(_model_name, _max_len, **_options):
+    return "stub-model"
+
+
+def _predict(_nlp, texts):
+    return [{"label": "NEGATIVE" if "bad" in t else "POSITIVE", "score": len(t) / 100} for t in texts]
+
+
+def _predict_flaky(nlp, texts):
+    if any("boom" in t for t in texts):
+        raise RuntimeError("model blew up")
+    return _predict(nlp, texts)
+
+
+def test_pool_keeps_input_order() -> None:
+    pool = InferenceWorkerPool("m", 16, workers=2, batch_size=2, loader=_load, predictor=_predict)
+    try:
+        pool.check_ready()
+        texts = ["bad one", "good", "fine day", "bad", "ok"]
+        assert pool.predict(texts).to_dicts() == _predict(None, texts)
+        assert pool.predict(texts, lengths=[len(t) for t in texts]).to_dicts() == _predict(None, texts)
+    finally:
+        pool.close()
+
+
+def _run(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, workers: int, predictor=_predict) -> str:
+    tmp_path.mkdir()
+    monkeypatch.chdir(tmp_path)
+    input_path = tmp_path / "data" / "input.csv"
+    rows = [[f"{'bad' if i % 3 == 0 else 'good'} text {i}", f"g{i % 4}"] for i in range(23)]
+    rows[5][0] = "boom"  # only _predict_flaky fails on it
+    write_csv(input_path, rows=rows, header=["Text", "Group"])
+
+    monkeypatch.setenv("INPUT_CSV", str(input_path))
+    monkeypatch.setenv("GROUP_COL_INDEX", "1")
+    monkeypatch.setenv("BATCH_SIZE", "4")
+    monkeypatch.setenv("WORKERS", str(workers))
+
+    main_mod = import_main(monkeypatch)
+    monkeypatch.setattr(main_mod, "load_sentiment_pipeline", _load)
+    monkeypatch.setattr(main_mod, "predict_batch", predictor)
+    monkeypatch.setattr(
+        main_mod,
+        "InferenceWorkerPool",
+        functools.partial(InferenceWorkerPool, loader=_load, predictor=predictor),
+    )
+
+    assert main_mod.main() == (0 if predictor is _predict else 1)
+    output = (tmp_path / "output" / "predictions.csv").read_text(encoding="utf-8")
+    summary = (tmp_path / "output" / "predictions_group_summary.json").read_text(encoding="utf-8")
+    history = json.loads((tmp_path / "output" / "run_history.jsonl").read_text(encoding="utf-8"))
+    counts = {k: history[k] for k in ("processed", "failed", "positive", "negative", "avg_score")}
+    return output + summary + json.dumps(counts)
+
+
+def test_workers_match_single_process(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    single = _run(tmp_path / "single", monkeypatch, workers=1)
+    multi = _run(tmp_path / "multi", monkeypatch, workers=2)
+    assert multi == single
+
+
+def test_worker_failures_match_single_process(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # Only the BATCH_SIZE batch holding the bad row fails, whatever WORKERS is
+    single = _run(tmp_path / "single", monkeypatch, workers=1, predictor=_predict_flaky)
+    multi = _run(tmp_path / "multi", monkeypatch, workers=2, predictor=_predict_flaky)
+    assert '"failed": 4' in single
+    assert multi == single
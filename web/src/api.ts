@@ -1,5 +1,5 @@
 export type LiveSnapshot = {
-  status: "running" | "complete" | "idle" | "starting" | "cancelled" | "failed";
+  status: "queued" | "running" | "complete" | "idle" | "starting" | "cancelled" | "failed";
   timestamp: string;
   input_csv: string;
   output_csv: string;
@@ -26,6 +26,7 @@ export type LiveSnapshot = {
 export type RunRecord = LiveSnapshot;
 
 export type RunStartResponse = {
+  job_id: string;
   status: string;
   input_csv: string;
   output_csv: string;
@@ -55,6 +56,9 @@ export type ModelInfo = {
 
 export type RunStatus = {
   running: boolean;
+  job_id: string | null;
+  status: string;
+  scheduler: { running: number; queued: number; max_concurrent: number };
   pid: number | null;
   log_tail: string;
   log_path: string | null;
@@ -70,9 +74,22 @@ export async function fetchRuns(query: string): Promise<RunRecord[]> {
 }
 
 export async function startRun(formData: FormData): Promise<RunStartResponse> {
-  const res = await fetch("/api/run", {
+  // The file goes up as the raw body so the run starts while it is uploading;
+  // the other fields become query parameters
+  const params = new URLSearchParams();
+  let file: File | null = null;
+  formData.forEach((value, key) => {
+    if (value instanceof File) {
+      file = value;
+      params.set("filename", value.name);
+    } else {
+      params.set(key, value);
+    }
+  });
+  const res = await fetch(`/api/run/stream?${params.toString()}`, {
     method: "POST",
-    body: formData,
+    headers: { "Content-Type": "text/csv" },
+    body: file,
   });
   if (!res.ok) {
     const data = await res.json().catch(() => ({}));
@@ -81,7 +98,11 @@ export async function startRun(formData: FormData): Promise<RunStartResponse> {
   return res.json();
 }
 
-export async function fetchPredictions(path?: string, limit?: number): Promise<PredictionRow[]> {
+export async function fetchPredictions(
+  path?: string,
+  limit?: number,
+  offset?: number,
+): Promise<PredictionRow[]> {
   const params = new URLSearchParams();
   if (path) {
     params.set("path", path);
@@ -89,6 +110,9 @@ export async function fetchPredictions(path?: string, limit?: number): Promise<P
   if (limit !== undefined) {
     params.set("limit", String(limit));
   }
+  if (offset !== undefined) {
+    params.set("offset", String(offset));
+  }
   const url = params.toString() ? `/api/predictions?${params.toString()}` : "/api/predictions";
   const res = await fetch(url);
   if (!res.ok) {
@@ -134,10 +158,17 @@ export async function cancelRun(): Promise<void> {
 
 export function subscribeLive(onMessage: (live: LiveSnapshot | null) => void) {
   const source = new EventSource("/api/live/stream");
+  // The stream sends a full snapshot ({ live }) first, then only changed keys ({ delta })
+  let current: LiveSnapshot | null = null;
   source.onmessage = (event) => {
     try {
       const payload = JSON.parse(event.data);
-      onMessage(payload.live ?? null);
+      if (payload.delta) {
+        current = current ? { ...current, ...payload.delta } : null;
+      } else {
+        current = payload.live ?? null;
+      }
+      onMessage(current);
     } catch {
       onMessage(null);
     }
@@ -184,8 +184,8 @@ export default function RunFormCard({
         </label>
         {formError && <p className="error">{formError}</p>}
         <div className="row">
-          <button type="submit" disabled={formBusy || runStatus?.running}>
-            {formBusy ? "Starting..." : runStatus?.running ? "Running" : "Run"}
+          <button type="submit" disabled={formBusy}>
+            {formBusy ? "Starting..." : runStatus?.running ? "Queue run" : "Run"}
           </button>
           <button type="button" className="secondary" onClick={onCancel} disabled={!runStatus?.running}>
             Cancel